@@ -11,9 +11,16 @@ from flask import Flask, jsonify, request, send_from_directory
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from dotenv import load_dotenv
-import requests as http_requests
 import logging
 from logging.handlers import RotatingFileHandler
+from settings_cache import SettingsCache
+from clip_cutter import cut_clip, cut_clips, split_clip, written_through, CLIP_CUT_MODES, DEFAULT_CLIP_CUT_MODE
+from keyframe_index import KeyframeIndex, remove_keyframe_index
+from transcode_scheduler import TranscodeScheduler, JobCancelled, default_max_jobs
+from media_info import MediaInfoCache
+import clip_triggers
+from eventsub import (EventSubReceiver, EventSubError, HEADER_MESSAGE_ID, HEADER_SUBSCRIPTION_TYPE,
+                      MESSAGE_VERIFICATION, MESSAGE_NOTIFICATION, MESSAGE_REVOCATION)
 
 # Monkeypatch for PyInstaller/frozen app metadata issues
 if getattr(sys, 'frozen', False):
@@ -30,7 +37,7 @@ if getattr(sys, 'frozen', False):
             if package_name in ['werkzeug', 'flask', 'flask-sqlalchemy']:
                 return '3.0.0' # Return a dummy version that satisfies requirements
             raise
-            
+    
     importlib.metadata.version = _patched_version
 
 load_dotenv()
@@ -80,6 +87,21 @@ db = SQLAlchemy(app)
 RECORDINGS_DIR = os.environ.get('RECORDINGS_DIR', os.path.join(DATA_PATH, 'recordings'))
 CLIPS_DIR = os.environ.get('CLIPS_DIR', os.path.join(DATA_PATH, 'clips'))
 SEGMENT_DURATION = int(os.environ.get('SEGMENT_DURATION', '3600'))
+
+# OBS recording formats (RecFormat2). A plain MP4 is unreadable until OBS stops
+# writing it; fragmented MP4 and MKV can be cut while they are still growing
+RECORDING_FORMATS = ('mp4', 'fragmented_mp4', 'mkv')
+LIVE_CLIP_FORMATS = ('fragmented_mp4', 'mkv')
+
+# Extra wait after a live clip's post-buffer for OBS to flush it to disk
+LIVE_CLIP_FLUSH_DELAY = 5
+
+# segments: OBS records the whole stream in SEGMENT_DURATION files and clips are cut from them
+# replay_buffer: OBS only keeps the last few minutes in its replay buffer; clips are saved out of it
+CAPTURE_MODES = ('segments', 'replay_buffer')
+
+# How long to wait for OBS to write a saved replay to disk
+REPLAY_SAVE_TIMEOUT = 30
 os.makedirs(RECORDINGS_DIR, exist_ok=True)
 os.makedirs(CLIPS_DIR, exist_ok=True)
 
@@ -180,6 +202,44 @@ class TriggerEvent(db.Model):
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     processed = db.Column(db.Boolean, default=False)
 
+class StreamEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    stream_id = db.Column(db.Integer, db.ForeignKey('stream.id'), index=True)
+    event_type = db.Column(db.String(20), nullable=False)
+    source = db.Column(db.String(20), default='poll')
+    detected_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class MonitorShardLease(db.Model):
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    node_id = db.Column(db.String(255), index=True)
+    expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+
+class MonitorNode(db.Model):
+    node_id = db.Column(db.String(255), primary_key=True)
+    hostname = db.Column(db.String(255))
+    pid = db.Column(db.Integer)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_heartbeat = db.Column(db.DateTime, index=True)
+
+class MediaInfo(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(1000), unique=True, nullable=False)
+    inode = db.Column(db.BigInteger)
+    size = db.Column(db.BigInteger)
+    mtime = db.Column(db.Float)
+    duration = db.Column(db.Float)
+    bitrate = db.Column(db.BigInteger)
+    format_name = db.Column(db.String(100))
+    video_codec = db.Column(db.String(50))
+    audio_codec = db.Column(db.String(50))
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    fps = db.Column(db.Float)
+    keyframe_interval = db.Column(db.Float)
+    streams = db.Column(db.Text)
+    probed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 class TikTokAccount(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(255), nullable=False)
@@ -203,7 +263,8 @@ current_recording_info = {
     'current_segment': 0,
     'segment_start_time': None,
     'stream_id': None,
-    'recording_id': None
+    'recording_id': None,
+    'capture_mode': None
 }
 
 platform_connections = {
@@ -231,11 +292,15 @@ background_workers = {
 # UTILITY FUNCTIONS
 # ============================================================================
 
+# Settings are served from memory; writes go through set_setting
+settings_cache = SettingsCache(app, db, Settings)
+
+# All ffmpeg work (clip cuts, segment batches) queues here; ffmpeg_max_jobs bounds concurrency
+transcode_scheduler = TranscodeScheduler(logger=app.logger)
+
 def get_setting(key, default=None):
     try:
-        with app.app_context():
-            setting = Settings.query.filter_by(key=key).first()
-            return setting.value if setting else default
+        return settings_cache.get(key, default)
     except Exception as e:
         app.logger.error(f"Error getting setting {key}: {e}")
         return default
@@ -248,7 +313,9 @@ def set_setting(key, value):
         else:
             setting = Settings(key=key, value=value)
             db.session.add(setting)
+        settings_cache.bump_version()
         db.session.commit()
+        settings_cache.invalidate()
         return True
     except Exception as e:
         app.logger.error(f"Error setting {key}: {e}")
@@ -325,17 +392,83 @@ def disconnect_obs_client():
         app.logger.error(f"OBS disconnect error: {e}")
         return False
 
+def obs_apply_recording_format():
+    """Point OBS's simple and advanced output at the configured recording_format"""
+    recording_format = get_recording_format()
+    try:
+        from obswebsocket import requests as obs_requests
+        for category in ('SimpleOutput', 'AdvOut'):
+            obs_client.call(obs_requests.SetProfileParameter(
+                parameterCategory=category, parameterName='RecFormat2', parameterValue=recording_format
+            ))
+    except Exception as e:
+        app.logger.warning(f"Could not set OBS recording format to {recording_format}: {e}")
+
 def obs_start_recording():
     global obs_client, obs_connected
     if not obs_connected or not obs_client:
         return False, "OBS not connected"
     try:
         from obswebsocket import requests as obs_requests
+        obs_apply_recording_format()
         obs_client.call(obs_requests.StartRecord())
         return True, "Recording started"
     except Exception as e:
         return False, str(e)
 
+def obs_start_replay_buffer(seconds):
+    """Start OBS's replay buffer, holding the last `seconds` of output"""
+    global obs_client, obs_connected
+    if not obs_connected or not obs_client:
+        return False, "OBS not connected"
+    try:
+        from obswebsocket import requests as obs_requests
+        obs_apply_recording_format()
+        for category in ('SimpleOutput', 'AdvOut'):
+            obs_client.call(obs_requests.SetProfileParameter(
+                parameterCategory=category, parameterName='RecRB', parameterValue='true'
+            ))
+            obs_client.call(obs_requests.SetProfileParameter(
+                parameterCategory=category, parameterName='RecRBTime', parameterValue=str(int(seconds))
+            ))
+        obs_client.call(obs_requests.StartReplayBuffer())
+        return True, "Replay buffer started"
+    except Exception as e:
+        return False, str(e)
+
+def obs_stop_replay_buffer():
+    global obs_client, obs_connected
+    if not obs_connected or not obs_client:
+        return False, "OBS not connected"
+    try:
+        from obswebsocket import requests as obs_requests
+        obs_client.call(obs_requests.StopReplayBuffer())
+        return True, "Replay buffer stopped"
+    except Exception as e:
+        return False, str(e)
+
+def obs_save_replay_buffer():
+    """Ask OBS to write its replay buffer to disk (it saves asynchronously)"""
+    global obs_client, obs_connected
+    if not obs_connected or not obs_client:
+        return False, "OBS not connected"
+    try:
+        from obswebsocket import requests as obs_requests
+        obs_client.call(obs_requests.SaveReplayBuffer())
+        return True, "Replay buffer saved"
+    except Exception as e:
+        return False, str(e)
+
+def obs_last_replay_path():
+    global obs_client, obs_connected
+    if not obs_connected or not obs_client:
+        return None
+    try:
+        from obswebsocket import requests as obs_requests
+        return obs_client.call(obs_requests.GetLastReplayBufferReplay()).getSavedReplayPath()
+    except Exception:
+        return None
+
 def obs_stop_recording():
     global obs_client, obs_connected
     if not obs_connected or not obs_client:
@@ -369,6 +502,7 @@ def rotate_obs_recording():
         from obswebsocket import requests as obs_requests
         obs_client.call(obs_requests.StopRecord())
         time.sleep(1)
+        obs_apply_recording_format()
         obs_client.call(obs_requests.StartRecord())
         return True
     except Exception as e:
@@ -406,76 +540,189 @@ def get_ffmpeg_status():
     except:
         return {'available': False, 'version': None}
 
+def store_probed_duration(path, info):
+    """Keep Recording/Clip durations in line with what ffprobe measured (runs in the cache's savepoint)"""
+    duration = info.get('duration')
+    if not duration:
+        return
+    Recording.query.filter_by(filepath=path).update({Recording.duration: duration}, synchronize_session=False)
+    Clip.query.filter_by(filepath=path).update({Clip.duration: duration}, synchronize_session=False)
+
+# ffprobe results, persisted per file version so each file is probed once
+media_info_cache = MediaInfoCache(app, db, MediaInfo, on_probe=store_probed_duration)
+
 def get_video_duration(filepath):
+    info = media_info_cache.get(filepath)
+    return info['duration'] if info else 0
+
+def get_keyframe_index(video_path, build=False):
+    """Saved keyframe index of a video; with build=True a missing or stale one is rebuilt"""
     try:
-        result = subprocess.run(
-            ['ffprobe', '-v', 'error', '-show_entries', 'format=duration',
-             '-of', 'json', filepath],
-            capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
-        )
-        return float(json.loads(result.stdout)['format']['duration'])
+        return KeyframeIndex.load_or_build(video_path) if build else KeyframeIndex.load(video_path)
     except Exception as e:
-        app.logger.error(f"Error getting video duration for {filepath}: {e}")
-        return 0
-
-def create_clip_from_video(input_path, output_path, start_time, duration):
+        app.logger.warning(f"Could not index keyframes of {video_path}: {e}")
+        return None
+
+def ffmpeg_error(e):
+    """Exception text plus the last line ffmpeg printed to stderr, if any"""
+    stderr = getattr(e, 'stderr', None)
+    if isinstance(stderr, bytes):
+        stderr = stderr.decode('utf-8', 'replace')
+    lines = [line for line in (stderr or '').splitlines() if line.strip()]
+    return f"{e}: {lines[-1].strip()}" if lines else str(e)
+
+def vertical_path_for(clip_filepath):
+    return f"{os.path.splitext(clip_filepath)[0]}_vertical.mp4"
+
+def clip_vertical_path(clip_filepath):
+    """Where to render the 9:16 TikTok variant of a clip, or None when disabled"""
+    if get_setting('tiktok_vertical_clips', 'false') != 'true':
+        return None
+    return vertical_path_for(clip_filepath)
+
+def get_recording_format():
+    recording_format = get_setting('recording_format', 'mp4')
+    return recording_format if recording_format in RECORDING_FORMATS else 'mp4'
+
+def recording_extension():
+    return '.mkv' if get_recording_format() == 'mkv' else '.mp4'
+
+def get_capture_mode():
+    capture_mode = get_setting('capture_mode', 'segments')
+    return capture_mode if capture_mode in CAPTURE_MODES else 'segments'
+
+def trigger_window(trigger):
+    """(pre_buffer, clip_duration, post_buffer) of a trigger, with the smart detection defaults"""
+    return clip_triggers.trigger_window(trigger, smart_detection_settings)
+
+def replay_buffer_seconds():
+    """Replay buffer length that holds the longest enabled trigger window"""
+    triggers = ClipTrigger.query.filter_by(is_enabled=True).all()
+    return clip_triggers.replay_buffer_seconds(triggers, smart_detection_settings)
+
+def clip_thumbnail_path(clip_filepath):
+    return f"{os.path.splitext(clip_filepath)[0]}_thumb.jpg"
+
+def clip_upload_path(clip):
+    """TikTok uploads use the 9:16 variant when one was rendered"""
+    if not clip:
+        return None
+    vertical_path = vertical_path_for(clip.filepath)
+    return vertical_path if os.path.exists(vertical_path) else clip.filepath
+
+def upload_parts(clip, platform='tiktok', auto_split=True):
+    """
+    Files a new upload of the clip sends, in order: the parts written by
+    splitting it for TikTok (split_clip decides how many) or the clip itself
+    """
+    path = clip_upload_path(clip)
+    if platform == 'tiktok' and auto_split and path and os.path.exists(path):
+        return split_video_for_tiktok(path, os.path.dirname(path))
+    return [path]
+
+def prepare_uploads(clip_id, platform='tiktok', auto_split=True, start=False, **fields):
+    """
+    Transcode job behind a new upload: split the clip for TikTok and create
+    one Upload per part. start queues them for the upload worker (auto-post);
+    otherwise they stay pending until /api/uploads/<id>/start.
+    """
+    with app.app_context():
+        clip = Clip.query.get(clip_id)
+        if not clip:
+            return []
+        
+        total_parts = len(upload_parts(clip, platform, auto_split))
+        uploads = create_uploads(clip_id, total_parts, platform, auto_split,
+                                 status='queued' if start else 'pending', **fields)
+        app.logger.info(f"Created {total_parts} upload(s) for clip {clip_id}")
+        return [upload.id for upload in uploads]
+
+def create_uploads(clip_id, total_parts, platform='tiktok', auto_split=True, status='pending', **fields):
+    """Add one Upload per part of the clip"""
+    uploads = [Upload(clip_id=clip_id, platform=platform, status=status, part_number=i + 1,
+                      total_parts=total_parts, auto_split=auto_split, **fields)
+               for i in range(total_parts)]
+    db.session.add_all(uploads)
+    db.session.commit()
+    return uploads
+
+def upload_video_path(upload):
+    """The file an Upload row sends: its part of the split clip, or the whole clip"""
+    path = clip_upload_path(upload.clip)
+    if path and (upload.total_parts or 1) > 1:
+        return f"{os.path.splitext(path)[0]}_part_{upload.part_number}.mp4"
+    return path
+
+def create_clip_from_video(input_path, output_path, start_time, duration, keyframe_index=None,
+                           thumbnail_path=None, vertical_path=None):
+    """Cut a clip, plus its thumbnail and vertical variant if given, in one ffmpeg pass"""
+    mode = get_setting('clip_cut_mode', DEFAULT_CLIP_CUT_MODE)
+    if mode not in CLIP_CUT_MODES:
+        mode = DEFAULT_CLIP_CUT_MODE
+    if keyframe_index is None and mode != 'reencode':
+        keyframe_index = get_keyframe_index(input_path)
+    keyframes = keyframe_index.times if keyframe_index else None
     try:
-        cmd = [
-            'ffmpeg', '-y', '-i', input_path,
-            '-ss', str(start_time), '-t', str(duration),
-            '-c:v', 'libx264', '-c:a', 'aac',
-            '-preset', 'fast', '-crf', '23',
-            output_path
-        ]
-        subprocess.run(cmd, capture_output=True, check=True, creationflags=SUBPROCESS_FLAGS)
+        cut_clip(input_path, output_path, start_time, duration, mode=mode, keyframes=keyframes,
+                 thumbnail_path=thumbnail_path, vertical_path=vertical_path)
         return True
     except Exception as e:
-        app.logger.error(f"Error creating clip: {e}")
-        return False
-
-def generate_thumbnail(video_path, thumbnail_path, timestamp=1):
+        if mode == 'reencode':
+            app.logger.error(f"Error creating clip: {ffmpeg_error(e)}")
+            return False
+        app.logger.warning(f"Fast clip cut ({mode}) failed, re-encoding instead: {ffmpeg_error(e)}")
     try:
-        cmd = [
-            'ffmpeg', '-y', '-i', video_path,
-            '-ss', str(timestamp), '-vframes', '1',
-            '-vf', 'scale=320:-1',
-            thumbnail_path
-        ]
-        subprocess.run(cmd, capture_output=True, check=True, creationflags=SUBPROCESS_FLAGS)
+        cut_clip(input_path, output_path, start_time, duration, mode='reencode',
+                 thumbnail_path=thumbnail_path, vertical_path=vertical_path)
         return True
     except Exception as e:
-        app.logger.error(f"Error generating thumbnail: {e}")
+        app.logger.error(f"Error creating clip: {ffmpeg_error(e)}")
         return False
 
+def create_clips_from_video(input_path, windows, keyframe_index=None):
+    """
+    Cut several (output_path, start_time, duration, thumbnail_path, vertical_path)
+    windows from one video in a single ffmpeg pass; returns a success flag per
+    window. If the batch fails, each window is retried on its own.
+    """
+    if not windows:
+        return []
+    mode = get_setting('clip_cut_mode', DEFAULT_CLIP_CUT_MODE)
+    if mode not in CLIP_CUT_MODES:
+        mode = DEFAULT_CLIP_CUT_MODE
+    if keyframe_index is None and mode != 'reencode':
+        keyframe_index = get_keyframe_index(input_path)
+    keyframes = keyframe_index.times if keyframe_index else None
+    try:
+        cut_clips(input_path, windows, mode=mode, keyframes=keyframes)
+        return [True] * len(windows)
+    except Exception as e:
+        app.logger.warning(f"Batch clip cut of {len(windows)} clips failed, cutting one by one: {ffmpeg_error(e)}")
+    return [create_clip_from_video(input_path, output_path, start_time, duration, keyframe_index=keyframe_index,
+                                   thumbnail_path=thumbnail_path, vertical_path=vertical_path)
+            for output_path, start_time, duration, thumbnail_path, vertical_path in windows]
+
 def split_video_for_tiktok(input_path, output_dir, max_duration=60):
+    """
+    Split a clip into TikTok parts. Only call it from a transcode job
+    (prepare_uploads), so the split counts against ffmpeg_max_jobs and can be
+    cancelled from /api/ffmpeg/jobs.
+    """
     try:
         duration = get_video_duration(input_path)
         
         if duration <= max_duration:
             return [input_path]
         
-        parts = []
-        num_parts = int(duration // max_duration) + (1 if duration % max_duration > 0 else 0)
-        base_name = os.path.splitext(os.path.basename(input_path))[0]
-        
-        for i in range(num_parts):
-            start = i * max_duration
-            part_duration = min(max_duration, duration - start)
-            output_path = os.path.join(output_dir, f"{base_name}_part_{i+1}.mp4")
-            
-            cmd = [
-                'ffmpeg', '-y', '-i', input_path,
-                '-ss', str(start), '-t', str(part_duration),
-                '-c:v', 'libx264', '-c:a', 'aac',
-                '-preset', 'fast', '-crf', '23',
-                output_path
-            ]
-            subprocess.run(cmd, capture_output=True, check=True, creationflags=SUBPROCESS_FLAGS)
-            parts.append(output_path)
-        
-        return parts
+        copy = get_setting('clip_cut_mode', DEFAULT_CLIP_CUT_MODE) != 'reencode'
+        keyframe_index = get_keyframe_index(input_path) if copy else None
+        return split_clip(input_path, output_dir, duration, max_duration=max_duration, copy=copy,
+                          keyframes=keyframe_index.times if keyframe_index else None)
+    except JobCancelled:
+        # No uploads for a cancelled split, rather than the whole clip in one part
+        raise
     except Exception as e:
-        app.logger.error(f"Error splitting video: {e}")
+        app.logger.error(f"Error splitting video: {ffmpeg_error(e)}")
         return [input_path]
 
 # ============================================================================
@@ -592,8 +839,12 @@ def generate_clips_from_recording(recording_id):
             db.session.rollback()
             return []
 
-def process_segment_clips(recording_id):
-    """Auto-generate clips from a completed segment, optionally delete the long-form video."""
+def process_segment_clips(recording_id, final=False):
+    """
+    Auto-generate clips from a completed segment, optionally delete the long-form video.
+    final: the recording was stopped rather than rotated; only the trigger
+    clips still pending in it are cut, and the file is kept.
+    """
     with app.app_context():
         try:
             recording = Recording.query.get(recording_id)
@@ -603,9 +854,18 @@ def process_segment_clips(recording_id):
             
             app.logger.info(f"Auto-generating clips for recording {recording_id}...")
             
-            triggers = ClipTrigger.query.filter_by(is_enabled=True).all()
+            # One ffprobe pass over the finished segment serves every cut below
+            keyframe_index = get_keyframe_index(recording.filepath, build=True)
+            
+            triggers = [] if final else ClipTrigger.query.filter_by(is_enabled=True).all()
             clips_created = 0
             created_clip_ids = []
+            planned = []
+            
+            # Trigger clips that were not cut while the segment was recording
+            for clip in Clip.query.filter_by(recording_id=recording_id, status='pending').all():
+                if claim_clip(clip.id):
+                    planned.append((clip, clip_thumbnail_path(clip.filepath)))
             
             for trigger in triggers:
                 try:
@@ -637,20 +897,35 @@ def process_segment_clips(recording_id):
                     )
                     db.session.add(clip)
                     db.session.commit()
-                    
-                    if create_clip_from_video(recording.filepath, clip_filepath, start_time, total_duration):
-                        generate_thumbnail(clip_filepath, thumbnail_path)
+                    planned.append((clip, thumbnail_path))
+                
+                except Exception as e:
+                    app.logger.error(f"Error creating clip for trigger {trigger.name}: {e}")
+                    db.session.rollback()
+            
+            # Every clip window, with its thumbnail and vertical variant, is cut from the recording in one ffmpeg pass
+            results = create_clips_from_video(
+                recording.filepath,
+                [(clip.filepath, clip.start_time, clip.duration, thumbnail_path, clip_vertical_path(clip.filepath))
+                 for clip, thumbnail_path in planned],
+                keyframe_index=keyframe_index
+            )
+            
+            for (clip, thumbnail_path), ok in zip(planned, results):
+                try:
+                    if ok:
                         clip.status = 'ready'
-                        clip.file_size = os.path.getsize(clip_filepath) if os.path.exists(clip_filepath) else 0
+                        clip.file_size = os.path.getsize(clip.filepath) if os.path.exists(clip.filepath) else 0
                         clip.thumbnail = thumbnail_path if os.path.exists(thumbnail_path) else None
                         clips_created += 1
                         created_clip_ids.append(clip.id)
                     else:
                         clip.status = 'failed'
                     db.session.commit()
-                    
+                
                 except Exception as e:
-                    app.logger.error(f"Error creating clip for trigger {trigger.name}: {e}")
+                    app.logger.error(f"Error finishing clip {clip.id}: {e}")
+                    db.session.rollback()
             
             app.logger.info(f"Created {clips_created} clips from recording {recording_id}")
             
@@ -658,37 +933,69 @@ def process_segment_clips(recording_id):
             for clip_id in created_clip_ids:
                 auto_queue_clip_for_upload(clip_id)
             
-            auto_delete_enabled = get_setting('auto_delete_recordings', 'true') == 'true'
-            
-            recording.clips_generated = clips_created > 0
-            
-            if clips_created > 0 and auto_delete_enabled:
-                try:
-                    if os.path.exists(recording.filepath):
-                        os.remove(recording.filepath)
-                        app.logger.info(f"Deleted long-form video: {recording.filepath}")
-                    recording.status = 'archived'
-                    recording.file_size = 0
-                except Exception as e:
-                    app.logger.error(f"Error deleting long-form video: {e}")
-                    recording.status = 'completed'
-            elif clips_created > 0:
-                recording.status = 'completed'
-                app.logger.info(f"Auto-delete disabled, keeping long-form video for recording {recording_id}")
-            else:
-                recording.status = 'completed'
-                app.logger.info(f"No clips created, keeping long-form video for recording {recording_id}")
-            
-            db.session.commit()
+            if not final:
+                finish_segment(recording)
         except Exception as e:
             app.logger.error(f"Error in process_segment_clips for recording {recording_id}: {e}")
             db.session.rollback()
 
+def finish_segment(recording):
+    """
+    Last step for a rotated segment once its clips are cut: delete the
+    long-form file (auto_delete_recordings) if it yielded clips, otherwise
+    keep it as 'completed'. While a live clip job is still reading the file
+    the segment waits as 'awaiting_clips', and the last of those jobs calls
+    this again.
+    """
+    if Clip.query.filter_by(recording_id=recording.id, status='processing').count():
+        recording.status = 'awaiting_clips'
+        db.session.commit()
+        app.logger.info(f"Clips still rendering, keeping long-form video for recording {recording.id} for now")
+        return
+    
+    clips_created = Clip.query.filter_by(recording_id=recording.id, status='ready').count()
+    auto_delete_enabled = get_setting('auto_delete_recordings', 'true') == 'true'
+    
+    recording.clips_generated = clips_created > 0
+    
+    if clips_created > 0 and auto_delete_enabled:
+        try:
+            if os.path.exists(recording.filepath):
+                os.remove(recording.filepath)
+                app.logger.info(f"Deleted long-form video: {recording.filepath}")
+            remove_keyframe_index(recording.filepath)
+            media_info_cache.forget(recording.filepath)
+            recording.status = 'archived'
+            recording.file_size = 0
+        except Exception as e:
+            app.logger.error(f"Error deleting long-form video: {e}")
+            recording.status = 'completed'
+    elif clips_created > 0:
+        recording.status = 'completed'
+        app.logger.info(f"Auto-delete disabled, keeping long-form video for recording {recording.id}")
+    else:
+        recording.status = 'completed'
+        app.logger.info(f"No clips created, keeping long-form video for recording {recording.id}")
+    
+    db.session.commit()
+
 # ============================================================================
 # TIKTOK UPLOAD
 # ============================================================================
 
+def claim_upload(upload_id, statuses=('queued',)):
+    """
+    Move an upload from one of statuses to 'uploading' with a compare-and-set,
+    so only one thread (or node) sends it. True if this caller got the upload.
+    """
+    claimed = Upload.query.filter(Upload.id == upload_id, Upload.status.in_(statuses)).update(
+        {Upload.status: 'uploading', Upload.progress: 0}, synchronize_session=False
+    )
+    db.session.commit()
+    return claimed == 1
+
 def upload_to_tiktok(upload_id, video_path):
+    """Send an upload the caller has claimed (claim_upload)"""
     with app.app_context():
         try:
             upload = Upload.query.get(upload_id)
@@ -714,10 +1021,6 @@ def upload_to_tiktok(upload_id, video_path):
                     db.session.commit()
                     return False
                 
-                upload.status = 'uploading'
-                upload.progress = 0
-                db.session.commit()
-                
                 # Simulate upload progress
                 for progress in range(0, 101, 10):
                     time.sleep(0.5)
@@ -731,7 +1034,7 @@ def upload_to_tiktok(upload_id, video_path):
                 db.session.commit()
                 
                 return True
-                
+            
             except Exception as e:
                 upload.status = 'failed'
                 upload.error_message = str(e)
@@ -760,38 +1063,13 @@ def auto_queue_clip_for_upload(clip_id):
                 app.logger.info(f"Auto-post skipped for clip {clip_id}: No TikTok account configured")
                 return False
             
-            total_parts = 1
-            if os.path.exists(clip.filepath):
-                duration = get_video_duration(clip.filepath)
-                if duration > 60:
-                    total_parts = int(duration // 60) + (1 if duration % 60 > 0 else 0)
-            
-            for i in range(total_parts):
-                upload = Upload(
-                    clip_id=clip_id,
-                    platform='tiktok',
-                    title=clip.title,
-                    description=f"Auto-generated clip from {clip.platform}",
-                    status='pending',
-                    part_number=i + 1,
-                    total_parts=total_parts,
-                    auto_split=True,
-                    tiktok_account_id=account_id
-                )
-                db.session.add(upload)
-            
-            db.session.commit()
-            app.logger.info(f"Auto-queued clip {clip_id} for TikTok upload ({total_parts} part(s))")
-            
-            # Start upload threads
-            uploads = Upload.query.filter_by(clip_id=clip_id, status='pending').all()
-            for upload in uploads:
-                thread = threading.Thread(
-                    target=upload_to_tiktok,
-                    args=(upload.id, clip.filepath),
-                    daemon=True
-                )
-                thread.start()
+            # The split runs as a transcode job that creates the uploads and queues them for the upload worker
+            transcode_scheduler.submit(
+                f"upload split {clip_id}", prepare_uploads, clip_id, start=True, priority='auto',
+                title=clip.title, description=f"Auto-generated clip from {clip.platform}",
+                tiktok_account_id=account_id
+            )
+            app.logger.info(f"Auto-queued clip {clip_id} for TikTok upload")
             
             return True
         except Exception as e:
@@ -807,11 +1085,12 @@ def upload_worker():
     while True:
         try:
             with app.app_context():
-                pending_uploads = Upload.query.filter_by(status='uploading').all()
+                queued_uploads = Upload.query.filter_by(status='queued').all()
                 
-                for upload in pending_uploads:
-                    if upload.clip and os.path.exists(upload.clip.filepath):
-                        upload_to_tiktok(upload.id, upload.clip.filepath)
+                for upload in queued_uploads:
+                    # Every node runs this worker: only the one whose claim succeeds sends the upload
+                    if upload.clip and os.path.exists(upload.clip.filepath) and claim_upload(upload.id):
+                        upload_to_tiktok(upload.id, upload_video_path(upload))
             
             time.sleep(5)
         except Exception as e:
@@ -824,7 +1103,7 @@ def segment_worker():
     while True:
         try:
             with app.app_context():
-                if current_recording_info.get('is_recording'):
+                if current_recording_info.get('is_recording') and current_recording_info.get('capture_mode') != 'replay_buffer':
                     segment_start = current_recording_info.get('segment_start_time')
                     if segment_start:
                         start_time = datetime.fromisoformat(segment_start)
@@ -851,7 +1130,7 @@ def segment_worker():
                                     
                                     stream_id = current_recording_info.get('stream_id')
                                     segment_num = current_recording_info.get('current_segment', 0) + 1
-                                    new_filename = f"recording_{stream_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_seg{segment_num}.mp4"
+                                    new_filename = f"recording_{stream_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_seg{segment_num}{recording_extension()}"
                                     new_filepath = os.path.join(RECORDINGS_DIR, new_filename)
                                     
                                     stream = Stream.query.get(stream_id) if stream_id else None
@@ -873,12 +1152,11 @@ def segment_worker():
                                     app.logger.info(f"Segment rotated: {new_filename}")
                                     
                                     # Process clips in background
-                                    clip_thread = threading.Thread(
-                                        target=process_segment_clips, 
-                                        args=(completed_recording_id,),
-                                        daemon=True
+                                    transcode_scheduler.submit(
+                                        f"segment clips for recording {completed_recording_id}",
+                                        process_segment_clips, completed_recording_id,
+                                        priority='auto'
                                     )
-                                    clip_thread.start()
             
             time.sleep(60)
         except Exception as e:
@@ -902,9 +1180,11 @@ def trigger_worker():
                         ).order_by(Recording.started_at.desc()).first()
                         
                         if recordings:
-                            pre_buffer = trigger.pre_buffer or smart_detection_settings.get('context_pre_buffer', 10)
-                            post_buffer = trigger.post_buffer or smart_detection_settings.get('context_post_buffer', 5)
-                            total_duration = pre_buffer + trigger.clip_duration + post_buffer
+                            pre_buffer, clip_duration, post_buffer = trigger_window(trigger)
+                            # Window within the recording, measured from when it started
+                            offset = max(0.0, (event.timestamp - recordings.started_at).total_seconds())
+                            start_time = max(0.0, offset - pre_buffer)
+                            end_time = offset + clip_duration + post_buffer
                             
                             title = f"Auto_{trigger.name}_{datetime.now().strftime('%H%M%S')}"
                             clip_filename = f"{title.replace(' ', '_')}_{int(time.time())}.mp4"
@@ -915,7 +1195,9 @@ def trigger_worker():
                                 title=title,
                                 filename=clip_filename,
                                 filepath=clip_filepath,
-                                duration=total_duration,
+                                start_time=start_time,
+                                end_time=end_time,
+                                duration=end_time - start_time,
                                 trigger_type=event.trigger_type,
                                 trigger_value=str(event.value),
                                 score=calculate_clip_score(event.trigger_type, str(event.value)),
@@ -928,15 +1210,203 @@ def trigger_worker():
                     event.processed = True
                 
                 db.session.commit()
+                
+                queue_live_clips()
+                save_replay_clips()
             
             time.sleep(5)
         except Exception as e:
             app.logger.error(f"Trigger worker error: {e}")
             time.sleep(10)
 
+def claim_clip(clip_id):
+    """
+    Move a pending clip to 'processing' with a compare-and-set, so the live
+    clip queue and the segment batch never both cut it. True if this caller
+    got the clip.
+    """
+    claimed = Clip.query.filter_by(id=clip_id, status='pending').update(
+        {Clip.status: 'processing'}, synchronize_session=False
+    )
+    db.session.commit()
+    return claimed == 1
+
+def queue_live_clips():
+    """
+    Queue pending trigger clips of recordings that are still being written,
+    once their post-buffer is on disk. Only fragmented MP4 and MKV recordings
+    can be read while growing; with plain MP4 the clips wait for the segment
+    to finish.
+    """
+    if get_recording_format() not in LIVE_CLIP_FORMATS or current_recording_info.get('capture_mode') == 'replay_buffer':
+        return
+    now = datetime.utcnow()
+    pending = Clip.query.join(Recording).filter(
+        Clip.status == 'pending',
+        Clip.end_time > 0,
+        Recording.status == 'recording'
+    ).all()
+    
+    for clip in pending:
+        recording = clip.recording
+        if now < recording.started_at + timedelta(seconds=clip.end_time + LIVE_CLIP_FLUSH_DELAY):
+            continue
+        if not written_through(recording.filepath, clip.end_time):
+            continue
+        if not claim_clip(clip.id):
+            # The segment rotated and its batch cut took the clip
+            continue
+        transcode_scheduler.submit(f"live clip {clip.id}", render_live_clip, clip.id, priority='live')
+
+def render_live_clip(clip_id):
+    """Cut a trigger clip straight out of the recording that is still in progress"""
+    with app.app_context():
+        clip = Clip.query.get(clip_id)
+        if not clip or clip.status != 'processing':
+            return
+        recording = clip.recording
+        thumbnail_path = clip_thumbnail_path(clip.filepath)
+        
+        # No keyframe index for a growing file: the cut probes keyframes around the window only
+        if create_clip_from_video(recording.filepath, clip.filepath, clip.start_time, clip.duration,
+                                  thumbnail_path=thumbnail_path, vertical_path=clip_vertical_path(clip.filepath)):
+            clip.status = 'ready'
+            clip.file_size = os.path.getsize(clip.filepath) if os.path.exists(clip.filepath) else 0
+            clip.thumbnail = thumbnail_path if os.path.exists(thumbnail_path) else None
+            db.session.commit()
+            app.logger.info(f"Live clip {clip.title} ready from recording {recording.id}")
+            auto_queue_clip_for_upload(clip.id)
+        else:
+            clip.status = 'failed'
+            db.session.commit()
+        
+        # The segment rotated while this clip was cut and left its cleanup to us
+        if recording.status == 'awaiting_clips':
+            finish_segment(recording)
+
+replay_save_lock = threading.Lock()
+
+def save_replay_clips(force=False):
+    """
+    In replay_buffer capture mode, save OBS's replay buffer once the
+    post-buffer of pending trigger clips has passed and queue their cut from
+    the saved replay. One save covers every clip that is due. force saves
+    right away (the recording is stopping). Returns True if a save was requested.
+    """
+    # The trigger worker and the stop route must not both save the same clips
+    with replay_save_lock:
+        if current_recording_info.get('capture_mode') != 'replay_buffer':
+            return False
+        recording_id = current_recording_info.get('recording_id')
+        recording = Recording.query.get(recording_id) if recording_id else None
+        if not recording:
+            return False
+        
+        now = datetime.utcnow()
+        due = [
+            clip for clip in Clip.query.filter_by(recording_id=recording.id, status='pending').all()
+            if force or now >= recording.started_at + timedelta(seconds=clip.end_time + LIVE_CLIP_FLUSH_DELAY)
+        ]
+        if not due:
+            return False
+        
+        previous_path = obs_last_replay_path()
+        success, message = obs_save_replay_buffer()
+        if not success:
+            app.logger.error(f"Could not save replay buffer: {message}")
+            return False
+        
+        # The saved replay ends now; clip windows are relative to the recording start
+        saved_at = (now - recording.started_at).total_seconds()
+        for clip in due:
+            clip.status = 'processing'
+        db.session.commit()
+        transcode_scheduler.submit(
+            f"replay clips {', '.join(str(clip.id) for clip in due)}",
+            render_replay_clips, [clip.id for clip in due], previous_path, saved_at,
+            priority='live'
+        )
+        return True
+
+def wait_for_saved_replay(previous_path, timeout=REPLAY_SAVE_TIMEOUT):
+    """Path of the replay OBS is saving once it is completely written, or None on timeout"""
+    deadline = time.time() + timeout
+    last_size = -1
+    while time.time() < deadline:
+        path = obs_last_replay_path()
+        if path and path != previous_path and os.path.exists(path):
+            size = os.path.getsize(path)
+            if size and size == last_size:
+                return path
+            last_size = size
+        time.sleep(0.5)
+    return None
+
+def render_replay_clips(clip_ids, previous_path, saved_at):
+    """Cut trigger clips out of a saved replay, then delete the replay"""
+    replay_path = wait_for_saved_replay(previous_path)
+    with app.app_context():
+        clips = Clip.query.filter(Clip.id.in_(clip_ids)).all()
+        replay_duration = get_video_duration(replay_path) if replay_path else 0
+        if not replay_duration:
+            app.logger.error(f"Replay buffer was not saved, clips {clip_ids} failed")
+            for clip in clips:
+                clip.status = 'failed'
+            db.session.commit()
+            return
+        
+        # Recording time at which the replay starts
+        replay_start = saved_at - replay_duration
+        planned = []
+        for clip in clips:
+            start = max(0.0, clip.start_time - replay_start)
+            end = min(replay_duration, clip.end_time - replay_start)
+            if end - start < 1:
+                app.logger.error(f"Clip {clip.id} is no longer in the replay buffer")
+                clip.status = 'failed'
+                continue
+            planned.append((clip, start, end - start))
+        db.session.commit()
+        
+        results = create_clips_from_video(
+            replay_path,
+            [(clip.filepath, start, duration, clip_thumbnail_path(clip.filepath), clip_vertical_path(clip.filepath))
+             for clip, start, duration in planned]
+        )
+        
+        created_clip_ids = []
+        for (clip, _, _), ok in zip(planned, results):
+            thumbnail_path = clip_thumbnail_path(clip.filepath)
+            if ok:
+                clip.status = 'ready'
+                clip.file_size = os.path.getsize(clip.filepath) if os.path.exists(clip.filepath) else 0
+                clip.thumbnail = thumbnail_path if os.path.exists(thumbnail_path) else None
+                created_clip_ids.append(clip.id)
+            else:
+                clip.status = 'failed'
+        db.session.commit()
+        
+        try:
+            os.remove(replay_path)
+        except OSError as e:
+            app.logger.warning(f"Could not delete saved replay {replay_path}: {e}")
+        media_info_cache.forget(replay_path)
+        
+        app.logger.info(f"Saved {len(created_clip_ids)} clips from the replay buffer")
+        for clip_id in created_clip_ids:
+            auto_queue_clip_for_upload(clip_id)
+
+def configure_transcode_scheduler():
+    try:
+        transcode_scheduler.set_max_jobs(int(get_setting('ffmpeg_max_jobs', default_max_jobs())))
+    except (TypeError, ValueError):
+        app.logger.warning("Invalid ffmpeg_max_jobs setting, keeping the current limit")
+
 def start_background_workers():
     global background_workers
     
+    configure_transcode_scheduler()
+    
     if background_workers['upload_worker'] is None or not background_workers['upload_worker'].is_alive():
         background_workers['upload_worker'] = threading.Thread(target=upload_worker, daemon=True)
         background_workers['upload_worker'].start()
@@ -965,9 +1435,26 @@ def start_background_workers():
             
             def __getitem__(self, key):
                 return self.get(key)
+            
+            def start_recording(self, stream_id):
+                """Auto-record a stream that went live, the same way the start route does"""
+                success, message, _ = start_recording_session(stream_id)
+                return success, message
         
         obs_wrapper = ObsWrapper()
-        stream_monitor = StreamMonitor(app, db, Stream, Settings, obs_wrapper)
+        
+        # 'asyncio' runs all checks on one event loop (needs aiohttp), 'threads' is the default
+        monitor_class = StreamMonitor
+        if (get_setting('stream_monitor_engine', 'threads') or '').lower() == 'asyncio':
+            from async_stream_monitor import AsyncStreamMonitor, aiohttp
+            if aiohttp is not None:
+                monitor_class = AsyncStreamMonitor
+            else:
+                app.logger.warning("stream_monitor_engine is 'asyncio' but aiohttp is not installed, using threads")
+        
+        stream_monitor = monitor_class(app, db, Stream, Settings, obs_wrapper, StreamEvent=StreamEvent,
+                                       settings_cache=settings_cache, MonitorShardLease=MonitorShardLease,
+                                       MonitorNode=MonitorNode)
         stream_monitor.start()
         background_workers['stream_monitor'] = stream_monitor
         app.logger.info("Stream monitor started")
@@ -1045,7 +1532,7 @@ def get_system_status():
     
     recordings_count = Recording.query.count()
     clips_count = Clip.query.count()
-    uploads_pending = Upload.query.filter_by(status='pending').count()
+    uploads_pending = Upload.query.filter(Upload.status.in_(('pending', 'queued'))).count()
     uploads_in_progress = Upload.query.filter_by(status='uploading').count()
     
     workers_status = {
@@ -1120,6 +1607,9 @@ def update_stream(stream_id):
     
     stream.name = data.get('name', stream.name)
     stream.platform = data.get('platform', stream.platform)
+    if 'channel_url' in data and data['channel_url'] != stream.channel_url and 'channel_id' not in data:
+        # Drop any channel ID resolved from the old URL so it is looked up again
+        stream.channel_id = data['channel_url'].split('/')[-1] if data['channel_url'] else None
     stream.channel_url = data.get('channel_url', stream.channel_url)
     stream.channel_id = data.get('channel_id', stream.channel_id)
     stream.auto_record = data.get('auto_record', stream.auto_record)
@@ -1167,6 +1657,9 @@ def check_stream_live(id):
     try:
         is_live = stream_monitor._check_stream_live(stream)
         
+        # Persist anything resolved during the check (e.g. YouTube channel ID)
+        db.session.commit()
+        
         return jsonify({
             'status': 'success',
             'is_live': is_live,
@@ -1205,10 +1698,89 @@ def get_stream_monitor_status():
     if stream_monitor:
         return jsonify({
             'running': stream_monitor.running,
-            'check_interval': stream_monitor.check_interval
+            'engine': stream_monitor.engine,
+            'check_interval': stream_monitor.check_interval,
+            'workers': stream_monitor.workers,
+            'schedule': stream_monitor.schedule_status(),
+            'youtube_quota': stream_monitor.youtube_quota.status(),
+            'sharding': stream_monitor.sharding.status() if stream_monitor.sharding else None,
+            'circuit_breakers': stream_monitor.http.breaker_status()
         })
     return jsonify({'running': False, 'check_interval': 0})
 
+@app.route('/api/stream-monitor/metrics', methods=['GET'])
+@handle_errors
+def get_stream_monitor_metrics():
+    stream_monitor = background_workers.get('stream_monitor')
+    if stream_monitor:
+        metrics = stream_monitor.metrics.snapshot()
+        metrics['http_cache'] = dict(stream_monitor.http.cache_stats)
+        metrics['rate_limits'] = stream_monitor.http.rate_limit_status()
+        return jsonify(metrics)
+    return jsonify({'error': 'Stream monitor not running'}), 404
+
+# ============================================================================
+# ROUTES - WEBHOOKS
+# ============================================================================
+
+eventsub_receiver = EventSubReceiver()
+
+@app.route('/api/webhooks/twitch/eventsub', methods=['POST'])
+@handle_errors
+def twitch_eventsub_webhook():
+    """Twitch EventSub webhook: stream.online / stream.offline push notifications"""
+    body = request.get_data()
+    try:
+        message_type, payload, duplicate = eventsub_receiver.verify(
+            request.headers, body, get_setting('twitch_eventsub_secret')
+        )
+    except EventSubError as e:
+        app.logger.warning(f"Rejected EventSub message: {e}")
+        return jsonify({'error': str(e)}), e.status
+    
+    # Twitch retries until it gets a 2xx, so redeliveries are acknowledged and dropped
+    if duplicate:
+        return '', 204
+    
+    stream_monitor = background_workers.get('stream_monitor')
+    if message_type == MESSAGE_VERIFICATION:
+        # Answering the challenge enables the subscription: from now on its streams get pushes
+        if stream_monitor:
+            condition = payload.get('subscription', {}).get('condition', {})
+            stream_monitor.handle_subscription_verified('twitch', None, condition.get('broadcaster_user_id'))
+        return payload.get('challenge', ''), 200, {'Content-Type': 'text/plain'}
+    
+    message_id = request.headers.get(HEADER_MESSAGE_ID)
+    if not stream_monitor:
+        eventsub_receiver.forget(message_id)
+        return jsonify({'error': 'Stream monitor not running'}), 503
+    
+    try:
+        subscription = payload.get('subscription', {})
+        
+        if message_type == MESSAGE_REVOCATION:
+            condition = subscription.get('condition', {})
+            streams = stream_monitor.handle_subscription_revoked('twitch', None, condition.get('broadcaster_user_id'))
+            app.logger.warning(f"EventSub subscription revoked ({subscription.get('status')}), "
+                               f"polling {len(streams)} stream(s) again")
+            return '', 204
+        
+        if message_type == MESSAGE_NOTIFICATION:
+            event = payload.get('event', {})
+            event_type = subscription.get('type') or request.headers.get(HEADER_SUBSCRIPTION_TYPE)
+            if event_type in ('stream.online', 'stream.offline'):
+                stream_monitor.handle_live_event(
+                    'twitch',
+                    event.get('broadcaster_user_login'),
+                    event_type == 'stream.online',
+                    started_at=event.get('started_at'),
+                    channel_id=event.get('broadcaster_user_id')
+                )
+        return '', 204
+    except Exception:
+        eventsub_receiver.forget(message_id)
+        raise
+
 # ============================================================================
 # ROUTES - RECORDINGS
 # ============================================================================
@@ -1242,6 +1814,8 @@ def delete_recording(recording_id):
             os.remove(recording.filepath)
         except Exception as e:
             app.logger.error(f"Error deleting recording file: {e}")
+    remove_keyframe_index(recording.filepath)
+    media_info_cache.forget(recording.filepath)
     
     db.session.delete(recording)
     db.session.commit()
@@ -1279,6 +1853,7 @@ def get_clips():
         'status': c.status,
         'score': c.score,
         'platform': c.platform or 'twitch',
+        'vertical': os.path.exists(vertical_path_for(c.filepath)),
         'created_at': c.created_at.isoformat() if c.created_at else None,
         'upload_count': len(c.uploads)
     } for c in clips])
@@ -1324,8 +1899,9 @@ def create_clip():
                 clip = Clip.query.get(clip_id)
                 if clip:
                     if os.path.exists(recording.filepath):
-                        if create_clip_from_video(recording.filepath, clip_filepath, start_time, duration):
-                            generate_thumbnail(clip_filepath, thumbnail_path)
+                        if create_clip_from_video(recording.filepath, clip_filepath, start_time, duration,
+                                                  thumbnail_path=thumbnail_path,
+                                                  vertical_path=clip_vertical_path(clip_filepath)):
                             clip.status = 'ready'
                             clip.file_size = os.path.getsize(clip_filepath) if os.path.exists(clip_filepath) else 0
                             clip.thumbnail = thumbnail_path if os.path.exists(thumbnail_path) else None
@@ -1337,10 +1913,21 @@ def create_clip():
             except Exception as e:
                 app.logger.error(f"Error processing clip {clip_id}: {e}")
     
-    thread = threading.Thread(target=process_clip, daemon=True)
-    thread.start()
+    job = transcode_scheduler.submit(f"clip {clip_id}", process_clip, priority='manual')
     
-    return jsonify({'id': clip_id, 'message': 'Clip creation started'})
+    return jsonify({'id': clip_id, 'job_id': job.id, 'message': 'Clip creation started'})
+
+@app.route('/api/ffmpeg/jobs', methods=['GET'])
+@handle_errors
+def get_ffmpeg_jobs():
+    return jsonify(dict(transcode_scheduler.status(), probe_cache=media_info_cache.stats()))
+
+@app.route('/api/ffmpeg/jobs/<int:job_id>', methods=['DELETE'])
+@handle_errors
+def cancel_ffmpeg_job(job_id):
+    if not transcode_scheduler.cancel(job_id):
+        return jsonify({'error': 'Job not found or already finished'}), 404
+    return jsonify({'message': 'Job cancelled'})
 
 @app.route('/api/clips/<int:clip_id>', methods=['DELETE'])
 @handle_errors
@@ -1352,6 +1939,14 @@ def delete_clip(clip_id):
             os.remove(clip.filepath)
         except Exception as e:
             app.logger.error(f"Error deleting clip file: {e}")
+    media_info_cache.forget(clip.filepath)
+    
+    vertical_path = vertical_path_for(clip.filepath)
+    if os.path.exists(vertical_path):
+        try:
+            os.remove(vertical_path)
+        except Exception as e:
+            app.logger.error(f"Error deleting vertical clip: {e}")
     
     if clip.thumbnail and os.path.exists(clip.thumbnail):
         try:
@@ -1408,30 +2003,22 @@ def create_upload():
             account_id = None
     
     clip = Clip.query.get_or_404(clip_id)
+    fields = {
+        'title': data.get('title', clip.title),
+        'description': data.get('description', ''),
+        'tiktok_account_id': account_id if platform == 'tiktok' else None
+    }
     
-    total_parts = 1
-    if platform == 'tiktok' and auto_split and os.path.exists(clip.filepath):
-        duration = get_video_duration(clip.filepath)
-        if duration > 60:
-            total_parts = int(duration // 60) + (1 if duration % 60 > 0 else 0)
-    
-    uploads = []
-    for i in range(total_parts):
-        upload = Upload(
-            clip_id=clip_id,
-            platform=platform,
-            title=data.get('title', clip.title),
-            description=data.get('description', ''),
-            status='pending',
-            part_number=i + 1,
-            total_parts=total_parts,
-            auto_split=auto_split,
-            tiktok_account_id=account_id if platform == 'tiktok' else None
-        )
-        db.session.add(upload)
-        uploads.append(upload)
+    # Splitting for TikTok runs ffmpeg: the uploads are created by a job once it is done
+    if platform == 'tiktok' and auto_split:
+        job = transcode_scheduler.submit(f"upload split {clip_id}", prepare_uploads, clip_id, platform,
+                                         auto_split, priority='manual', **fields)
+        return jsonify({
+            'message': 'Splitting clip, uploads are created when it finishes',
+            'job_id': job.id
+        }), 202
     
-    db.session.commit()
+    uploads = create_uploads(clip_id, 1, platform, auto_split, **fields)
     return jsonify({
         'message': f'Created {len(uploads)} upload(s)',
         'upload_ids': [u.id for u in uploads]
@@ -1458,9 +2045,13 @@ def update_upload(upload_id):
 @handle_errors
 def start_upload(upload_id):
     upload = Upload.query.get_or_404(upload_id)
+    video_path = upload_video_path(upload)
+    
+    if not claim_upload(upload_id, statuses=('pending', 'queued', 'failed')):
+        return jsonify({'error': 'Upload is already in progress or completed'}), 409
     
     def process_upload():
-        upload_to_tiktok(upload_id, upload.clip.filepath if upload.clip else None)
+        upload_to_tiktok(upload_id, video_path)
     
     thread = threading.Thread(target=process_upload, daemon=True)
     thread.start()
@@ -1620,7 +2211,10 @@ def manage_platform_settings():
         return jsonify({
             'twitch_client_id': get_setting('twitch_client_id', ''),
             'twitch_client_secret': get_setting('twitch_client_secret', ''),
-            'youtube_api_key': get_setting('youtube_api_key', '')
+            'twitch_eventsub_secret': get_setting('twitch_eventsub_secret', ''),
+            'youtube_api_key': get_setting('youtube_api_key', ''),
+            'youtube_detection_strategy': get_setting('youtube_detection_strategy', 'auto'),
+            'youtube_daily_quota': get_setting('youtube_daily_quota', '10000')
         })
     else:
         data = request.json
@@ -1628,8 +2222,14 @@ def manage_platform_settings():
             set_setting('twitch_client_id', data['twitch_client_id'])
         if 'twitch_client_secret' in data:
             set_setting('twitch_client_secret', data['twitch_client_secret'])
+        if 'twitch_eventsub_secret' in data:
+            set_setting('twitch_eventsub_secret', data['twitch_eventsub_secret'])
         if 'youtube_api_key' in data:
             set_setting('youtube_api_key', data['youtube_api_key'])
+        if 'youtube_detection_strategy' in data:
+            set_setting('youtube_detection_strategy', data['youtube_detection_strategy'])
+        if 'youtube_daily_quota' in data:
+            set_setting('youtube_daily_quota', str(data['youtube_daily_quota']))
         return jsonify({'status': 'success', 'message': 'Platform settings updated'})
 
 # ============================================================================
@@ -1659,60 +2259,90 @@ def get_obs_status():
         'obs_recording_status': recording_status
     })
 
-@app.route('/api/obs/start-recording', methods=['POST'])
-@handle_errors
-def start_obs_recording():
+def start_recording_session(stream_id=None):
+    """
+    Start capturing a stream according to capture_mode and create the
+    Recording row clips are attached to. segments: OBS records in the
+    configured recording_format. replay_buffer: OBS's replay buffer is
+    enabled instead and nothing is written until a clip is saved. Shared by
+    the start route and the stream monitor's auto-record. Returns
+    (success, message, recording); without an OBS connection the row is
+    still created.
+    """
     global current_recording_info
     
-    data = request.json or {}
-    stream_id = data.get('stream_id')
+    capture_mode = get_capture_mode()
+    if capture_mode == 'replay_buffer':
+        success, message = obs_start_replay_buffer(replay_buffer_seconds())
+    else:
+        success, message = obs_start_recording()
+    if not success and obs_connected:
+        return False, message, None
     
-    success, message = obs_start_recording()
+    stream = Stream.query.get(stream_id) if stream_id else None
+    platform = stream.platform if stream else 'twitch'
     
-    if success or not obs_connected:
-        stream = Stream.query.get(stream_id) if stream_id else None
-        platform = stream.platform if stream else 'twitch'
-        
-        filename = f"recording_{stream_id or 'manual'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-        filepath = os.path.join(RECORDINGS_DIR, filename)
-        
-        recording = Recording(
-            stream_id=stream_id or 1,
-            filename=filename,
-            filepath=filepath,
-            segment_number=1,
-            status='recording',
-            platform=platform
-        )
-        db.session.add(recording)
+    if capture_mode == 'replay_buffer':
+        # Nothing is written here; the row anchors trigger clips to the stream and start time
+        filename = f"replay_{stream_id or 'manual'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    else:
+        filename = f"recording_{stream_id or 'manual'}_{datetime.now().strftime('%Y%m%d_%H%M%S')}{recording_extension()}"
+    filepath = os.path.join(RECORDINGS_DIR, filename)
+    
+    recording = Recording(
+        stream_id=stream_id or 1,
+        filename=filename,
+        filepath=filepath,
+        segment_number=1,
+        status='recording',
+        platform=platform
+    )
+    db.session.add(recording)
+    db.session.commit()
+    
+    current_recording_info = {
+        'is_recording': True,
+        'current_segment': 1,
+        'segment_start_time': datetime.now().isoformat(),
+        'stream_id': stream_id,
+        'recording_id': recording.id,
+        'capture_mode': capture_mode
+    }
+    
+    if stream:
+        stream.is_recording = True
         db.session.commit()
-        
-        current_recording_info = {
-            'is_recording': True,
-            'current_segment': 1,
-            'segment_start_time': datetime.now().isoformat(),
-            'stream_id': stream_id,
-            'recording_id': recording.id
-        }
-        
-        if stream:
-            stream.is_recording = True
-            db.session.commit()
-        
-        return jsonify({
-            'message': 'Recording started',
-            'recording_id': recording.id,
-            'obs_connected': obs_connected
-        })
     
-    return jsonify({'error': message}), 500
+    return True, 'Recording started', recording
+
+@app.route('/api/obs/start-recording', methods=['POST'])
+@handle_errors
+def start_obs_recording():
+    data = request.json or {}
+    success, message, recording = start_recording_session(data.get('stream_id'))
+    if not success:
+        return jsonify({'error': message}), 500
+    return jsonify({
+        'message': message,
+        'recording_id': recording.id,
+        'capture_mode': current_recording_info.get('capture_mode'),
+        'obs_connected': obs_connected
+    })
 
 @app.route('/api/obs/stop-recording', methods=['POST'])
 @handle_errors
 def stop_obs_recording():
     global current_recording_info
     
-    success, message = obs_stop_recording()
+    if current_recording_info.get('capture_mode') == 'replay_buffer':
+        # Clips still inside their post-buffer get what was captured so far
+        previous_path = obs_last_replay_path()
+        if save_replay_clips(force=True):
+            # Stopping the buffer mid-save would lose the replay
+            wait_for_saved_replay(previous_path)
+        success, message = obs_stop_replay_buffer()
+    else:
+        success, message = obs_stop_recording()
     
     recording_id = current_recording_info.get('recording_id')
     stream_id = current_recording_info.get('stream_id')
@@ -1726,6 +2356,15 @@ def stop_obs_recording():
                 start = datetime.fromisoformat(current_recording_info['segment_start_time'])
                 recording.duration = (datetime.now() - start).total_seconds()
             db.session.commit()
+            
+            # Trigger clips the live queue has not cut yet would otherwise wait for a rotation that never comes
+            if (current_recording_info.get('capture_mode') != 'replay_buffer'
+                    and Clip.query.filter_by(recording_id=recording.id, status='pending').count()):
+                transcode_scheduler.submit(
+                    f"final clips for recording {recording.id}",
+                    process_segment_clips, recording.id, final=True,
+                    priority='live'
+                )
     
     if stream_id:
         stream = Stream.query.get(stream_id)
@@ -1738,7 +2377,8 @@ def stop_obs_recording():
         'current_segment': 0,
         'segment_start_time': None,
         'stream_id': None,
-        'recording_id': None
+        'recording_id': None,
+        'capture_mode': None
     }
     
     return jsonify({'message': 'Recording stopped', 'obs_connected': obs_connected})
@@ -1750,8 +2390,7 @@ def stop_obs_recording():
 @app.route('/api/settings', methods=['GET'])
 @handle_errors
 def get_settings_route():
-    settings = Settings.query.all()
-    return jsonify({s.key: s.value for s in settings})
+    return jsonify(settings_cache.all())
 
 @app.route('/api/settings', methods=['PUT'])
 @handle_errors
@@ -1759,6 +2398,8 @@ def update_settings():
     data = request.json
     for key, value in data.items():
         set_setting(key, str(value))
+    if 'ffmpeg_max_jobs' in data:
+        configure_transcode_scheduler()
     return jsonify({'message': 'Settings updated successfully'})
 
 @app.route('/api/settings/categories', methods=['GET'])
@@ -1767,10 +2408,15 @@ def get_settings_categories():
     """Get organized settings categories"""
     return jsonify({
         'obs': ['obs_host', 'obs_port', 'obs_password'],
-        'recording': ['auto_delete_recordings', 'segment_duration', 'recordings_dir', 'clips_dir'],
-        'tiktok': ['auto_post_tiktok', 'default_tiktok_account'],
-        'platforms': ['twitch_client_id', 'twitch_client_secret', 'youtube_api_key'],
-        'stream_monitor': ['check_interval', 'auto_start_recording']
+        'recording': ['auto_delete_recordings', 'segment_duration', 'recordings_dir', 'clips_dir', 'clip_cut_mode',
+                      'ffmpeg_max_jobs', 'recording_format', 'capture_mode'],
+        'tiktok': ['auto_post_tiktok', 'default_tiktok_account', 'tiktok_vertical_clips'],
+        'platforms': ['twitch_client_id', 'twitch_client_secret', 'twitch_eventsub_secret', 'youtube_api_key',
+                      'youtube_detection_strategy', 'youtube_daily_quota'],
+        'stream_monitor': ['stream_monitor_engine', 'check_interval', 'stream_monitor_min_interval',
+                           'stream_monitor_max_interval', 'stream_monitor_reconcile_interval',
+                           'stream_monitor_shards', 'stream_monitor_lease_ttl', 'auto_start_recording', 'stream_monitor_twitch_workers',
+                           'stream_monitor_youtube_workers', 'stream_monitor_kick_workers']
     })
 
 @app.route('/api/settings/recording', methods=['GET', 'PUT'])
@@ -1782,13 +2428,28 @@ def manage_recording_settings():
             'segment_duration': get_setting('segment_duration', '3600'),
             'recordings_dir': get_setting('recordings_dir', RECORDINGS_DIR),
             'clips_dir': get_setting('clips_dir', CLIPS_DIR),
-            'auto_post_tiktok': get_setting('auto_post_tiktok', 'false')
+            'auto_post_tiktok': get_setting('auto_post_tiktok', 'false'),
+            'clip_cut_mode': get_setting('clip_cut_mode', DEFAULT_CLIP_CUT_MODE),
+            'ffmpeg_max_jobs': get_setting('ffmpeg_max_jobs', str(default_max_jobs())),
+            'tiktok_vertical_clips': get_setting('tiktok_vertical_clips', 'false'),
+            'recording_format': get_recording_format(),
+            'capture_mode': get_capture_mode()
         })
     else:
         data = request.json
-        for key in ['auto_delete_recordings', 'segment_duration', 'recordings_dir', 'clips_dir', 'auto_post_tiktok']:
+        if 'clip_cut_mode' in data and data['clip_cut_mode'] not in CLIP_CUT_MODES:
+            return jsonify({'error': f"clip_cut_mode must be one of {', '.join(CLIP_CUT_MODES)}"}), 400
+        if 'recording_format' in data and data['recording_format'] not in RECORDING_FORMATS:
+            return jsonify({'error': f"recording_format must be one of {', '.join(RECORDING_FORMATS)}"}), 400
+        if 'capture_mode' in data and data['capture_mode'] not in CAPTURE_MODES:
+            return jsonify({'error': f"capture_mode must be one of {', '.join(CAPTURE_MODES)}"}), 400
+        for key in ['auto_delete_recordings', 'segment_duration', 'recordings_dir', 'clips_dir', 'auto_post_tiktok',
+                    'clip_cut_mode', 'ffmpeg_max_jobs', 'tiktok_vertical_clips', 'recording_format',
+                    'capture_mode']:
             if key in data:
                 set_setting(key, str(data[key]))
+        if 'ffmpeg_max_jobs' in data:
+            configure_transcode_scheduler()
         return jsonify({'message': 'Recording settings updated'})
 
 @app.route('/api/settings/tiktok', methods=['GET'])
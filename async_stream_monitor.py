@@ -0,0 +1,456 @@
+import asyncio
+import json
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from platform_http import MAX_RATE_LIMIT_WAIT, CircuitOpen, RateLimited, without_validators
+from stream_monitor import (
+    OFFLINE, YOUTUBE_CHANNEL_ID_RE, StreamMonitor, _batch_max_age, _kick_live_status, _live_video_channels,
+    _stale_twitch_token, _statuses_by_name, _twitch_chunk_statuses, _twitch_live_logins, _twitch_login_chunks,
+    _twitch_streams_params, _upload_video_ids, _youtube_live_from_videos, _youtube_page_status,
+    _youtube_stream_statuses, _youtube_uploads_params, _youtube_video_batches, _youtube_videos_params
+)
+
+# Concurrent requests per platform; one coroutine per request instead of one thread
+DEFAULT_ASYNC_CONCURRENCY = {'twitch': 8, 'youtube': 64, 'kick': 64}
+
+REQUEST_TIMEOUT = 10
+
+BROWSER_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
+
+# Plain copy of the Stream columns a check needs, safe to hand to the event loop
+StreamTarget = namedtuple('StreamTarget', 'id name platform channel_id channel_url')
+
+
+class _LoopWake:
+    """threading.Event-like wake-up for the event loop; set() may be called from any thread"""
+    
+    def __init__(self):
+        self.loop = None
+        self.event = None
+    
+    def set(self):
+        if self.loop is not None and self.event is not None:
+            self.loop.call_soon_threadsafe(self.event.set)
+    
+    def clear(self):
+        if self.event is not None:
+            self.event.clear()
+
+
+class AsyncStreamMonitor(StreamMonitor):
+    """
+    StreamMonitor engine running every platform check on one asyncio event
+    loop with aiohttp, so thousands of checks can be in flight without a
+    thread each. Scheduling, status changes, recording and metrics are
+    inherited; all database work runs on a single writer thread (with its
+    own app context) so the loop never blocks on SQL. stop() cancels the
+    loop's current wait or cycle immediately.
+    Selected with the stream_monitor_engine = asyncio setting.
+    """
+    engine = 'asyncio'
+    
+    def __init__(self, *args, **kwargs):
+        if aiohttp is None:
+            raise RuntimeError("AsyncStreamMonitor requires aiohttp (pip install aiohttp)")
+        super().__init__(*args, **kwargs)
+        self.concurrency = dict(DEFAULT_ASYNC_CONCURRENCY)
+        self._loop = None
+        self._task = None
+        self._session = None
+        self._limits = {}
+        self._db_executor = None
+        self._wake = _LoopWake()
+    
+    def start(self):
+        """Start the event loop thread"""
+        if not self.running:
+            self.running = True
+            self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='monitor-db')
+            self.thread = threading.Thread(target=self._run_loop, daemon=True)
+            self.thread.start()
+            self._log("Stream monitor started (asyncio engine)")
+    
+    def stop(self):
+        """Cancel the running cycle or wait and stop the event loop thread"""
+        self.running = False
+        loop, task = self._loop, self._task
+        if loop is not None and task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # Loop already closed
+                pass
+        if self.thread:
+            self.thread.join(timeout=5)
+        if self._db_executor is not None:
+            self._db_executor.shutdown(wait=False)
+            self._db_executor = None
+        self._log("Stream monitor stopped")
+    
+    def _run_loop(self):
+        try:
+            asyncio.run(self._main())
+        except Exception as e:
+            self._log(f"Stream monitor event loop error: {e}")
+    
+    async def _main(self):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._wake.loop = self._loop
+        self._wake.event = asyncio.Event()
+        
+        await self._in_db(self._load_concurrency)
+        self._limits = {platform: asyncio.Semaphore(limit) for platform, limit in self.concurrency.items()}
+        
+        connector = aiohttp.TCPConnector(limit=sum(self.concurrency.values()), ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        try:
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                self._session = session
+                while self.running:
+                    # Cleared before the cycle so a wake-up during it isn't lost
+                    self._wake.clear()
+                    await self._cycle()
+                    
+                    # Wait until the next stream is due (or stop()/wake-up)
+                    try:
+                        await asyncio.wait_for(self._wake.event.wait(), self._seconds_until_next_check())
+                    except asyncio.TimeoutError:
+                        pass
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._session = None
+            if self.sharding is not None:
+                try:
+                    await asyncio.shield(self._in_db(self.sharding.release))
+                except Exception as e:
+                    self._log(f"Error releasing shard leases: {e}")
+    
+    async def _cycle(self):
+        try:
+            due, config = await self._in_db(self._load_due_targets)
+            if not due:
+                return
+            
+            cycle_start = time.monotonic()
+            results = await self._check_targets(due, config)
+            await self._in_db(self._apply_target_results, due, results, cycle_start)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._log(f"Stream monitor error: {e}")
+    
+    # ------------------------------------------------------------------
+    # Database side (writer thread, inside an app context)
+    # ------------------------------------------------------------------
+    
+    async def _in_db(self, fn, *args):
+        """Run fn on the database writer thread inside an app context"""
+        return await self._loop.run_in_executor(self._db_executor, self._with_app_context, fn, *args)
+    
+    def _with_app_context(self, fn, *args):
+        with self.app.app_context():
+            try:
+                return fn(*args)
+            except Exception:
+                self.db.session.rollback()
+                raise
+    
+    def _load_concurrency(self):
+        for platform, default in DEFAULT_ASYNC_CONCURRENCY.items():
+            value = self._get_setting(f'stream_monitor_{platform}_workers')
+            self.concurrency[platform] = max(1, int(value)) if value and value.isdigit() else default
+            self.workers[platform] = self.concurrency[platform]
+    
+    def _load_due_targets(self):
+        """Due streams as plain StreamTargets plus the credentials the checks need"""
+        due = self._load_due_streams()
+        self._load_youtube_settings()
+        config = {
+            'twitch_client_id': self._get_setting('twitch_client_id'),
+            'twitch_client_secret': self._get_setting('twitch_client_secret'),
+            'youtube_api_key': self._get_setting('youtube_api_key')
+        }
+        targets = [
+            StreamTarget(s.id, s.name, (s.platform or '').lower(), s.channel_id, s.channel_url)
+            for s in due
+        ]
+        return targets, config
+    
+    def _apply_target_results(self, targets, results, cycle_start):
+        ids = [target.id for target in targets]
+        streams = self.Stream.query.filter(self.Stream.id.in_(ids)).all()
+        for stream in streams:
+            if (stream.platform or '').lower() == 'youtube':
+                self._store_youtube_channel_id(stream)
+        
+        # Streams deleted mid-cycle drop out of the schedule on the next pass
+        self._apply_results(streams, results, cycle_start)
+    
+    # ------------------------------------------------------------------
+    # Platform checks (event loop)
+    # ------------------------------------------------------------------
+    
+    async def _check_targets(self, targets, config):
+        """Async counterpart of StreamMonitor._check_streams; returns {stream_id: LiveStatus}"""
+        by_platform = {}
+        for target in targets:
+            by_platform.setdefault(target.platform, []).append(target)
+        
+        jobs = []
+        if by_platform.get('twitch'):
+            jobs.append(self._check_twitch_targets(
+                by_platform.pop('twitch'), config['twitch_client_id'], config['twitch_client_secret']
+            ))
+        if by_platform.get('youtube'):
+            jobs.append(self._check_youtube_targets(by_platform.pop('youtube'), config['youtube_api_key']))
+        if by_platform.get('kick'):
+            jobs.append(self._check_kick_targets(by_platform.pop('kick')))
+        
+        results = {}
+        for outcome in await asyncio.gather(*jobs, return_exceptions=True):
+            if isinstance(outcome, BaseException):
+                self._log(f"Stream check error: {outcome}")
+            else:
+                results.update(outcome)
+        
+        for platform, unknown in by_platform.items():
+            self._log(f"Unknown platform: {platform}")
+            results.update({t.id: OFFLINE for t in unknown})
+        
+        for platform in ('twitch', 'youtube', 'kick'):
+            checked = [t for t in targets if t.platform == platform]
+            if checked:
+                self.metrics.observe_checks(platform, len(checked), sum(1 for t in checked if t.id not in results))
+        
+        return results
+    
+    async def _request(self, url, read, headers=None, params=None, cookies=None, read_any=False):
+        """
+        GET url through the platform's concurrency limit and rate-limit bucket.
+        Returns (status, await read(response)) for 200 responses (any status
+        with read_any), (status, None) otherwise. A 429 is retried once if the
+        platform's wait is short.
+        """
+        platform = self.http.platform_for(url)
+        bucket = self.http.bucket(platform, self.http.credential_for(headers, params))
+        limit = self._limits.get(platform)
+        host, breaker = self.http.breaker(url)
+        
+        for attempt in range(2):
+            if not breaker.allow():
+                raise CircuitOpen(host, breaker.retry_in())
+            
+            if bucket is not None:
+                delay = bucket.reserve(max_wait=MAX_RATE_LIMIT_WAIT)
+                if delay > MAX_RATE_LIMIT_WAIT:
+                    raise RateLimited(platform, delay)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            
+            if limit is not None:
+                await limit.acquire()
+            started = time.monotonic()
+            try:
+                async with self._session.get(url, headers=headers, params=params, cookies=cookies) as response:
+                    self.http.record_outcome(breaker, status_code=response.status)
+                    self.metrics.observe_request(platform, time.monotonic() - started, status_code=response.status)
+                    if bucket is not None and self.http.note_response(bucket, response.status, response.headers):
+                        continue
+                    if response.status != 200 and not read_any:
+                        return response.status, None
+                    return response.status, await read(response)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.http.record_outcome(breaker, error=e)
+                self.metrics.observe_request(platform, time.monotonic() - started, error=e)
+                raise
+            finally:
+                if limit is not None:
+                    limit.release()
+        return 429, None
+    
+    async def _get_parsed(self, url, parse, headers=None, params=None, max_age=None):
+        """
+        Conditional GET through the shared response cache, like
+        PlatformHttp.get_parsed: fresh entries (at most max_age seconds old)
+        send nothing, others revalidate with ETag / Last-Modified, and
+        parse(body) only runs when the body changed.
+        """
+        key, entry, cached, headers = self.http.cache_lookup(url, params, headers)
+        if cached is not None:
+            return cached
+        status, raw = await self._request(url, self._read_raw, headers=headers, params=params, read_any=True)
+        if status == 304 and entry is None:
+            # Nothing cached to reuse (validators came from the caller): ask for the body
+            status, raw = await self._request(url, self._read_raw, headers=without_validators(headers),
+                                              params=params, read_any=True)
+        response_headers, body = raw or ({}, b'')
+        return self.http.cache_update(key, entry, status, response_headers, body, lambda: parse(body),
+                                      max_age=max_age)
+    
+    @staticmethod
+    async def _read_raw(response):
+        return response.headers, await response.read()
+    
+    @staticmethod
+    async def _read_json(response):
+        return await response.json(content_type=None)
+    
+    @staticmethod
+    async def _read_text(response):
+        return await response.text()
+    
+    async def _blocking(self, fn, *args):
+        """Run a rarely needed synchronous helper (token fetch, channel lookup) off the loop"""
+        return await self._loop.run_in_executor(None, fn, *args)
+    
+    async def _check_twitch_targets(self, targets, client_id, client_secret):
+        if not client_id:
+            self._log("Twitch client ID not configured")
+            return {}
+        
+        chunks = _twitch_login_chunks(t.name for t in targets)
+        live = _twitch_chunk_statuses(chunks, await asyncio.gather(
+            *(self._fetch_twitch_chunk(chunk, client_id, client_secret) for chunk in chunks)
+        ))
+        return _statuses_by_name([(t.id, t.name) for t in targets], live)
+    
+    async def _fetch_twitch_chunk(self, logins, client_id, client_secret):
+        """One Helix /streams call for up to 100 logins; {live login: started_at} or None"""
+        try:
+            headers = await self._blocking(self._twitch_headers, client_id, client_secret)
+            params = _twitch_streams_params(logins)
+            status, payload = await self._request('https://api.twitch.tv/helix/streams', self._read_json,
+                                                  headers=headers, params=params)
+            
+            # Token revoked or expired early - refresh once and retry
+            if status == 401 and client_secret:
+                headers = await self._blocking(self._twitch_headers, client_id, client_secret,
+                                               _stale_twitch_token(headers))
+                status, payload = await self._request('https://api.twitch.tv/helix/streams', self._read_json,
+                                                      headers=headers, params=params)
+            
+            if status != 200:
+                self._log(f"Twitch API returned status {status} for {len(logins)} channel(s)")
+                return None
+            return _twitch_live_logins(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._log(f"Twitch API error for {len(logins)} channel(s): {e}")
+            return None
+    
+    async def _check_kick_targets(self, targets):
+        async def status_for(target):
+            try:
+                response = await self._get_parsed(
+                    f'https://kick.com/api/v2/channels/{target.name}',
+                    lambda body: _kick_live_status(json.loads(body)),
+                    headers=BROWSER_HEADERS,
+                    max_age=self._cache_max_age([target.id])
+                )
+                if response.status_code == 200:
+                    return response.value
+                self._log(f"Kick API returned status {response.status_code} for '{target.name}'")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"Kick API error for '{target.name}': {e}")
+            return None
+        
+        statuses = await asyncio.gather(*(status_for(t) for t in targets))
+        return {t.id: status for t, status in zip(targets, statuses) if status is not None}
+    
+    async def _check_youtube_targets(self, targets, api_key):
+        async def resolve(target):
+            # Known channel IDs need no lookup: skip the hop to the executor
+            if YOUTUBE_CHANNEL_ID_RE.match(target.channel_id or ''):
+                return target.channel_id
+            return await self._blocking(self._youtube_target_channel_id, target.channel_id, target.channel_url, api_key)
+        
+        channel_ids = dict(zip([t.id for t in targets], await asyncio.gather(*(resolve(t) for t in targets))))
+        unique = sorted({c for c in channel_ids.values() if c})
+        
+        live_channels = {}
+        if unique:
+            strategy = self._youtube_strategy(len(unique), api_key)
+            if strategy == 'api':
+                live_channels = await self._youtube_uploads_async(
+                    unique, api_key, self._channel_max_ages(channel_ids)
+                )
+            elif strategy == 'search':
+                # 100 units per channel: only used for a handful of channels
+                live_channels = await self._blocking(self._youtube_live_via_search, unique, api_key)
+            else:
+                live_channels = await self._youtube_page_async(unique)
+        
+        return _youtube_stream_statuses(channel_ids, live_channels)
+    
+    async def _youtube_page_async(self, channel_ids):
+        async def page_status(channel_id):
+            try:
+                status, html = await self._request(
+                    f'https://www.youtube.com/channel/{channel_id}/live',
+                    self._read_text,
+                    headers=dict(BROWSER_HEADERS, **{'Accept-Language': 'en-US,en;q=0.9'}),
+                    cookies={'CONSENT': 'YES+1'}
+                )
+                if status == 200:
+                    return _youtube_page_status(html)
+                self._log(f"YouTube live page returned status {status} for {channel_id}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"YouTube live page error for {channel_id}: {e}")
+            return None
+        
+        statuses = await asyncio.gather(*(page_status(c) for c in channel_ids))
+        return {c: status for c, status in zip(channel_ids, statuses) if status is not None}
+    
+    async def _youtube_uploads_async(self, channel_ids, api_key, max_ages=None):
+        max_ages = max_ages or {}
+        
+        async def recent_uploads(channel_id):
+            try:
+                response = await self._get_parsed(
+                    'https://www.googleapis.com/youtube/v3/playlistItems',
+                    lambda body: _upload_video_ids(json.loads(body)),
+                    params=_youtube_uploads_params(channel_id, api_key),
+                    max_age=max_ages.get(channel_id)
+                )
+                return self._recent_uploads_result(response)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"YouTube API error: {e}")
+                return None
+        
+        async def live_channels_for(video_ids):
+            try:
+                response = await self._get_parsed(
+                    'https://www.googleapis.com/youtube/v3/videos',
+                    lambda body: _live_video_channels(json.loads(body)),
+                    params=_youtube_videos_params(video_ids, api_key),
+                    max_age=_batch_max_age(max_ages, (video_channels[v] for v in video_ids))
+                )
+                return self._live_videos_result(response)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"YouTube API error: {e}")
+                return None
+        
+        live_channels, video_channels, batches = _youtube_video_batches(
+            channel_ids, await asyncio.gather(*(recent_uploads(c) for c in channel_ids))
+        )
+        return _youtube_live_from_videos(live_channels, video_channels, batches,
+                                         await asyncio.gather(*(live_channels_for(b) for b in batches)))
@@ -0,0 +1,444 @@
+import bisect
+import os
+import subprocess
+
+from ffmpeg_progress import FFmpegProgress, run_with_progress
+from transcode_scheduler import current_job
+
+SUBPROCESS_FLAGS = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# reencode: frame-accurate libx264 encode of the whole clip (slow)
+# copy: snap the start back to a keyframe and stream-copy (fast, starts up to one GOP early)
+# smart: re-encode only the partial GOP before the first keyframe, stream-copy the rest
+CLIP_CUT_MODES = ('reencode', 'copy', 'smart')
+DEFAULT_CLIP_CUT_MODE = 'copy'
+
+# How far before the requested start to look for a keyframe; longer than any
+# sane GOP (OBS defaults to 2-10 s keyframe intervals)
+KEYFRAME_SEARCH_WINDOW = 30
+
+# Outputs per ffmpeg process when cutting several clips from one recording
+MAX_BATCH_OUTPUTS = 16
+
+# A shared re-encode decodes everything between its first and last window, so
+# windows only share one when they overlap or the gap between them is at most
+# this many seconds; decoding a longer gap costs more than a separate seek
+MAX_BATCH_GAP = 30
+
+REENCODE_ARGS = ['-c:v', 'libx264', '-c:a', 'aac', '-preset', 'fast', '-crf', '23']
+
+# Thumbnails are taken this far into the clip (or half way for shorter clips)
+THUMBNAIL_AT = 1
+THUMBNAIL_FILTER = 'scale=320:-1'
+
+# 9:16 TikTok variant: centre crop to the widest 9:16 area, then scale to 1080x1920
+VERTICAL_FILTER = "crop=w='min(iw,ih*9/16)':h='min(ih,iw*16/9)',scale=1080:1920,setsar=1"
+
+
+def run_ffmpeg(cmd, duration=None):
+    """
+    Run an ffmpeg command; raises CalledProcessError on failure. duration is
+    the expected output length, used for percent and ETA. Inside a
+    transcode job the live progress is published on the job and the process
+    is registered so cancelling the job kills it.
+    """
+    progress = FFmpegProgress(duration)
+    job = current_job()
+    if job is None:
+        return run_with_progress(cmd, progress)
+    job.progress = progress
+    return run_with_progress(cmd, progress, tracking=job.tracking)
+
+
+def probe_keyframes(path, start=0, end=None):
+    """
+    Sorted keyframe timestamps of the first video stream between start and end.
+    Reads packet headers only (no decoding), limited to the requested interval.
+    """
+    interval = f"{max(0, start):.3f}%" + (f"{end:.3f}" if end is not None else '')
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-read_intervals', interval,
+         '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
+    )
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts, _, flags = line.partition(',')
+        if 'K' in flags and pts not in ('', 'N/A'):
+            keyframes.append(float(pts))
+    keyframes.sort()
+    return keyframes
+
+
+def written_through(path, t):
+    """
+    True once a file that may still be recording holds video packets at or
+    after t. Only the packet headers around t are read.
+    """
+    try:
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-read_intervals', f"{max(0, t):.3f}%{t + 1:.3f}",
+             '-show_entries', 'packet=pts_time', '-of', 'csv=p=0', path],
+            capture_output=True, text=True, check=True, timeout=30, creationflags=SUBPROCESS_FLAGS
+        )
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        return False
+    for line in result.stdout.splitlines():
+        pts = line.strip().rstrip(',')
+        if pts not in ('', 'N/A') and float(pts) >= t:
+            return True
+    return False
+
+
+def keyframe_at_or_before(keyframes, t):
+    """Last keyframe <= t, or None"""
+    i = bisect.bisect_right(keyframes, t + 1e-3)
+    return keyframes[i - 1] if i else None
+
+
+def keyframe_after(keyframes, t):
+    """First keyframe > t, or None"""
+    i = bisect.bisect_right(keyframes, t + 1e-3)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def video_codec(path):
+    """(codec_name, pix_fmt) of the first video stream"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+         '-show_entries', 'stream=codec_name,pix_fmt', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
+    )
+    codec, _, pix_fmt = result.stdout.strip().partition(',')
+    return codec, pix_fmt
+
+
+def has_audio(path):
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a:0',
+         '-show_entries', 'stream=index', '-of', 'csv=p=0', path],
+        capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
+    )
+    return bool(result.stdout.strip())
+
+
+def cut_clip(input_path, output_path, start, duration, mode=DEFAULT_CLIP_CUT_MODE, keyframes=None,
+             thumbnail_path=None, vertical_path=None):
+    """
+    Cut [start, start + duration) out of input_path into output_path.
+    Seeks on the input (-ss before -i) so nothing before the cut is decoded.
+    keyframes may be passed in to skip probing. thumbnail_path and
+    vertical_path add a JPEG thumbnail and a 9:16 variant, rendered in the
+    same ffmpeg process from the same decode. Returns the (start, duration)
+    actually written, which differs from the request when the start snapped
+    back to a keyframe.
+    """
+    start = max(0.0, float(start))
+    end = start + float(duration)
+    
+    if mode not in CLIP_CUT_MODES:
+        mode = DEFAULT_CLIP_CUT_MODE
+    
+    if mode != 'reencode':
+        if keyframes is None:
+            keyframes = probe_keyframes(input_path, start - KEYFRAME_SEARCH_WINDOW, end)
+        keyframe = keyframe_at_or_before(keyframes, start)
+        if keyframe is None:
+            # No keyframe information; only a full encode gives a sane result
+            mode = 'reencode'
+    
+    thumbnail = _thumbnail(thumbnail_path, 0, end - start)
+    
+    if mode == 'reencode':
+        _reencode_cut(input_path, output_path, start, end, thumbnail, vertical_path)
+        return start, end - start
+    
+    if mode == 'smart' and start - keyframe > 1e-3:
+        head_end = keyframe_after(keyframes, start)
+        if head_end is not None and head_end < end and not vertical_path:
+            _smart_cut(input_path, output_path, start, head_end, end, thumbnail)
+            return start, end - start
+        # The whole clip sits inside one GOP (it's short), or the vertical
+        # variant needs a full encode anyway: do everything in one encode
+        _reencode_cut(input_path, output_path, start, end, thumbnail, vertical_path)
+        return start, end - start
+    
+    _copy_cut(input_path, output_path, keyframe, end, extra=('-movflags', '+faststart'),
+              thumbnail=_thumbnail(thumbnail_path, start - keyframe, end - start), vertical_path=vertical_path)
+    return keyframe, end - keyframe
+
+
+def cut_clips(input_path, windows, mode=DEFAULT_CLIP_CUT_MODE, keyframes=None):
+    """
+    Cut several (output_path, start, duration[, thumbnail_path, vertical_path])
+    windows out of one input, one ffmpeg process per MAX_BATCH_OUTPUTS windows.
+    copy: one input-seeked demuxer per window, all stream-copied.
+    reencode: windows that overlap or sit close together are decoded once
+    and fanned out through split and trim filters; the others are cut on
+    their own with input seeking.
+    smart: each window is cut on its own (the head encodes can't be shared).
+    Returns the (start, duration) actually written for each window.
+    """
+    windows = [_window(*window) for window in windows]
+    if mode not in CLIP_CUT_MODES:
+        mode = DEFAULT_CLIP_CUT_MODE
+    if mode == 'smart' or len(windows) < 2:
+        return [cut_clip(input_path, output_path, start, duration, mode=mode, keyframes=keyframes,
+                         thumbnail_path=thumbnail_path, vertical_path=vertical_path)
+                for output_path, start, duration, thumbnail_path, vertical_path in windows]
+    
+    if mode == 'copy':
+        if keyframes is None:
+            keyframes = probe_keyframes(input_path, min(w[1] for w in windows) - KEYFRAME_SEARCH_WINDOW,
+                                        max(w[1] + w[2] for w in windows))
+        snapped = [keyframe_at_or_before(keyframes, w[1]) for w in windows]
+        if None not in snapped:
+            for i in range(0, len(windows), MAX_BATCH_OUTPUTS):
+                _copy_batch(input_path, windows[i:i + MAX_BATCH_OUTPUTS], snapped[i:i + MAX_BATCH_OUTPUTS])
+            return [(keyframe, start + duration - keyframe)
+                    for (_, start, duration, _, _), keyframe in zip(windows, snapped)]
+    
+    groups = _batch_groups(windows)
+    audio = has_audio(input_path) if any(len(group) > 1 for group in groups) else None
+    for group in groups:
+        if len(group) > 1:
+            _reencode_batch(input_path, group, audio)
+            continue
+        output_path, start, duration, thumbnail_path, vertical_path = group[0]
+        _reencode_cut(input_path, output_path, start, start + duration,
+                      _thumbnail(thumbnail_path, 0, duration), vertical_path)
+    return [(start, duration) for _, start, duration, _, _ in windows]
+
+
+def split_points(keyframes, duration, max_duration):
+    """
+    Keyframe times to cut at so no part is longer than max_duration, taking
+    the last keyframe that still fits each part. None if a GOP is longer
+    than max_duration (stream copy can't honour the limit).
+    """
+    points = []
+    last = 0.0
+    while last + max_duration < duration:
+        i = bisect.bisect_right(keyframes, last + max_duration + 1e-3) - 1
+        if i < 0 or keyframes[i] <= last + 1e-3:
+            return None
+        last = keyframes[i]
+        points.append(last)
+    return points
+
+
+def split_clip(input_path, output_dir, duration, max_duration=60, copy=True, keyframes=None):
+    """
+    Split input_path into <name>_part_<n>.mp4 files of at most max_duration
+    seconds in one ffmpeg pass with the segment muxer. copy cuts on existing
+    keyframes; otherwise the video is encoded once with keyframes forced at
+    every part boundary. Returns the part paths in order.
+    """
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    pattern = os.path.join(output_dir, f"{base_name}_part_%d.mp4")
+    list_path = os.path.join(output_dir, f"{base_name}_parts.txt")
+    
+    points = None
+    if copy:
+        if keyframes is None:
+            keyframes = probe_keyframes(input_path)
+        points = split_points(keyframes, duration, max_duration)
+    
+    cmd = ['ffmpeg', '-y', '-i', input_path, '-map', '0:v:0?', '-map', '0:a:0?']
+    if points is not None:
+        cmd += ['-c', 'copy', '-segment_times', ','.join(f"{t:.6f}" for t in points) or f"{duration + 1:.6f}"]
+    else:
+        cmd += [*REENCODE_ARGS, '-force_key_frames', f"expr:gte(t,n_forced*{max_duration})",
+                '-segment_time', str(max_duration)]
+    cmd += ['-f', 'segment', '-reset_timestamps', '1', '-segment_start_number', '1',
+            '-segment_format_options', 'movflags=+faststart',
+            '-segment_list', list_path, '-segment_list_type', 'flat', pattern]
+    
+    try:
+        run_ffmpeg(cmd, duration=duration)
+        with open(list_path, encoding='utf-8') as f:
+            return [os.path.join(output_dir, os.path.basename(line.strip())) for line in f if line.strip()]
+    finally:
+        try:
+            os.remove(list_path)
+        except OSError:
+            pass
+
+
+def _window(output_path, start, duration, thumbnail_path=None, vertical_path=None):
+    return output_path, max(0.0, float(start)), float(duration), thumbnail_path, vertical_path
+
+
+def _batch_groups(windows, max_gap=MAX_BATCH_GAP, max_outputs=MAX_BATCH_OUTPUTS):
+    """
+    Windows sorted by start and grouped for shared re-encodes: each group
+    overlaps or follows the previous window within max_gap seconds, and
+    holds at most max_outputs windows.
+    """
+    groups = []
+    group_end = None
+    for window in sorted(windows, key=lambda w: w[1]):
+        if groups and window[1] - group_end <= max_gap and len(groups[-1]) < max_outputs:
+            groups[-1].append(window)
+            group_end = max(group_end, window[1] + window[2])
+        else:
+            groups.append([window])
+            group_end = window[1] + window[2]
+    return groups
+
+
+def _thumbnail(path, offset, duration):
+    """(path, offset into the decoded stream) for a thumbnail, or None"""
+    return (path, offset + min(THUMBNAIL_AT, duration / 2)) if path else None
+
+
+def _fan_out(video, audio, tag, clip_path=None, thumbnail=None, vertical_path=None):
+    """
+    Filter chains and output options that feed one video pad to a clip
+    encode, a thumbnail and a vertical variant, so they share one decode.
+    video is a filter input ('0:v:0' or a label); audio is an input stream
+    ('0:a:0', mapped only if present), a filter label, or None. tag keeps
+    pad names apart when several fan-outs share one graph.
+    """
+    chains = []
+    if clip_path:
+        chains.append(('clip', 'null', clip_path))
+    if thumbnail:
+        chains.append(('thumb', f"trim=start={thumbnail[1]:.6f},{THUMBNAIL_FILTER}", thumbnail[0]))
+    if vertical_path:
+        chains.append(('vert', VERTICAL_FILTER, vertical_path))
+    if not chains:
+        return [], []
+    
+    graph = [f"[{video}]split={len(chains)}" + ''.join(f"[{tag}{name}_in]" for name, _, _ in chains)]
+    graph += [f"[{tag}{name}_in]{chain}[{tag}{name}]" for name, chain, _ in chains]
+    
+    # Clip and vertical both carry the audio; a filter label can only be consumed once
+    with_audio = [name for name, _, _ in chains if name != 'thumb']
+    if audio is None:
+        audio_maps = {name: [] for name in with_audio}
+    elif ':' in audio:
+        audio_maps = {name: ['-map', f"{audio}?"] for name in with_audio}
+    elif len(with_audio) > 1:
+        graph.append(f"[{audio}]asplit=2[{tag}clip_a][{tag}vert_a]")
+        audio_maps = {name: ['-map', f"[{tag}{name}_a]"] for name in with_audio}
+    else:
+        audio_maps = {name: ['-map', f"[{audio}]"] for name in with_audio}
+    
+    args = []
+    for name, _, path in chains:
+        args += ['-map', f"[{tag}{name}]"]
+        if name == 'thumb':
+            args += ['-frames:v', '1', '-update', '1', path]
+        else:
+            args += [*audio_maps[name], *REENCODE_ARGS, '-movflags', '+faststart', path]
+    return graph, args
+
+
+def _copy_batch(input_path, windows, snapped):
+    cmd = ['ffmpeg', '-y']
+    for (_, start, duration, _, _), keyframe in zip(windows, snapped):
+        cmd += ['-ss', f"{keyframe:.6f}", '-t', f"{start + duration - keyframe:.6f}", '-i', input_path]
+    graph, outputs = [], []
+    for i, ((output_path, start, duration, thumbnail_path, vertical_path), keyframe) in enumerate(zip(windows, snapped)):
+        outputs += ['-map', f"{i}:v:0?", '-map', f"{i}:a:0?", '-c', 'copy',
+                    '-avoid_negative_ts', 'make_zero', '-movflags', '+faststart', output_path]
+        chains, args = _fan_out(f"{i}:v:0", f"{i}:a:0", f"w{i}", None,
+                                _thumbnail(thumbnail_path, start - keyframe, duration), vertical_path)
+        graph += chains
+        outputs += args
+    if graph:
+        cmd += ['-filter_complex', ';'.join(graph)]
+    run_ffmpeg(cmd + outputs, duration=max(start + duration - keyframe
+                                           for (_, start, duration, _, _), keyframe in zip(windows, snapped)))
+
+
+def _reencode_batch(input_path, windows, audio):
+    base = windows[0][1]
+    end = max(start + duration for _, start, duration, _, _ in windows)
+    n = len(windows)
+    
+    graph = [f"[0:v]split={n}" + ''.join(f"[v{i}]" for i in range(n))]
+    if audio:
+        graph.append(f"[0:a]asplit={n}" + ''.join(f"[a{i}]" for i in range(n)))
+    outputs = []
+    for i, (output_path, start, duration, thumbnail_path, vertical_path) in enumerate(windows):
+        # Input seeking restarts timestamps at the seek point, so trims are relative to base
+        trim = f"start={start - base:.6f}:duration={duration:.6f}"
+        graph.append(f"[v{i}]trim={trim},setpts=PTS-STARTPTS[vo{i}]")
+        if audio:
+            graph.append(f"[a{i}]atrim={trim},asetpts=PTS-STARTPTS[ao{i}]")
+        chains, args = _fan_out(f"vo{i}", f"ao{i}" if audio else None, f"w{i}", output_path,
+                                _thumbnail(thumbnail_path, 0, duration), vertical_path)
+        graph += chains
+        outputs += args
+    
+    run_ffmpeg(['ffmpeg', '-y', '-ss', f"{base:.6f}", '-t', f"{end - base:.6f}", '-i', input_path,
+                '-filter_complex', ';'.join(graph), *outputs], duration=end - base)
+
+
+def _reencode_cut(input_path, output_path, start, end, thumbnail=None, vertical_path=None):
+    """Encode [start, end); output_path None renders only the thumbnail/vertical outputs"""
+    cmd = ['ffmpeg', '-y', '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', input_path]
+    if not thumbnail and not vertical_path:
+        run_ffmpeg(cmd + [*REENCODE_ARGS, '-movflags', '+faststart', output_path], duration=end - start)
+        return
+    graph, args = _fan_out('0:v:0', '0:a:0', '', output_path, thumbnail, vertical_path)
+    run_ffmpeg(cmd + ['-filter_complex', ';'.join(graph), *args], duration=end - start)
+
+
+def _copy_cut(input_path, output_path, start, end, extra=(), thumbnail=None, vertical_path=None):
+    cmd = ['ffmpeg', '-y', '-ss', f"{start:.6f}", '-t', f"{end - start:.6f}", '-i', input_path]
+    graph, args = _fan_out('0:v:0', '0:a:0', '', None, thumbnail, vertical_path)
+    if graph:
+        cmd += ['-filter_complex', ';'.join(graph)]
+    run_ffmpeg(cmd + ['-map', '0:v:0?', '-map', '0:a:0?', '-c', 'copy', '-avoid_negative_ts', 'make_zero',
+                      *extra, output_path, *args], duration=end - start)
+
+
+def _smart_cut(input_path, output_path, start, head_end, end, thumbnail=None):
+    """
+    Encode [start, head_end) to match the source, copy [head_end, end), join
+    with the concat demuxer. The thumbnail (offset from start) is taken from
+    whichever of the two passes decodes that point.
+    """
+    codec, pix_fmt = video_codec(input_path)
+    if codec != 'h264':
+        # Only H.264 heads can be spliced onto the copied tail
+        _reencode_cut(input_path, output_path, start, end, thumbnail)
+        return
+    
+    head_thumbnail = tail_thumbnail = None
+    if thumbnail and thumbnail[1] < head_end - start:
+        head_thumbnail = thumbnail
+    elif thumbnail:
+        tail_thumbnail = (thumbnail[0], thumbnail[1] - (head_end - start))
+    
+    base = os.path.splitext(output_path)[0]
+    head_path = f"{base}.head.mp4"
+    tail_path = f"{base}.tail.mp4"
+    list_path = f"{base}.concat.txt"
+    try:
+        cmd = ['ffmpeg', '-y', '-ss', f"{start:.6f}", '-i', input_path]
+        graph, thumbnail_args = _fan_out('0:v:0', None, '', None, head_thumbnail)
+        if graph:
+            cmd += ['-filter_complex', ';'.join(graph)]
+        run_ffmpeg(cmd + ['-map', '0:v:0', '-map', '0:a:0?', '-t', f"{head_end - start:.6f}",
+                          '-c:v', 'libx264', '-preset', 'fast', '-crf', '18', '-pix_fmt', pix_fmt or 'yuv420p',
+                          '-c:a', 'copy', '-avoid_negative_ts', 'make_zero', head_path, *thumbnail_args],
+                   duration=head_end - start)
+        _copy_cut(input_path, tail_path, head_end, end, thumbnail=tail_thumbnail)
+        with open(list_path, 'w', encoding='utf-8') as f:
+            for path in (head_path, tail_path):
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        run_ffmpeg(['ffmpeg', '-y', '-f', 'concat', '-safe', '0', '-i', list_path,
+                    '-c', 'copy', '-movflags', '+faststart', output_path], duration=end - start)
+    finally:
+        for path in (head_path, tail_path, list_path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
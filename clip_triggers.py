@@ -0,0 +1,19 @@
+# Window used for the replay buffer when no trigger is enabled (seconds)
+DEFAULT_TRIGGER_WINDOW = 60
+
+# Replay buffer length on top of the longest trigger window: the trigger
+# worker's poll interval, the flush delay and a keyframe interval of slack
+REPLAY_BUFFER_MARGIN = 20
+
+
+def trigger_window(trigger, defaults):
+    """(pre_buffer, clip_duration, post_buffer) of a trigger, with the smart detection defaults"""
+    pre_buffer = trigger.pre_buffer or defaults.get('context_pre_buffer', 10)
+    post_buffer = trigger.post_buffer or defaults.get('context_post_buffer', 5)
+    return pre_buffer, trigger.clip_duration or 0, post_buffer
+
+
+def replay_buffer_seconds(triggers, defaults):
+    """Replay buffer length that holds the longest window of the given (enabled) triggers"""
+    windows = [sum(trigger_window(trigger, defaults)) for trigger in triggers]
+    return int(max(windows, default=DEFAULT_TRIGGER_WINDOW) + REPLAY_BUFFER_MARGIN)
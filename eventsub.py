@@ -0,0 +1,114 @@
+import hashlib
+import hmac
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+# Request headers sent with every EventSub webhook message
+HEADER_MESSAGE_ID = 'Twitch-Eventsub-Message-Id'
+HEADER_TIMESTAMP = 'Twitch-Eventsub-Message-Timestamp'
+HEADER_SIGNATURE = 'Twitch-Eventsub-Message-Signature'
+HEADER_MESSAGE_TYPE = 'Twitch-Eventsub-Message-Type'
+HEADER_SUBSCRIPTION_TYPE = 'Twitch-Eventsub-Subscription-Type'
+
+MESSAGE_VERIFICATION = 'webhook_callback_verification'
+MESSAGE_NOTIFICATION = 'notification'
+MESSAGE_REVOCATION = 'revocation'
+
+# Twitch asks receivers to drop messages older than 10 minutes (replay protection)
+MAX_MESSAGE_AGE = 600
+SEEN_MESSAGE_IDS = 2000
+
+
+def sign_eventsub(secret, message_id, timestamp, body):
+    """Return the 'sha256=<hex>' signature for a message, as Twitch computes it"""
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    message = message_id.encode('utf-8') + timestamp.encode('utf-8') + body
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+
+def _parse_timestamp(value):
+    """Parse an RFC3339 timestamp (Twitch sends nanosecond precision) to aware UTC"""
+    value = (value or '').strip().replace('Z', '+00:00')
+    if '.' in value:
+        # fromisoformat only takes up to microseconds
+        head, rest = value.split('.', 1)
+        digits = rest[:len(rest) - len(rest.lstrip('0123456789'))]
+        value = f"{head}.{digits[:6].ljust(6, '0')}{rest[len(digits):]}"
+    parsed = datetime.fromisoformat(value)
+    if not parsed.tzinfo:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class EventSubError(Exception):
+    """A webhook message that must be rejected; status is the HTTP code to answer with"""
+    
+    def __init__(self, message, status=403):
+        super().__init__(message)
+        self.status = status
+
+
+class EventSubReceiver:
+    """
+    Verify and de-duplicate Twitch EventSub webhook messages.
+    Checks the HMAC-SHA256 signature over message id + timestamp + raw body,
+    rejects stale timestamps, and remembers recent message ids because Twitch
+    redelivers a message until it gets a 2xx.
+    """
+    
+    def __init__(self, max_age=MAX_MESSAGE_AGE, remember=SEEN_MESSAGE_IDS):
+        self.max_age = max_age
+        self.remember = remember
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def verify(self, headers, body, secret):
+        """
+        Validate a message; returns (message_type, payload dict, duplicate).
+        Raises EventSubError if the message is not authentic or too old.
+        """
+        if not secret:
+            raise EventSubError('EventSub secret not configured', status=503)
+        
+        message_id = headers.get(HEADER_MESSAGE_ID)
+        timestamp = headers.get(HEADER_TIMESTAMP)
+        signature = headers.get(HEADER_SIGNATURE)
+        if not message_id or not timestamp or not signature:
+            raise EventSubError('Missing EventSub headers', status=400)
+        
+        expected = sign_eventsub(secret, message_id, timestamp, body)
+        if not hmac.compare_digest(expected, signature):
+            raise EventSubError('Invalid signature')
+        
+        try:
+            age = (datetime.now(timezone.utc) - _parse_timestamp(timestamp)).total_seconds()
+        except ValueError:
+            raise EventSubError('Invalid timestamp', status=400)
+        if abs(age) > self.max_age:
+            raise EventSubError('Message too old')
+        
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise EventSubError('Invalid JSON body', status=400)
+        
+        return headers.get(HEADER_MESSAGE_TYPE, ''), payload, self._mark_seen(message_id)
+    
+    def forget(self, message_id):
+        """Drop a message id so a redelivery is processed (e.g. after a handling error)"""
+        with self._lock:
+            self._seen.pop(message_id, None)
+    
+    def _mark_seen(self, message_id):
+        """Remember a message id; returns True if it was already handled"""
+        with self._lock:
+            if message_id in self._seen:
+                self._seen.move_to_end(message_id)
+                return True
+            self._seen[message_id] = True
+            while len(self._seen) > self.remember:
+                self._seen.popitem(last=False)
+            return False
@@ -0,0 +1,125 @@
+"""
+Local stand-in for Twitch EventSub: sends signed webhook messages to a running
+Cliperus instance so push-based live detection can be tested without a public
+callback URL or a real subscription.
+
+    python eventsub_replay.py --secret <twitch_eventsub_secret> online mychannel
+    python eventsub_replay.py --secret <secret> offline mychannel --broadcaster-id 12345
+    python eventsub_replay.py --secret <secret> verify --broadcaster-id 12345
+    python eventsub_replay.py --secret <secret> revoke --broadcaster-id 12345
+    python eventsub_replay.py --secret <secret> online mychannel --repeat 2   # redelivery
+    python eventsub_replay.py --secret <secret> online mychannel --age 900    # stale, rejected
+
+Without --broadcaster-id the messages carry an empty broadcaster_user_id, so
+Cliperus matches the stream by login and never stores a made-up Twitch ID
+as its channel_id.
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from eventsub import (sign_eventsub, HEADER_MESSAGE_ID, HEADER_TIMESTAMP, HEADER_SIGNATURE,
+                      HEADER_MESSAGE_TYPE, HEADER_SUBSCRIPTION_TYPE, MESSAGE_VERIFICATION,
+                      MESSAGE_NOTIFICATION, MESSAGE_REVOCATION)
+
+DEFAULT_URL = 'http://localhost:5000/api/webhooks/twitch/eventsub'
+
+
+def _timestamp(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def build_message(action, login=None, broadcaster_id=None, age=0):
+    """Return (message_type, subscription_type, payload) shaped like Twitch's webhook bodies"""
+    broadcaster_id = broadcaster_id or ''
+    login = (login or 'cliperus').lower()
+    now = datetime.now(timezone.utc) - timedelta(seconds=age)
+    subscription_type = 'stream.offline' if action == 'offline' else 'stream.online'
+    
+    subscription = {
+        'id': str(uuid.uuid4()),
+        'status': 'enabled',
+        'type': subscription_type,
+        'version': '1',
+        'cost': 0,
+        'condition': {'broadcaster_user_id': broadcaster_id},
+        'transport': {'method': 'webhook', 'callback': DEFAULT_URL},
+        'created_at': _timestamp(now)
+    }
+    broadcaster = {
+        'broadcaster_user_id': broadcaster_id,
+        'broadcaster_user_login': login,
+        'broadcaster_user_name': login
+    }
+    
+    if action == 'verify':
+        subscription['status'] = 'webhook_callback_verification_pending'
+        return MESSAGE_VERIFICATION, subscription_type, {
+            'challenge': uuid.uuid4().hex,
+            'subscription': subscription
+        }
+    
+    if action == 'revoke':
+        subscription['status'] = 'authorization_revoked'
+        return MESSAGE_REVOCATION, subscription_type, {'subscription': subscription}
+    
+    if action == 'online':
+        event = dict(broadcaster, id=str(uuid.uuid4().int)[:11], type='live', started_at=_timestamp(now))
+    else:
+        event = broadcaster
+    return MESSAGE_NOTIFICATION, subscription_type, {'subscription': subscription, 'event': event}
+
+
+def send(url, secret, message_type, subscription_type, payload, message_id=None, age=0, bad_signature=False):
+    """Sign and POST one message; returns the response"""
+    body = json.dumps(payload).encode('utf-8')
+    message_id = message_id or str(uuid.uuid4())
+    timestamp = _timestamp(datetime.now(timezone.utc) - timedelta(seconds=age))
+    signature = sign_eventsub(secret, message_id, timestamp, body)
+    if bad_signature:
+        signature = signature[:-4] + '0000'
+    
+    headers = {
+        'Content-Type': 'application/json',
+        HEADER_MESSAGE_ID: message_id,
+        HEADER_TIMESTAMP: timestamp,
+        HEADER_SIGNATURE: signature,
+        HEADER_MESSAGE_TYPE: message_type,
+        HEADER_SUBSCRIPTION_TYPE: subscription_type,
+        'Twitch-Eventsub-Subscription-Version': '1'
+    }
+    return requests.post(url, data=body, headers=headers, timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay signed Twitch EventSub messages against Cliperus')
+    parser.add_argument('action', choices=['online', 'offline', 'verify', 'revoke'])
+    parser.add_argument('login', nargs='?', help='Twitch login (the stream name in Cliperus)')
+    parser.add_argument('--secret', required=True, help='Same value as the twitch_eventsub_secret setting')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--broadcaster-id', help='Twitch user ID (required for verify and revoke)')
+    parser.add_argument('--repeat', type=int, default=1, help='Send the same message id N times')
+    parser.add_argument('--age', type=int, default=0, help='Backdate the message timestamp by N seconds')
+    parser.add_argument('--bad-signature', action='store_true', help='Corrupt the signature')
+    args = parser.parse_args()
+    if args.action in ('verify', 'revoke') and not args.broadcaster_id:
+        parser.error(f"{args.action} matches streams by Twitch user ID: pass --broadcaster-id")
+    
+    message_type, subscription_type, payload = build_message(args.action, args.login, args.broadcaster_id)
+    message_id = str(uuid.uuid4())
+    
+    for attempt in range(max(1, args.repeat)):
+        started = time.monotonic()
+        response = send(args.url, args.secret, message_type, subscription_type, payload,
+                        message_id=message_id, age=args.age, bad_signature=args.bad_signature)
+        elapsed = (time.monotonic() - started) * 1000
+        print(f"[{attempt + 1}] {message_type} {subscription_type} -> {response.status_code} "
+              f"in {elapsed:.0f} ms {response.text.strip()[:200]}")
+
+
+if __name__ == '__main__':
+    main()
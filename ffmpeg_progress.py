@@ -0,0 +1,114 @@
+import subprocess
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+SUBPROCESS_FLAGS = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# Only the end of ffmpeg's stderr is kept (it can log a line per frame)
+STDERR_TAIL_LINES = 50
+
+
+class FFmpegProgress:
+    """Latest values from ffmpeg's -progress output for one run"""
+    
+    def __init__(self, duration=None):
+        self.duration = duration
+        self.frame = 0
+        self.fps = 0.0
+        self.speed = 0.0
+        self.out_time = 0.0
+        self.total_size = 0
+        self.state = 'starting'
+        self.started_at = time.monotonic()
+        self.updated_at = self.started_at
+        self.finished_at = None
+    
+    def update(self, key, value):
+        value = value.strip()
+        try:
+            if key == 'frame':
+                self.frame = int(value)
+            elif key == 'fps':
+                self.fps = float(value)
+            elif key == 'speed':
+                self.speed = float(value.rstrip('x')) if value not in ('', 'N/A') else 0.0
+            elif key == 'out_time_us':
+                self.out_time = max(0.0, int(value) / 1_000_000)
+            elif key == 'total_size':
+                self.total_size = int(value)
+            elif key == 'progress':
+                self.state = 'done' if value == 'end' else 'running'
+                self.updated_at = time.monotonic()
+        except ValueError:
+            # N/A until the first frame is out
+            pass
+    
+    @property
+    def percent(self):
+        if not self.duration:
+            return None
+        return round(min(100.0, self.out_time / self.duration * 100), 1)
+    
+    @property
+    def eta(self):
+        """Seconds left at the current speed, or None if unknown"""
+        if self.finished_at is not None:
+            return 0.0
+        if not self.duration or self.speed <= 0:
+            return None
+        return round(max(0.0, self.duration - self.out_time) / self.speed, 1)
+    
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'frame': self.frame,
+            'fps': self.fps,
+            'speed': self.speed,
+            'out_time': round(self.out_time, 2),
+            'duration': self.duration,
+            'percent': self.percent,
+            'eta': self.eta,
+            'total_size': self.total_size,
+            'elapsed': round((self.finished_at or time.monotonic()) - self.started_at, 1)
+        }
+
+
+def _drain(stream, tail):
+    for line in stream:
+        tail.append(line)
+    stream.close()
+
+
+def run_with_progress(cmd, progress=None, tracking=None):
+    """
+    Run an ffmpeg command, parsing its -progress output as it arrives into
+    progress (an FFmpegProgress). stderr is drained on a separate thread and
+    only its last STDERR_TAIL_LINES lines are kept. tracking(process) is an
+    optional context manager wrapped around the run (job cancellation).
+    Raises CalledProcessError carrying the stderr tail on failure.
+    """
+    progress = progress or FFmpegProgress()
+    cmd = [cmd[0], '-nostdin', '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+    process = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, errors='replace', creationflags=SUBPROCESS_FLAGS)
+    tail = deque(maxlen=STDERR_TAIL_LINES)
+    reader = threading.Thread(target=_drain, args=(process.stderr, tail), daemon=True)
+    reader.start()
+    
+    with tracking(process) if tracking else nullcontext():
+        for line in process.stdout:
+            key, _, value = line.partition('=')
+            progress.update(key.strip(), value)
+        process.stdout.close()
+        process.wait()
+    reader.join(timeout=5)
+    progress.finished_at = time.monotonic()
+    
+    stderr = ''.join(tail)
+    if process.returncode:
+        progress.state = 'failed'
+        raise subprocess.CalledProcessError(process.returncode, cmd, None, stderr)
+    progress.state = 'done'
+    return subprocess.CompletedProcess(cmd, process.returncode, None, stderr)
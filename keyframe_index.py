@@ -0,0 +1,132 @@
+import bisect
+import os
+import struct
+import subprocess
+import sys
+from array import array
+
+SUBPROCESS_FLAGS = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# Stored next to the recording: <recording>.kfi
+KEYFRAME_INDEX_SUFFIX = '.kfi'
+
+# magic, source file size, source mtime, keyframe count; then count float64
+# timestamps followed by count int64 byte offsets (little endian)
+_MAGIC = b'KFI1'
+_HEADER = struct.Struct('<4sqdI')
+
+
+def index_path_for(video_path):
+    return video_path + KEYFRAME_INDEX_SUFFIX
+
+
+def remove_keyframe_index(video_path):
+    try:
+        os.remove(index_path_for(video_path))
+    except OSError:
+        pass
+
+
+class KeyframeIndex:
+    """
+    Keyframe timestamps and byte offsets of a video file's first video stream.
+    Built once with ffprobe (packet headers only, no decoding) and saved as a
+    packed .kfi file next to the video. load() rejects an index whose video
+    has since changed size or mtime.
+    """
+    
+    def __init__(self, times, positions, source_size=0, source_mtime=0.0):
+        self.times = array('d', times)
+        self.positions = array('q', positions)
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+    
+    def __len__(self):
+        return len(self.times)
+    
+    def at_or_before(self, t):
+        """(time, byte offset) of the last keyframe <= t, or None"""
+        i = bisect.bisect_right(self.times, t + 1e-3)
+        return (self.times[i - 1], self.positions[i - 1]) if i else None
+    
+    def after(self, t):
+        """(time, byte offset) of the first keyframe > t, or None"""
+        i = bisect.bisect_right(self.times, t + 1e-3)
+        return (self.times[i], self.positions[i]) if i < len(self.times) else None
+    
+    def interval(self):
+        """Median keyframe interval in seconds (0 if unknown)"""
+        if len(self.times) < 2:
+            return 0.0
+        gaps = sorted(b - a for a, b in zip(self.times, self.times[1:]))
+        return gaps[len(gaps) // 2]
+    
+    @classmethod
+    def build(cls, video_path):
+        """Probe every keyframe of video_path (raises CalledProcessError if ffprobe fails)"""
+        stat = os.stat(video_path)
+        result = subprocess.run(
+            ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+             '-show_entries', 'packet=pts_time,pos,flags', '-of', 'csv=p=0', video_path],
+            capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
+        )
+        entries = []
+        for line in result.stdout.splitlines():
+            fields = line.split(',')
+            if len(fields) < 3 or 'K' not in fields[2] or fields[0] in ('', 'N/A'):
+                continue
+            pos = int(fields[1]) if fields[1] not in ('', 'N/A') else -1
+            entries.append((float(fields[0]), pos))
+        entries.sort()
+        return cls([t for t, _ in entries], [p for _, p in entries], stat.st_size, stat.st_mtime)
+    
+    def save(self, video_path):
+        path = index_path_for(video_path)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.source_size, self.source_mtime, len(self.times)))
+            f.write(_little_endian(self.times))
+            f.write(_little_endian(self.positions))
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, video_path):
+        """Saved index for video_path, or None if missing, corrupt or stale"""
+        try:
+            stat = os.stat(video_path)
+            with open(index_path_for(video_path), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < _HEADER.size:
+            return None
+        magic, size, mtime, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC or size != stat.st_size or mtime != stat.st_mtime:
+            return None
+        if len(data) != _HEADER.size + count * 16:
+            return None
+        times = array('d')
+        positions = array('q')
+        times.frombytes(data[_HEADER.size:_HEADER.size + count * 8])
+        positions.frombytes(data[_HEADER.size + count * 8:])
+        if sys.byteorder == 'big':
+            times.byteswap()
+            positions.byteswap()
+        return cls(times, positions, size, mtime)
+    
+    @classmethod
+    def load_or_build(cls, video_path):
+        """Saved index if still valid, otherwise build and save a new one"""
+        index = cls.load(video_path)
+        if index is None:
+            index = cls.build(video_path)
+            index.save(video_path)
+        return index
+
+
+def _little_endian(values):
+    if sys.byteorder == 'little':
+        return values.tobytes()
+    copy = array(values.typecode, values)
+    copy.byteswap()
+    return copy.tobytes()
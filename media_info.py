@@ -0,0 +1,199 @@
+import json
+import os
+import subprocess
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import has_app_context
+from sqlalchemy.exc import IntegrityError
+
+from clip_cutter import probe_keyframes
+from keyframe_index import KeyframeIndex
+
+SUBPROCESS_FLAGS = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+# Entries kept in memory in front of the MediaInfo table (LRU)
+MEDIA_INFO_MEMORY_SIZE = 512
+
+# Without a saved keyframe index, the keyframe interval is estimated from the
+# packets in the first few seconds
+KEYFRAME_SAMPLE_SECONDS = 30
+
+
+def file_identity(path):
+    """(inode, size, mtime) of a file; changes whenever the file is replaced or rewritten"""
+    stat = os.stat(path)
+    return stat.st_ino, stat.st_size, stat.st_mtime
+
+
+def _rate(value):
+    """ffprobe frame rates come as '30000/1001'"""
+    num, _, den = (value or '').partition('/')
+    try:
+        num, den = float(num), float(den or 1)
+    except ValueError:
+        return None
+    return round(num / den, 3) if den else None
+
+
+def probe_media(path):
+    """Duration, codecs, resolution, bitrate and keyframe interval of a media file"""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+        capture_output=True, text=True, check=True, creationflags=SUBPROCESS_FLAGS
+    )
+    data = json.loads(result.stdout or '{}')
+    fmt = data.get('format', {})
+    streams = data.get('streams', [])
+    video = next((st for st in streams if st.get('codec_type') == 'video'), {})
+    audio = next((st for st in streams if st.get('codec_type') == 'audio'), {})
+    
+    index = KeyframeIndex.load(path)
+    if index is None and video:
+        try:
+            keyframes = probe_keyframes(path, 0, KEYFRAME_SAMPLE_SECONDS)
+            index = KeyframeIndex(keyframes, [0] * len(keyframes))
+        except subprocess.CalledProcessError:
+            pass
+    keyframe_interval = index.interval() if index is not None else 0.0
+    
+    return {
+        'duration': float(fmt.get('duration') or 0),
+        'bitrate': int(fmt.get('bit_rate') or 0),
+        'format_name': fmt.get('format_name'),
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name'),
+        'width': video.get('width'),
+        'height': video.get('height'),
+        'fps': _rate(video.get('avg_frame_rate')),
+        'keyframe_interval': keyframe_interval or None,
+        'streams': [
+            {key: st.get(key) for key in ('index', 'codec_type', 'codec_name', 'width', 'height',
+                                          'pix_fmt', 'sample_rate', 'channels', 'bit_rate')}
+            for st in streams
+        ]
+    }
+
+
+class MediaInfoCache:
+    """
+    ffprobe results persisted in the MediaInfo table, keyed by path and
+    checked against the file's inode, size and mtime, so each file version
+    is probed once. A small in-memory LRU sits in front of the table.
+    on_probe(path, info) is called after every fresh probe.
+    """
+    
+    FIELDS = ('duration', 'bitrate', 'format_name', 'video_codec', 'audio_codec', 'width', 'height',
+              'fps', 'keyframe_interval')
+    
+    def __init__(self, app, db, MediaInfo, on_probe=None, memory_size=MEDIA_INFO_MEMORY_SIZE):
+        self.app = app
+        self.db = db
+        self.MediaInfo = MediaInfo
+        self.on_probe = on_probe
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, path):
+        """Media info dict for path (probing only if needed); None if it can't be probed"""
+        try:
+            identity = file_identity(path)
+        except OSError:
+            return None
+        
+        with self._lock:
+            cached = self._memory.get(path)
+            if cached and cached[0] == identity:
+                self._memory.move_to_end(path)
+                self.hits += 1
+                return cached[1]
+        
+        with self._context() as own_context:
+            row = self.MediaInfo.query.filter_by(path=path).first()
+            if row is not None and (row.inode, row.size, row.mtime) == identity:
+                info = self._from_row(row)
+                self.hits += 1
+            else:
+                try:
+                    info = probe_media(path)
+                except Exception as e:
+                    self.app.logger.error(f"Error probing {path}: {e}")
+                    return None
+                self.misses += 1
+                self._write(own_context, self._store, row, path, identity, info)
+        
+        self._remember(path, identity, info)
+        return info
+    
+    def forget(self, path):
+        """Drop a file's entry (call when the file is deleted)"""
+        with self._lock:
+            self._memory.pop(path, None)
+        with self._context() as own_context:
+            self._write(own_context, self._delete, path)
+    
+    def stats(self):
+        return {'hits': self.hits, 'probes': self.misses, 'in_memory': len(self._memory)}
+    
+    @contextmanager
+    def _context(self):
+        """
+        Reuse the caller's app context: a nested one gets its own session and
+        SQLite connection, which deadlocks against the caller's open transaction.
+        Yields True when the cache had to open (and so owns) the context.
+        """
+        if has_app_context():
+            yield False
+        else:
+            with self.app.app_context():
+                yield True
+    
+    def _write(self, own_context, write, *args):
+        """
+        Run a cache write in a savepoint. In the caller's context its
+        transaction is never committed or rolled back here; the row lands
+        when the caller commits.
+        """
+        try:
+            with self.db.session.begin_nested():
+                write(*args)
+        except IntegrityError:
+            # Another thread stored the same file first
+            pass
+        except Exception as e:
+            self.app.logger.error(f"Error writing media info: {e}")
+        if own_context:
+            self.db.session.commit()
+    
+    def _remember(self, path, identity, info):
+        with self._lock:
+            self._memory[path] = (identity, info)
+            self._memory.move_to_end(path)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+    
+    def _from_row(self, row):
+        info = {field: getattr(row, field) for field in self.FIELDS}
+        info['streams'] = json.loads(row.streams or '[]')
+        return info
+    
+    def _store(self, row, path, identity, info):
+        if row is None:
+            row = self.MediaInfo(path=path)
+            self.db.session.add(row)
+        row.inode, row.size, row.mtime = identity
+        for field in self.FIELDS:
+            setattr(row, field, info[field])
+        row.streams = json.dumps(info['streams'])
+        row.probed_at = datetime.utcnow()
+        self.db.session.flush()
+        if self.on_probe:
+            self.on_probe(path, info)
+    
+    def _delete(self, path):
+        self.MediaInfo.query.filter_by(path=path).delete(synchronize_session=False)
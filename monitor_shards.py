@@ -0,0 +1,158 @@
+import math
+import os
+import socket
+import zlib
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+
+# A lease is valid this long after its last renewal
+DEFAULT_LEASE_TTL = 30
+
+# Nodes stop trusting their own leases this much earlier than others may take
+# them over, so two nodes never believe they own a shard at the same time
+LEASE_SAFETY_MARGIN = 1 / 3
+
+
+def shard_for(stream_id, shard_count):
+    """Shard a stream belongs to (stable across processes and restarts)"""
+    return zlib.crc32(str(stream_id).encode('utf-8')) % shard_count
+
+
+def default_node_id():
+    return os.environ.get('MONITOR_NODE_ID') or f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ShardCoordinator:
+    """
+    Split stream monitoring across nodes sharing one database.
+    Streams are hashed into shard_count shards; each shard has a lease row
+    that one node holds at a time. heartbeat() (inside an app context)
+    renews this node's leases, takes over expired or unowned shards up to a
+    fair share of the live nodes, and gives back extras when nodes join.
+    Claims are compare-and-set UPDATEs, so concurrent nodes cannot both win.
+    """
+    
+    def __init__(self, db, Lease, Node, shard_count, node_id=None, lease_ttl=DEFAULT_LEASE_TTL):
+        self.db = db
+        self.Lease = Lease
+        self.Node = Node
+        self.shard_count = shard_count
+        self.node_id = node_id or default_node_id()
+        self.lease_ttl = lease_ttl
+        self.shards = frozenset()
+        self.valid_until = datetime.min
+        self.live_nodes = 0
+    
+    @property
+    def heartbeat_interval(self):
+        return self.lease_ttl * LEASE_SAFETY_MARGIN
+    
+    def owns(self, stream_id):
+        """True if this node currently holds the lease for the stream's shard"""
+        if datetime.utcnow() >= self.valid_until:
+            return False
+        return shard_for(stream_id, self.shard_count) in self.shards
+    
+    def heartbeat(self):
+        """Renew, claim and rebalance leases; returns the shards now owned"""
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=self.lease_ttl)
+        Lease = self.Lease
+        
+        self._touch_node(now)
+        self._ensure_leases()
+        
+        # Renew what we hold
+        Lease.query.filter(Lease.node_id == self.node_id, Lease.expires_at >= now).update(
+            {Lease.expires_at: expires, Lease.heartbeat_at: now}, synchronize_session=False
+        )
+        self.db.session.commit()
+        
+        owned = self._owned(now)
+        live_nodes = self.Node.query.filter(
+            self.Node.last_heartbeat >= now - timedelta(seconds=self.lease_ttl)
+        ).count()
+        self.live_nodes = max(1, live_nodes)
+        fair_share = math.ceil(self.shard_count / self.live_nodes)
+        
+        if len(owned) > fair_share:
+            # Hand back the extras so newly joined nodes can pick them up
+            extras = sorted(owned)[fair_share:]
+            Lease.query.filter(Lease.shard.in_(extras), Lease.node_id == self.node_id).update(
+                {Lease.node_id: None, Lease.expires_at: now}, synchronize_session=False
+            )
+            self.db.session.commit()
+        elif len(owned) < fair_share:
+            free = Lease.query.filter(
+                Lease.shard < self.shard_count,
+                self.db.or_(Lease.node_id.is_(None), Lease.expires_at < now)
+            ).order_by(Lease.shard).limit(fair_share - len(owned)).all()
+            
+            for lease in free:
+                # Compare-and-set: only succeeds if nobody claimed it meanwhile
+                Lease.query.filter(
+                    Lease.shard == lease.shard,
+                    self.db.or_(Lease.node_id.is_(None), Lease.expires_at < now)
+                ).update(
+                    {Lease.node_id: self.node_id, Lease.expires_at: expires, Lease.heartbeat_at: now},
+                    synchronize_session=False
+                )
+            self.db.session.commit()
+        
+        self.shards = frozenset(self._owned(now))
+        self.valid_until = now + timedelta(seconds=self.lease_ttl * (1 - LEASE_SAFETY_MARGIN))
+        return self.shards
+    
+    def release(self):
+        """Give up all leases (clean shutdown) so other nodes take over at once"""
+        now = datetime.utcnow()
+        self.Lease.query.filter(self.Lease.node_id == self.node_id).update(
+            {self.Lease.node_id: None, self.Lease.expires_at: now}, synchronize_session=False
+        )
+        self.Node.query.filter_by(node_id=self.node_id).delete(synchronize_session=False)
+        self.db.session.commit()
+        self.shards = frozenset()
+        self.valid_until = datetime.min
+    
+    def status(self):
+        return {
+            'node_id': self.node_id,
+            'shard_count': self.shard_count,
+            'shards': sorted(self.shards),
+            'live_nodes': self.live_nodes,
+            'lease_valid': datetime.utcnow() < self.valid_until
+        }
+    
+    def _owned(self, now):
+        return {
+            lease.shard for lease in self.Lease.query.filter(
+                self.Lease.node_id == self.node_id,
+                self.Lease.expires_at >= now,
+                self.Lease.shard < self.shard_count
+            ).all()
+        }
+    
+    def _touch_node(self, now):
+        node = self.Node.query.filter_by(node_id=self.node_id).first()
+        if node is None:
+            node = self.Node(node_id=self.node_id, hostname=socket.gethostname(), pid=os.getpid(), started_at=now)
+            self.db.session.add(node)
+        node.last_heartbeat = now
+        try:
+            self.db.session.commit()
+        except IntegrityError:
+            self.db.session.rollback()
+    
+    def _ensure_leases(self):
+        """Create missing lease rows (another node may be doing the same)"""
+        existing = {shard for (shard,) in self.db.session.query(self.Lease.shard).all()}
+        missing = [shard for shard in range(self.shard_count) if shard not in existing]
+        if not missing:
+            return
+        for shard in missing:
+            self.db.session.add(self.Lease(shard=shard))
+        try:
+            self.db.session.commit()
+        except IntegrityError:
+            self.db.session.rollback()
@@ -0,0 +1,572 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+# Hosts served by each platform's session; anything else goes to 'default'
+PLATFORM_HOSTS = {
+    'twitch': ('api.twitch.tv', 'id.twitch.tv'),
+    'youtube': ('www.googleapis.com', 'youtube.googleapis.com', 'www.youtube.com', 'youtube.com'),
+    'kick': ('kick.com', 'www.kick.com'),
+}
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRIES = 2
+
+# Token buckets per platform and credential: (requests per second, burst).
+# Twitch Helix allows 800 points/minute per client ID; Kick and YouTube don't
+# publish limits, so these stay well below where 429s start.
+PLATFORM_RATE_LIMITS = {
+    'twitch': (800 / 60, 800),
+    'youtube': (10, 50),
+    'kick': (2, 10),
+}
+
+# Waits up to this long are slept through; longer ones raise RateLimited so
+# the caller can reschedule instead of tying up a worker
+MAX_RATE_LIMIT_WAIT = 10
+
+# Circuit breaker per host: open after this many consecutive failures (connection
+# errors, timeouts, 5xx), then probe again after an exponentially growing delay
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_BASE_DELAY = 5
+BREAKER_MAX_DELAY = 300
+BREAKER_PROBE_TIMEOUT = 30
+
+# Conditional-request cache for get_parsed (entries per URL, LRU)
+RESPONSE_CACHE_SIZE = 2048
+MAX_AGE_RE = re.compile(r'max-age=(\d+)')
+
+
+class RateLimited(requests.RequestException):
+    """Raised instead of sending a request when a platform's limit won't lift soon"""
+    
+    def __init__(self, platform, wait):
+        super().__init__(f"{platform} rate limited for {wait:.0f}s")
+        self.platform = platform
+        self.wait = wait
+
+
+class CircuitOpen(requests.RequestException):
+    """Raised instead of sending a request while a host's circuit breaker is open"""
+    
+    def __init__(self, host, retry_in):
+        super().__init__(f"{host} circuit open, retrying in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed: requests flow, consecutive failures are counted.
+    Open: requests fail fast until the backoff delay has passed.
+    Half-open: a single probe request is let through; success closes the
+    breaker, failure re-opens it with the delay doubled (up to max_delay).
+    """
+    
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, base_delay=BREAKER_BASE_DELAY,
+                 max_delay=BREAKER_MAX_DELAY):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = 'closed'
+        self.failures = 0
+        self.trips = 0
+        self.open_until = 0
+        self.probe_started = 0
+        self.lock = threading.Lock()
+    
+    def allow(self):
+        """True if a request may be sent now"""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == 'closed':
+                return True
+            if self.state == 'open':
+                if now < self.open_until:
+                    return False
+                self.state = 'half_open'
+                self.probe_started = now
+                return True
+            
+            # Half-open: one probe at a time (a lost probe is replaced after a while)
+            if now - self.probe_started > BREAKER_PROBE_TIMEOUT:
+                self.probe_started = now
+                return True
+            return False
+    
+    def retry_in(self):
+        with self.lock:
+            return max(0, self.open_until - time.monotonic()) if self.state == 'open' else 0
+    
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.failures = 0
+            self.trips = 0
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                delay = min(self.max_delay, self.base_delay * (2 ** self.trips))
+                self.trips += 1
+                self.state = 'open'
+                self.open_until = time.monotonic() + delay
+    
+    def status(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'retry_in': round(max(0, self.open_until - time.monotonic()), 1) if self.state == 'open' else 0
+            }
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at rate tokens/second up to capacity.
+    reserve() always takes a token and returns how long the caller must wait
+    for it, so concurrent callers queue up instead of all failing. The server's
+    own view (remaining/reset headers, Retry-After) overrides the local count.
+    """
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+        self.lock = threading.Lock()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self):
+        """Seconds until a token is available, without taking one"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            deficit = max(0, 1 - self.tokens) / self.rate
+            return max(deficit, self.blocked_until - now, 0)
+    
+    def reserve(self, max_wait=None):
+        """
+        Take a token; returns the delay before it may be used. If the delay
+        would exceed max_wait nothing is taken and the delay is returned as-is.
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            delay = max((1 - self.tokens) / self.rate, self.blocked_until - now, 0)
+            if max_wait is not None and delay > max_wait:
+                return delay
+            self.tokens -= 1
+            return delay
+    
+    def sync(self, remaining, reset_in=None):
+        """Adopt the server's remaining count; block until reset when it is exhausted"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, remaining)
+            if remaining <= 0 and reset_in:
+                self.blocked_until = max(self.blocked_until, now + reset_in)
+    
+    def block(self, seconds):
+        """Stop handing out tokens for a while (429 / Retry-After)"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.tokens, 0)
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+def retry_after(headers):
+    """Seconds to back off after a 429, from Retry-After or Ratelimit-Reset (default 5s)"""
+    value = headers.get('Retry-After')
+    if value:
+        if value.strip().isdigit():
+            return int(value)
+        try:
+            return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    reset = headers.get('Ratelimit-Reset')
+    if reset and reset.isdigit():
+        return max(1, int(reset) - time.time())
+    return 5
+
+
+class CachedResponse:
+    """
+    Result of PlatformHttp.get_parsed. source says how it was served:
+    'fresh' (still fresh per Cache-Control, no request), 'not_modified' (304),
+    'unchanged' (200 with the same body, parse skipped) or 'parsed'.
+    """
+    __slots__ = ('status_code', 'value', 'source', 'response')
+    
+    def __init__(self, status_code, value=None, source='parsed', response=None):
+        self.status_code = status_code
+        self.value = value
+        self.source = source
+        self.response = response
+
+
+class _CacheEntry:
+    __slots__ = ('etag', 'last_modified', 'expires_at', 'body_hash', 'value')
+    
+    def __init__(self, etag, last_modified, expires_at, body_hash, value):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.expires_at = expires_at
+        self.body_hash = body_hash
+        self.value = value
+
+
+def _freshness(headers):
+    """Seconds a response may be reused without revalidation (0 if it must be revalidated)"""
+    cache_control = headers.get('Cache-Control', '').lower()
+    if 'no-store' in cache_control or 'no-cache' in cache_control:
+        return 0
+    match = MAX_AGE_RE.search(cache_control)
+    if not match:
+        return 0
+    age = headers.get('Age', '0')
+    return max(0, int(match.group(1)) - (int(age) if age.isdigit() else 0))
+
+
+def without_validators(headers):
+    """headers minus If-None-Match / If-Modified-Since, to force a full response"""
+    return {k: v for k, v in (headers or {}).items() if k.lower() not in ('if-none-match', 'if-modified-since')}
+
+
+class PlatformHttp:
+    """
+    Route outbound HTTP calls to a keep-alive requests.Session per platform.
+    Each session has a sized connection pool and transport-level retries for
+    connection errors and 5xx responses, so repeated checks against the same
+    host reuse TCP+TLS connections instead of opening new ones every call.
+    Exposes get/post/put/delete/request like the requests module.
+    """
+    
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, retries=DEFAULT_RETRIES):
+        self.pool_size = pool_size
+        self.retries = retries
+        self._pool_sizes = {}
+        self._sessions = {}
+        self._observers = []
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_stats = {'fresh': 0, 'not_modified': 0, 'unchanged': 0, 'parsed': 0}
+        self.rate_limits = dict(PLATFORM_RATE_LIMITS)
+        self._buckets = {}
+        self.rate_limit_stats = {'delayed': 0, 'deferred': 0, 'throttled': 0}
+        self._breakers = {}
+    
+    def _build_session(self, pool_size):
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            backoff_factor=0.5,
+            status_forcelist=(500, 502, 503, 504),
+            # POST isn't idempotent (token grants, uploads), and 429 waits
+            # belong to the rate-limit buckets, not a blocking urllib3 sleep
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=False,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    def platform_for(self, url):
+        """Return the platform whose session should carry a request to url"""
+        host = (urlsplit(url).hostname or '').lower()
+        for platform, hosts in PLATFORM_HOSTS.items():
+            if host in hosts:
+                return platform
+        return 'default'
+    
+    def session(self, platform):
+        """Return (creating on first use) the pooled session for a platform"""
+        with self._lock:
+            session = self._sessions.get(platform)
+            if session is None:
+                session = self._build_session(self._pool_sizes.get(platform, self.pool_size))
+                self._sessions[platform] = session
+            return session
+    
+    def set_pool_size(self, platform, pool_size):
+        """
+        Size a platform's connection pool, e.g. to match its worker count.
+        An existing session is replaced; requests already in flight finish on
+        the old one, which is then left for garbage collection.
+        """
+        with self._lock:
+            if self._pool_sizes.get(platform, self.pool_size) == pool_size:
+                return
+            self._pool_sizes[platform] = pool_size
+            self._sessions.pop(platform, None)
+    
+    def add_observer(self, observer):
+        """
+        Register observer(platform, seconds, status_code=None, error=None),
+        called after every request (e.g. to record latency metrics).
+        """
+        if observer not in self._observers:
+            self._observers.append(observer)
+    
+    def _notify(self, platform, started, status_code=None, error=None):
+        elapsed = time.monotonic() - started
+        for observer in self._observers:
+            try:
+                observer(platform, elapsed, status_code=status_code, error=error)
+            except Exception:
+                pass
+    
+    def breaker(self, url):
+        """Circuit breaker for the url's host (created on first use)"""
+        host = (urlsplit(url).hostname or '').lower()
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker()
+                self._breakers[host] = breaker
+            return host, breaker
+    
+    def breaker_status(self):
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {host: breaker.status() for host, breaker in breakers}
+    
+    @staticmethod
+    def record_outcome(breaker, status_code=None, error=None):
+        """Count a request against its breaker: errors and 5xx are failures"""
+        if error is not None or (status_code is not None and status_code >= 500):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    
+    def bucket(self, platform, credential=None):
+        """Token bucket for a platform + credential (None if the platform is unlimited)"""
+        if platform not in self.rate_limits:
+            return None
+        with self._lock:
+            key = (platform, credential)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(*self.rate_limits[platform])
+                self._buckets[key] = bucket
+            return bucket
+    
+    def rate_limit_wait(self, platform):
+        """Longest wait before any of a platform's buckets can serve a request"""
+        with self._lock:
+            buckets = [b for (p, _), b in self._buckets.items() if p == platform]
+        return max((b.wait_time() for b in buckets), default=0)
+    
+    def rate_limit_status(self):
+        with self._lock:
+            buckets = list(self._buckets.items())
+        status = {}
+        for (platform, _), bucket in buckets:
+            entry = status.setdefault(platform, {'buckets': 0, 'wait': 0})
+            entry['buckets'] += 1
+            entry['wait'] = max(entry['wait'], round(bucket.wait_time(), 1))
+        return {'platforms': status, **self.rate_limit_stats}
+    
+    @staticmethod
+    def credential_for(headers=None, params=None):
+        """The credential a platform meters requests by (client ID or API key)"""
+        client_id = CaseInsensitiveDict(headers or {}).get('Client-Id')
+        if isinstance(params, dict):
+            return client_id or params.get('client_id') or params.get('key')
+        return client_id
+    
+    def note_response(self, bucket, status_code, headers):
+        """
+        Feed a response's rate-limit headers back into its bucket.
+        Returns True if it was a 429 (the bucket is then blocked for Retry-After).
+        """
+        remaining = headers.get('Ratelimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            reset = headers.get('Ratelimit-Reset', '')
+            bucket.sync(int(remaining), max(0, int(reset) - time.time()) if reset.isdigit() else None)
+        
+        if status_code != 429:
+            return False
+        self._note('throttled')
+        bucket.block(retry_after(headers))
+        return True
+    
+    def _note(self, stat):
+        with self._lock:
+            self.rate_limit_stats[stat] += 1
+    
+    def request(self, method, url, **kwargs):
+        platform = self.platform_for(url)
+        bucket = self.bucket(platform, self.credential_for(kwargs.get('headers'), kwargs.get('params')))
+        host, breaker = self.breaker(url)
+        
+        # Retry once after a 429 if the platform says it will be short
+        for attempt in range(2):
+            if not breaker.allow():
+                raise CircuitOpen(host, breaker.retry_in())
+            
+            if bucket is not None:
+                delay = bucket.reserve(max_wait=MAX_RATE_LIMIT_WAIT)
+                if delay > MAX_RATE_LIMIT_WAIT:
+                    self._note('deferred')
+                    raise RateLimited(platform, delay)
+                if delay > 0:
+                    self._note('delayed')
+                    time.sleep(delay)
+            
+            started = time.monotonic()
+            try:
+                response = self.session(platform).request(method, url, **kwargs)
+            except Exception as e:
+                self.record_outcome(breaker, error=e)
+                self._notify(platform, started, error=e)
+                raise
+            self.record_outcome(breaker, status_code=response.status_code)
+            self._notify(platform, started, status_code=response.status_code)
+            
+            if bucket is None or not self.note_response(bucket, response.status_code, response.headers):
+                return response
+        return response
+    
+    def get_parsed(self, url, parse, params=None, headers=None, max_age=None, **kwargs):
+        """
+        GET url and return a CachedResponse whose value is parse(response) for
+        200 responses (None otherwise). Repeat calls for the same URL+params
+        honour Cache-Control max-age (capped at max_age seconds when given, e.g.
+        the caller's poll interval), revalidate with If-None-Match /
+        If-Modified-Since, and hash the body so an unchanged 200 reuses the
+        previous parse result instead of decoding it again.
+        parse should return a small digest (e.g. live state), not the payload.
+        """
+        key, entry, cached, headers = self.cache_lookup(url, params, headers)
+        if cached is not None:
+            return cached
+        response = self.get(url, params=params, headers=headers, **kwargs)
+        if response.status_code == 304 and entry is None:
+            # Nothing cached to reuse (validators came from the caller): ask for the body
+            response = self.get(url, params=params, headers=without_validators(headers), **kwargs)
+        return self.cache_update(key, entry, response.status_code, response.headers, response.content,
+                                 lambda: parse(response), response, max_age=max_age)
+    
+    def cache_lookup(self, url, params=None, headers=None):
+        """
+        First half of get_parsed, shared with the asyncio engine. Returns
+        (key, entry, cached, headers): cached is a CachedResponse when the
+        entry is still fresh (send nothing), otherwise headers carry the
+        revalidation validators for the request.
+        """
+        key = url + ('?' + urlencode(sorted(params.items())) if params else '')
+        
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+        
+        if entry is not None and entry.expires_at > time.monotonic():
+            self._count('fresh')
+            return key, entry, CachedResponse(200, entry.value, 'fresh'), None
+        
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return key, entry, None, headers
+    
+    def cache_update(self, key, entry, status_code, headers, content, parse, response=None, max_age=None):
+        """
+        Second half of get_parsed: turn a response (status, headers, body) into
+        a CachedResponse and update the cache. parse() is only called when the
+        body changed; freshness is capped at max_age seconds when given.
+        """
+        now = time.monotonic()
+        freshness = _freshness(headers)
+        if max_age is not None:
+            freshness = min(freshness, max_age)
+        
+        if status_code == 304 and entry is not None:
+            entry.expires_at = now + freshness
+            self._count('not_modified')
+            return CachedResponse(200, entry.value, 'not_modified', response)
+        
+        if status_code != 200:
+            with self._cache_lock:
+                self._cache.pop(key, None)
+            return CachedResponse(status_code, None, 'parsed', response)
+        
+        body_hash = hashlib.blake2b(content, digest_size=16).digest()
+        if entry is not None and entry.body_hash == body_hash:
+            value, source = entry.value, 'unchanged'
+        else:
+            value, source = parse(), 'parsed'
+        self._count(source)
+        
+        with self._cache_lock:
+            self._cache[key] = _CacheEntry(
+                headers.get('ETag'),
+                headers.get('Last-Modified'),
+                now + freshness,
+                body_hash,
+                value
+            )
+            self._cache.move_to_end(key)
+            while len(self._cache) > RESPONSE_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        
+        return CachedResponse(200, value, source, response)
+    
+    def _count(self, source):
+        with self._cache_lock:
+            self.cache_stats[source] += 1
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+    
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+    
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+    
+    def head(self, url, **kwargs):
+        return self.request('HEAD', url, **kwargs)
+    
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions = {}
+        with self._cache_lock:
+            self._cache.clear()
+        for session in sessions:
+            session.close()
+
+
+# Process-wide instance shared by the stream monitor and the rest of the app
+shared_http = PlatformHttp()
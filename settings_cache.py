@@ -0,0 +1,83 @@
+import threading
+import time
+
+# Settings row bumped on every write so other processes notice changes
+SETTINGS_VERSION_KEY = '_settings_version'
+
+# How often a process checks the version row (seconds)
+SETTINGS_CACHE_TTL = 5
+
+
+class SettingsCache:
+    """
+    In-process read-through cache of the Settings table.
+    All rows are loaded in one query and served from memory. At most every
+    ttl seconds one small query reads the version row, and only a changed
+    version triggers a reload. Writers call bump_version() inside their
+    transaction and invalidate() after committing, so changes made by this
+    process are visible at once and other processes see them within ttl.
+    """
+    
+    def __init__(self, app, db, Settings, ttl=SETTINGS_CACHE_TTL):
+        self.app = app
+        self.db = db
+        self.Settings = Settings
+        self.ttl = ttl
+        self._values = None
+        self._version = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        values = self._current()
+        return values[key] if key in values else default
+    
+    def all(self):
+        """Copy of every setting except the version row"""
+        values = dict(self._current())
+        values.pop(SETTINGS_VERSION_KEY, None)
+        return values
+    
+    def invalidate(self):
+        """Force a version check (and reload if needed) on the next read"""
+        with self._lock:
+            self._checked_at = 0
+            self._version = None
+    
+    def bump_version(self):
+        """Increment the version row in the current session (caller commits)"""
+        Settings = self.Settings
+        updated = Settings.query.filter_by(key=SETTINGS_VERSION_KEY).update(
+            {Settings.value: self.db.cast(self.db.cast(Settings.value, self.db.Integer) + 1, self.db.Text)},
+            synchronize_session=False
+        )
+        if not updated:
+            self.db.session.add(Settings(key=SETTINGS_VERSION_KEY, value='1'))
+    
+    def _current(self):
+        values = self._values
+        if values is not None and time.monotonic() - self._checked_at < self.ttl:
+            return values
+        
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._values
+            try:
+                self._refresh()
+            except Exception as e:
+                self.app.logger.error(f"Error loading settings: {e}")
+                if self._values is None:
+                    return {}
+            return self._values
+    
+    def _refresh(self):
+        """Reload all settings if the version row changed (called with the lock held)"""
+        with self.app.app_context():
+            row = self.Settings.query.filter_by(key=SETTINGS_VERSION_KEY).first()
+            version = row.value if row else None
+            
+            if self._values is None or version != self._version:
+                self._values = {s.key: s.value for s in self.Settings.query.all()}
+                self._version = self._values.get(SETTINGS_VERSION_KEY)
+        
+        self._checked_at = time.monotonic()
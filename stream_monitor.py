@@ -1,30 +1,514 @@
+import heapq
+import math
+import random
+import re
 import time
 import threading
-import requests
-from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 import os
 
+from monitor_shards import DEFAULT_LEASE_TTL, ShardCoordinator
+from platform_http import DEFAULT_POOL_SIZE, shared_http
+
+try:
+    from zoneinfo import ZoneInfo
+    YOUTUBE_QUOTA_TZ = ZoneInfo('America/Los_Angeles')
+except Exception:
+    # No tz database (e.g. frozen Windows build) - fall back to Pacific Standard Time
+    YOUTUBE_QUOTA_TZ = timezone(timedelta(hours=-8))
+
+# Helix accepts up to 100 user_login parameters per /streams request
+TWITCH_BATCH_SIZE = 100
+
+# Refresh the Twitch app access token this many seconds before it expires
+TWITCH_TOKEN_REFRESH_MARGIN = 300
+
+# YouTube channel IDs are 'UC' followed by 22 URL-safe base64 characters
+YOUTUBE_CHANNEL_ID_RE = re.compile(r'^UC[0-9A-Za-z_-]{22}$')
+
+# YouTube Data API quota cost per call, by endpoint
+YOUTUBE_QUOTA_COSTS = {'search': 100, 'channels': 1, 'playlistItems': 1, 'videos': 1}
+
+# videos.list accepts up to 50 comma-separated IDs per request
+YOUTUBE_VIDEOS_BATCH_SIZE = 50
+
+# Number of recent uploads inspected per channel by the 'api' strategy
+YOUTUBE_RECENT_UPLOADS = 10
+
+YOUTUBE_STRATEGIES = ('auto', 'api', 'page', 'search')
+
+# Broadcast start time embedded in a live watch page
+YOUTUBE_PAGE_START_RE = re.compile(r'"startTimestamp":"([^"]+)"')
+
+# Concurrent checks per platform, overridable with stream_monitor_<platform>_workers settings
+DEFAULT_MONITOR_WORKERS = {'twitch': 2, 'youtube': 4, 'kick': 8}
+
+# Adaptive scheduling: bounds for per-stream poll intervals (seconds)
+DEFAULT_MIN_INTERVAL = 20
+DEFAULT_MAX_INTERVAL = 600
+
+# Longest the scheduler sleeps, so newly added streams are picked up quickly
+SCHEDULER_TICK = 5
+
+# Streams due within this many seconds are checked together (keeps batches full)
+SCHEDULER_COALESCE_WINDOW = 3
+
+# Each check is scheduled at its interval times 1 +/- this, to spread streams
+# with equal intervals across the cycle
+SCHEDULE_JITTER = 0.1
+
+# Go-live history used to tighten polling around a streamer's usual start times
+HISTORY_DAYS = 28
+HISTORY_REFRESH_INTERVAL = 300
+GOLIVE_WINDOW_BEFORE = 15 * 60
+GOLIVE_WINDOW_AFTER = 10 * 60
+RECENTLY_LIVE_WINDOW = 30 * 60
+
+# Streams covered by push notifications (EventSub) are only polled to reconcile
+# missed events; polls right after a push are ignored since the platform API lags
+PUSH_RECONCILE_INTERVAL = 900
+PUSH_POLL_GRACE = 120
+
+
+# Histogram bucket upper bounds (seconds)
+DETECTION_LATENCY_BUCKETS = (5, 10, 15, 30, 45, 60, 90, 120, 180, 300, 600, 1800, 3600)
+CYCLE_DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120)
+REQUEST_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10)
+
+
+class LiveStatus(namedtuple('LiveStatus', ['is_live', 'started_at'])):
+    """Result of a live check; started_at is the platform-reported start time (naive UTC) if known"""
+    __slots__ = ()
+    
+    def __bool__(self):
+        return bool(self.is_live)
+
+
+OFFLINE = LiveStatus(False, None)
+
+
+def parse_platform_time(value):
+    """Parse a platform timestamp ('2024-01-01T12:00:00Z', '2024-01-01 12:00:00') to naive UTC"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00').replace(' ', 'T'))
+    except ValueError:
+        return None
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _kick_live_status(payload):
+    """LiveStatus digest of a Kick channel response"""
+    livestream = payload.get('livestream')
+    
+    # Check if livestream exists and is live
+    if livestream and livestream.get('is_live', False):
+        return LiveStatus(True, parse_platform_time(livestream.get('created_at') or livestream.get('start_time')))
+    return OFFLINE
+
+
+def _upload_video_ids(payload):
+    """Video IDs from a playlistItems.list response"""
+    return [
+        item['contentDetails']['videoId']
+        for item in payload.get('items', [])
+        if item.get('contentDetails', {}).get('videoId')
+    ]
+
+
+def _live_video_channels(payload):
+    """{channel_id: started_at} for the live videos in a videos.list response"""
+    live = {}
+    for video in payload.get('items', []):
+        snippet = video.get('snippet', {})
+        details = video.get('liveStreamingDetails', {})
+        if (snippet.get('liveBroadcastContent') == 'live' or
+                (details.get('actualStartTime') and not details.get('actualEndTime'))):
+            live[snippet.get('channelId')] = parse_platform_time(details.get('actualStartTime'))
+    return live
+
+
+def _batch_max_age(max_ages, channel_ids):
+    """Shortest cache lifetime among the channels a batched request covers (None if unknown)"""
+    ages = [max_ages[c] for c in channel_ids if c in max_ages]
+    return min(ages) if ages else None
+
+
+def _twitch_login_chunks(names):
+    """Unique lowercased logins, in chunks of up to TWITCH_BATCH_SIZE (one Helix /streams request each)"""
+    logins = sorted({name.lower() for name in names if name})
+    return [logins[i:i + TWITCH_BATCH_SIZE] for i in range(0, len(logins), TWITCH_BATCH_SIZE)]
+
+
+def _twitch_streams_params(logins):
+    """Query parameters of a Helix /streams request for a chunk of logins"""
+    return [('user_login', login) for login in logins] + [('first', str(TWITCH_BATCH_SIZE))]
+
+
+def _stale_twitch_token(headers):
+    """Bearer token of a request Twitch rejected with 401 (or None)"""
+    return headers.get('Authorization', '').replace('Bearer ', '') or None
+
+
+def _twitch_chunk_statuses(chunks, live_sets):
+    """
+    {login: LiveStatus} from each chunk and its {live login: started_at}
+    (None for a failed request, whose logins are left out)
+    """
+    results = {}
+    for chunk, live_logins in zip(chunks, live_sets):
+        if live_logins is not None:
+            results.update({
+                login: LiveStatus(True, parse_platform_time(live_logins[login])) if login in live_logins else OFFLINE
+                for login in chunk
+            })
+    return results
+
+
+def _statuses_by_name(targets, live):
+    """{stream_id: LiveStatus} for (stream_id, name) targets found in {lowercased name: LiveStatus}"""
+    return {
+        stream_id: live[name.lower()]
+        for stream_id, name in targets
+        if name and name.lower() in live
+    }
+
+
+def _twitch_live_logins(payload):
+    """{live login: started_at} from a Helix /streams response"""
+    return {
+        item['user_login'].lower(): item.get('started_at')
+        for item in payload.get('data', [])
+        if item.get('type', 'live') == 'live' and item.get('user_login')
+    }
+
+
+def _youtube_uploads_params(channel_id, api_key):
+    """playlistItems.list parameters for a channel's recent uploads"""
+    # The uploads playlist ID is the channel ID with a 'UU' prefix
+    return {
+        'part': 'contentDetails',
+        'playlistId': 'UU' + channel_id[2:],
+        'maxResults': str(YOUTUBE_RECENT_UPLOADS),
+        'key': api_key
+    }
+
+
+def _youtube_videos_params(video_ids, api_key):
+    """videos.list parameters for a batch of video IDs"""
+    return {'part': 'snippet,liveStreamingDetails', 'id': ','.join(video_ids), 'key': api_key}
+
+
+def _youtube_video_batches(channel_ids, uploads):
+    """
+    Plan the videos.list calls of an uploads-playlist check from each
+    channel's recent upload IDs (None where playlistItems failed). Returns
+    ({channel_id: OFFLINE} for the channels that could be checked,
+    {video_id: channel_id}, [video ID batches]).
+    """
+    live_channels = {}
+    video_channels = {}
+    for channel_id, videos in zip(channel_ids, uploads):
+        if videos is not None:
+            live_channels[channel_id] = OFFLINE
+            video_channels.update({video_id: channel_id for video_id in videos})
+    
+    video_ids = list(video_channels)
+    batches = [video_ids[i:i + YOUTUBE_VIDEOS_BATCH_SIZE] for i in range(0, len(video_ids), YOUTUBE_VIDEOS_BATCH_SIZE)]
+    return live_channels, video_channels, batches
+
+
+def _youtube_live_from_videos(live_channels, video_channels, batches, results):
+    """
+    Mark channels live from each batch's {channel_id: started_at}; channels
+    of a failed batch (None) are unknown and dropped. Returns live_channels.
+    """
+    for batch, live in zip(batches, results):
+        if live is None:
+            for video_id in batch:
+                live_channels.pop(video_channels[video_id], None)
+            continue
+        for channel_id, started_at in live.items():
+            if channel_id in live_channels:
+                live_channels[channel_id] = LiveStatus(True, started_at)
+    return live_channels
+
+
+def _youtube_stream_statuses(channel_ids, live_channels):
+    """
+    {stream_id: LiveStatus} from {stream_id: channel_id} and the channels
+    checked; streams whose channel could not be resolved are reported offline
+    """
+    return {
+        stream_id: live_channels[channel_id] if channel_id else OFFLINE
+        for stream_id, channel_id in channel_ids.items()
+        if not channel_id or channel_id in live_channels
+    }
+
+
+def _youtube_page_status(html):
+    """LiveStatus from a channel's /live page"""
+    if '"isLiveNow":true' not in html:
+        return OFFLINE
+    started = YOUTUBE_PAGE_START_RE.search(html)
+    return LiveStatus(True, parse_platform_time(started.group(1)) if started else None)
+
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative counts, like a Prometheus histogram"""
+    
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+    
+    def observe(self, value):
+        with self.lock:
+            index = len(self.buckets)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    index = i
+                    break
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+    
+    def _quantile(self, q, cumulative):
+        """Upper bound of the bucket holding the q-quantile (None if unknown)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        for bound, seen in zip(self.buckets, cumulative):
+            if seen >= target:
+                return bound
+        return None
+    
+    def snapshot(self):
+        with self.lock:
+            cumulative = []
+            running = 0
+            for value in self.counts[:-1]:
+                running += value
+                cumulative.append(running)
+            
+            return {
+                'buckets': [{'le': bound, 'count': seen} for bound, seen in zip(self.buckets, cumulative)] +
+                           [{'le': '+Inf', 'count': self.count}],
+                'count': self.count,
+                'sum': round(self.sum, 3),
+                'mean': round(self.sum / self.count, 3) if self.count else None,
+                'p50': self._quantile(0.5, cumulative),
+                'p90': self._quantile(0.9, cumulative),
+                'p99': self._quantile(0.99, cumulative)
+            }
+
+
+class MonitorMetrics:
+    """
+    Timing and error metrics for the stream monitor.
+    detection_latency: platform-reported stream start -> status change seen by us
+    recording_start_latency: platform-reported stream start -> auto-start recording
+    request_latency: per HTTP request, per platform
+    cycle_duration: one scheduler pass over the due streams
+    """
+    
+    def __init__(self):
+        self.detection_latency = {}
+        self.recording_start_latency = {}
+        self.request_latency = {}
+        self.cycle_duration = Histogram(CYCLE_DURATION_BUCKETS)
+        self.checks = {}
+        self.check_errors = {}
+        self.request_errors = {}
+        self.lock = threading.Lock()
+    
+    def _histogram(self, family, platform, buckets):
+        with self.lock:
+            if platform not in family:
+                family[platform] = Histogram(buckets)
+            return family[platform]
+    
+    def _increment(self, counters, platform, amount=1):
+        with self.lock:
+            counters[platform] = counters.get(platform, 0) + amount
+    
+    def observe_detection(self, platform, seconds):
+        self._histogram(self.detection_latency, platform, DETECTION_LATENCY_BUCKETS).observe(seconds)
+    
+    def observe_recording_start(self, platform, seconds):
+        self._histogram(self.recording_start_latency, platform, DETECTION_LATENCY_BUCKETS).observe(seconds)
+    
+    def observe_request(self, platform, seconds, status_code=None, error=None):
+        """PlatformHttp observer: called once per outbound request"""
+        self._histogram(self.request_latency, platform, REQUEST_LATENCY_BUCKETS).observe(seconds)
+        if error is not None or (status_code and status_code >= 400):
+            self._increment(self.request_errors, platform)
+    
+    def observe_checks(self, platform, checked, failed):
+        self._increment(self.checks, platform, checked)
+        if failed:
+            self._increment(self.check_errors, platform, failed)
+    
+    def snapshot(self):
+        def family(histograms):
+            return {platform: histogram.snapshot() for platform, histogram in list(histograms.items())}
+        
+        with self.lock:
+            counters = {
+                'checks': dict(self.checks),
+                'check_errors': dict(self.check_errors),
+                'request_errors': dict(self.request_errors)
+            }
+        
+        return {
+            'detection_latency': family(self.detection_latency),
+            'recording_start_latency': family(self.recording_start_latency),
+            'request_latency': family(self.request_latency),
+            'cycle_duration': self.cycle_duration.snapshot(),
+            **counters
+        }
+
+
+class YouTubeQuotaTracker:
+    """
+    Track YouTube Data API quota spent against a daily budget.
+    The budget resets at midnight Pacific time like the real quota. Spending is
+    paced across the day: a call is only allowed if it keeps total usage under
+    the share of the budget that has accrued so far (plus a small burst).
+    """
+    
+    def __init__(self, daily_quota=10000, burst_fraction=0.05):
+        self.daily_quota = daily_quota
+        self.burst_fraction = burst_fraction
+        self.used = 0
+        self.day = None
+        self.lock = threading.Lock()
+    
+    def _roll_day(self, now):
+        today = now.date()
+        if today != self.day:
+            self.day = today
+            self.used = 0
+    
+    def _allowance(self, now):
+        """Quota units that may have been spent by this point in the day"""
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        fraction = (now - midnight).total_seconds() / 86400
+        return min(self.daily_quota, self.daily_quota * (fraction + self.burst_fraction))
+    
+    def can_spend(self, units):
+        with self.lock:
+            now = datetime.now(YOUTUBE_QUOTA_TZ)
+            self._roll_day(now)
+            return self.used + units <= self._allowance(now)
+    
+    def spend(self, units):
+        with self.lock:
+            self._roll_day(datetime.now(YOUTUBE_QUOTA_TZ))
+            self.used += units
+    
+    def set_daily_quota(self, units):
+        with self.lock:
+            self.daily_quota = units
+    
+    def status(self):
+        with self.lock:
+            now = datetime.now(YOUTUBE_QUOTA_TZ)
+            self._roll_day(now)
+            return {
+                'daily_quota': self.daily_quota,
+                'used': self.used,
+                'allowance': int(self._allowance(now)),
+                'remaining': max(0, self.daily_quota - self.used)
+            }
+
+
 class StreamMonitor:
     """
     Monitor streams across Twitch, YouTube, and Kick platforms.
     Automatically starts recording when streams go live if auto_record is enabled.
     """
+    engine = 'threads'
     
-    def __init__(self, app, db, Stream, Settings, obs_wrapper):
+    def __init__(self, app, db, Stream, Settings, obs_wrapper, StreamEvent=None, settings_cache=None,
+                 MonitorShardLease=None, MonitorNode=None):
         self.app = app
         self.db = db
         self.Stream = Stream
         self.Settings = Settings
+        self.settings_cache = settings_cache
+        self.MonitorShardLease = MonitorShardLease
+        self.MonitorNode = MonitorNode
+        self.StreamEvent = StreamEvent
         self.obs = obs_wrapper
         self.running = False
         self.thread = None
-        self.check_interval = 60  # Check every 60 seconds
+        self.check_interval = 60  # Base interval between checks of a stream
+        self.min_interval = DEFAULT_MIN_INTERVAL
+        self.max_interval = DEFAULT_MAX_INTERVAL
         self.logger = app.logger if hasattr(app, 'logger') else None
+        
+        # Pooled keep-alive sessions per platform, shared with the rest of the app
+        self.http = shared_http
+        
+        self.metrics = MonitorMetrics()
+        self.http.add_observer(self.metrics.observe_request)
+        
+        # Streams seen offline by this process, and start times of live streams;
+        # latency is only measured for go-lives we could actually have caught
+        self._seen_offline = set()
+        self._live_started_at = {}
+        
+        # Twitch app access token shared by all checks and threads
+        self._twitch_token = None
+        self._twitch_token_lock = threading.Lock()
+        
+        # YouTube URL/handle -> channel ID lookups already performed
+        self._youtube_channel_ids = {}
+        self.youtube_quota = YouTubeQuotaTracker()
+        self.youtube_strategy = 'auto'
+        
+        # Worker pools used for concurrent checks while the monitor is running
+        self.workers = dict(DEFAULT_MONITOR_WORKERS)
+        self._executors = {}
+        
+        # Per-stream schedule: heap of (due_time, stream_id); _next_check holds
+        # the authoritative due time so superseded heap entries can be skipped
+        self._schedule = []
+        self._next_check = {}
+        self._intervals = {}
+        self._history = {}
+        self._history_loaded_at = 0
+        self._wake = threading.Event()
+        
+        # Guards the schedule, history and push state below: the scheduler
+        # and the webhook handlers (Flask threads) both update them
+        self._lock = threading.RLock()
+        
+        # Push ingestion: platforms with webhooks configured, last pushed state
+        # per stream, streams with a verified subscription or push, forced re-polls
+        self.push_platforms = set()
+        self.reconcile_interval = PUSH_RECONCILE_INTERVAL
+        self._pushed = {}
+        self._push_confirmed = set()
+        self._poll_now = set()
+        
+        # Sharding across nodes (None unless stream_monitor_shards > 1)
+        self.sharding = None
+        self._shard_heartbeat_at = 0
     
     def start(self):
         """Start the stream monitoring thread"""
         if not self.running:
             self.running = True
+            self._start_executors()
             self.thread = threading.Thread(target=self._monitor_loop, daemon=True)
             self.thread.start()
             self._log("Stream monitor started")
@@ -32,10 +516,64 @@ class StreamMonitor:
     def stop(self):
         """Stop the stream monitoring thread"""
         self.running = False
+        self._wake.set()
         if self.thread:
             self.thread.join(timeout=5)
+        self._shutdown_executors()
         self._log("Stream monitor stopped")
     
+    def _start_executors(self):
+        """Create one worker pool per platform, sized from settings"""
+        for platform, default in DEFAULT_MONITOR_WORKERS.items():
+            value = self._get_setting(f'stream_monitor_{platform}_workers')
+            self.workers[platform] = max(1, int(value)) if value and value.isdigit() else default
+            self.http.set_pool_size(platform, max(self.workers[platform], DEFAULT_POOL_SIZE))
+            
+            if platform not in self._executors:
+                self._executors[platform] = ThreadPoolExecutor(
+                    max_workers=self.workers[platform],
+                    thread_name_prefix=f'monitor-{platform}'
+                )
+        
+        # Coordinators run each platform's checks side by side
+        if 'cycle' not in self._executors:
+            self._executors['cycle'] = ThreadPoolExecutor(
+                max_workers=len(DEFAULT_MONITOR_WORKERS) + 1,
+                thread_name_prefix='monitor-cycle'
+            )
+    
+    def _shutdown_executors(self):
+        executors, self._executors = self._executors, {}
+        for executor in executors.values():
+            executor.shutdown(wait=False)
+    
+    def _map(self, platform, fn, items):
+        """
+        Run fn over items on the platform's worker pool and return the results
+        in order. Runs inline when there is no pool (e.g. one-off checks).
+        """
+        items = list(items)
+        if len(items) < 2:
+            return [fn(item) for item in items]
+        return [future.result() for future in [self._submit(platform, fn, item) for item in items]]
+    
+    def _submit(self, platform, fn, *args):
+        """Submit fn to the platform's worker pool, or run it inline if there is none"""
+        executor = self._executors.get(platform)
+        if executor is not None:
+            try:
+                return executor.submit(fn, *args)
+            except RuntimeError:
+                # Pool was shut down by stop() mid-cycle
+                pass
+        
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
     def _log(self, message):
         """Log message to app logger or print"""
         if self.logger:
@@ -44,36 +582,23 @@ class StreamMonitor:
             print(f"[StreamMonitor] {message}")
     
     def _monitor_loop(self):
-        """Main monitoring loop - runs continuously while self.running is True"""
+        """
+        Main monitoring loop - runs continuously while self.running is True.
+        Each stream is polled on its own adaptive interval; the loop sleeps
+        until the next stream is due and checks everything due together.
+        """
         while self.running:
+            # Clear before looking for due work so a wake-up that arrives
+            # during the cycle cuts the following wait short instead of being lost
+            self._wake.clear()
             try:
                 with self.app.app_context():
-                    # Get all streams that have auto_record enabled
-                    streams = self.Stream.query.filter_by(auto_record=True).all()
-                    
-                    for stream in streams:
-                        try:
-                            is_live = self._check_stream_live(stream)
-                            
-                            # Only log status changes
-                            if is_live != stream.is_live:
-                                stream.is_live = is_live
-                                self._log(f"Stream '{stream.name}' status changed: {'LIVE' if is_live else 'OFFLINE'}")
-                                
-                                # Auto-start recording if stream went live
-                                if is_live and not stream.is_recording and stream.auto_record:
-                                    self._log(f"Auto-starting recording for '{stream.name}'")
-                                    self._auto_start_recording(stream)
-                                
-                                # Note: We don't auto-stop recordings when stream goes offline
-                                # This allows capturing the end of stream and post-stream content
-                        
-                        except Exception as e:
-                            self._log(f"Error checking stream '{stream.name}': {e}")
-                    
-                    # Commit all status changes
-                    self.db.session.commit()
-                    
+                    due = self._load_due_streams()
+                    if due:
+                        cycle_start = time.monotonic()
+                        results = self._check_streams(due)
+                        self._apply_results(due, results, cycle_start)
+            
             except Exception as e:
                 self._log(f"Stream monitor error: {e}")
                 try:
@@ -81,8 +606,472 @@ class StreamMonitor:
                 except:
                     pass
             
-            # Wait before next check
-            time.sleep(self.check_interval)
+            # Wait until the next stream is due
+            self._wake.wait(self._seconds_until_next_check())
+        
+        if self.sharding is not None:
+            try:
+                with self.app.app_context():
+                    self.sharding.release()
+            except Exception as e:
+                self._log(f"Error releasing shard leases: {e}")
+    
+    def _load_due_streams(self):
+        """Refresh settings and shard leases, then return the streams due now (needs an app context)"""
+        self._load_schedule_settings()
+        self._update_sharding()
+        
+        # Get all streams that have auto_record enabled (only our shards)
+        streams = self.Stream.query.filter_by(auto_record=True).all()
+        if self.sharding is not None:
+            streams = [s for s in streams if self.sharding.owns(s.id)]
+        return self._due_streams(streams)
+    
+    def _apply_results(self, streams, results, cycle_start):
+        """Record check results, start recordings and reschedule (needs an app context)"""
+        went_live = []
+        with self._lock:
+            for stream in streams:
+                if stream.id in results and self._set_live_status(stream, results[stream.id]):
+                    went_live.append(stream)
+        
+        # Commit all status changes in one transaction
+        self.db.session.commit()
+        
+        for stream in went_live:
+            self._start_recording_if_needed(stream)
+        
+        self.metrics.cycle_duration.observe(time.monotonic() - cycle_start)
+        
+        self._load_history()
+        with self._lock:
+            for stream in streams:
+                self._reschedule(stream, checked=stream.id in results)
+    
+    def _load_schedule_settings(self):
+        """Read scheduling bounds from settings (needs an app context)"""
+        for attr, key in (('check_interval', 'check_interval'),
+                          ('min_interval', 'stream_monitor_min_interval'),
+                          ('max_interval', 'stream_monitor_max_interval')):
+            value = self._get_setting(key)
+            if value and value.isdigit() and int(value) > 0:
+                setattr(self, attr, int(value))
+        
+        self.min_interval = min(self.min_interval, self.check_interval)
+        self.max_interval = max(self.max_interval, self.check_interval)
+        
+        value = self._get_setting('stream_monitor_reconcile_interval')
+        if value and value.isdigit() and int(value) > 0:
+            self.reconcile_interval = int(value)
+        self.push_platforms = {'twitch'} if self._get_setting('twitch_eventsub_secret') else set()
+    
+    def _update_sharding(self):
+        """
+        Join, leave or heartbeat the shard group per stream_monitor_shards
+        (needs an app context). A failed heartbeat is only logged: the leases
+        then lapse locally and this node stops checking until it renews.
+        """
+        value = self._get_setting('stream_monitor_shards')
+        shard_count = int(value) if value and value.isdigit() else 0
+        if shard_count <= 1 or not self.MonitorShardLease or not self.MonitorNode:
+            if self.sharding is not None:
+                self.sharding.release()
+                self.sharding = None
+                self._log("Sharding disabled, monitoring all streams")
+            return
+        
+        value = self._get_setting('stream_monitor_lease_ttl')
+        lease_ttl = int(value) if value and value.isdigit() and int(value) > 0 else DEFAULT_LEASE_TTL
+        
+        if self.sharding is None or self.sharding.shard_count != shard_count:
+            if self.sharding is not None:
+                self.sharding.release()
+            self.sharding = ShardCoordinator(
+                self.db, self.MonitorShardLease, self.MonitorNode, shard_count, lease_ttl=lease_ttl
+            )
+            self._shard_heartbeat_at = 0
+            self._log(f"Sharding enabled: node {self.sharding.node_id}, {shard_count} shards")
+        self.sharding.lease_ttl = lease_ttl
+        
+        if time.monotonic() - self._shard_heartbeat_at < self.sharding.heartbeat_interval:
+            return
+        
+        previous = self.sharding.shards
+        try:
+            shards = self.sharding.heartbeat()
+            self._shard_heartbeat_at = time.monotonic()
+        except Exception as e:
+            self.db.session.rollback()
+            self._log(f"Shard heartbeat failed: {e}")
+            return
+        
+        if shards != previous:
+            self._log(f"Now monitoring shards {sorted(shards)} of {shard_count} "
+                      f"({self.sharding.live_nodes} live node(s))")
+    
+    def _due_streams(self, streams):
+        """
+        Sync the schedule with the current stream list and return the streams
+        that are due. New streams are due immediately; removed ones are dropped.
+        """
+        now = time.time()
+        by_id = {stream.id: stream for stream in streams}
+        
+        with self._lock:
+            for stream_id in list(self._next_check):
+                if stream_id not in by_id:
+                    del self._next_check[stream_id]
+                    self._intervals.pop(stream_id, None)
+            
+            requested, self._poll_now = self._poll_now, set()
+            for stream_id in by_id:
+                if stream_id not in self._next_check or stream_id in requested:
+                    self._next_check[stream_id] = now
+                    heapq.heappush(self._schedule, (now, stream_id))
+            
+            due = []
+            while self._schedule and self._schedule[0][0] <= now + SCHEDULER_COALESCE_WINDOW:
+                due_time, stream_id = heapq.heappop(self._schedule)
+                if self._next_check.get(stream_id) == due_time:
+                    due.append(by_id[stream_id])
+        return due
+    
+    def _reschedule(self, stream, checked=True):
+        """Queue the stream's next check according to its adaptive interval"""
+        interval = self._poll_interval(stream)
+        
+        # Jitter spreads streams with equal intervals across the cycle
+        due_time = time.time() + interval * random.uniform(1 - SCHEDULE_JITTER, 1 + SCHEDULE_JITTER)
+        
+        # A check skipped by a platform rate limit is retried as soon as the
+        # limit lifts rather than a whole interval later; every stream deferred
+        # this way gets the same due time so they go out in one batch
+        if not checked:
+            wait = self.http.rate_limit_wait((stream.platform or '').lower())
+            if wait > 0:
+                due_time = min(due_time, time.time() + wait)
+        
+        with self._lock:
+            self._intervals[stream.id] = interval
+            self._next_check[stream.id] = due_time
+            heapq.heappush(self._schedule, (due_time, stream.id))
+    
+    def _seconds_until_next_check(self):
+        with self._lock:
+            # Drop superseded entries so the head is a real due time
+            while self._schedule and self._next_check.get(self._schedule[0][1]) != self._schedule[0][0]:
+                heapq.heappop(self._schedule)
+            
+            if not self._schedule:
+                return SCHEDULER_TICK
+            return min(SCHEDULER_TICK, max(0, self._schedule[0][0] - time.time()))
+    
+    def _cache_max_age(self, stream_ids):
+        """
+        Longest a cached platform response may answer a check for these
+        streams: less than the earliest the next check can run (the shortest
+        interval, shortened by jitter and coalescing), so a scheduled check
+        always goes past a response cached by the previous one.
+        """
+        with self._lock:
+            intervals = [self._intervals[i] for i in stream_ids if i in self._intervals]
+        interval = min(intervals) if intervals else self.min_interval
+        return max(0, interval * (1 - SCHEDULE_JITTER) - SCHEDULER_COALESCE_WINDOW - 1)
+    
+    def _channel_max_ages(self, channel_ids):
+        """{channel_id: cache max age} from {stream_id: channel_id}"""
+        max_ages = {}
+        for stream_id, channel_id in channel_ids.items():
+            if channel_id:
+                age = self._cache_max_age([stream_id])
+                max_ages[channel_id] = min(age, max_ages.get(channel_id, age))
+        return max_ages
+    
+    def _poll_interval(self, stream):
+        """
+        Pick how long to wait before checking a stream again.
+        Tight around the streamer's usual go-live times and right after a
+        stream ended (crash/restart), base rate while live or recording, and
+        backing off for channels that have been dormant for days. Streams
+        whose push subscription is confirmed (verified, or a signed push
+        arrived) are only polled to reconcile; a webhook secret alone is not
+        enough, since nothing may be subscribed.
+        """
+        # With sharding, pushes for other nodes' shards are dropped, so keep polling
+        if ((stream.platform or '').lower() in self.push_platforms and stream.id in self._push_confirmed
+                and self.sharding is None):
+            return max(self.min_interval, self.reconcile_interval)
+        
+        now = datetime.utcnow()
+        history = self._history.get(stream.id, {})
+        last_online = history.get('last_online')
+        last_offline = history.get('last_offline')
+        
+        if last_offline and (now - last_offline).total_seconds() < RECENTLY_LIVE_WINDOW and not stream.is_live:
+            return self.min_interval
+        
+        if stream.is_live or stream.is_recording:
+            return max(self.min_interval, self.check_interval // 2)
+        
+        if self._near_usual_golive(history.get('golive_minutes', []), now):
+            return self.min_interval
+        
+        # Dormant channels: one extra base interval per idle day
+        last_seen = last_online or getattr(stream, 'created_at', None)
+        if not last_seen:
+            return self.check_interval
+        idle_days = max(0, (now - last_seen).total_seconds()) / 86400
+        return int(min(self.max_interval, self.check_interval * (1 + idle_days)))
+    
+    def _near_usual_golive(self, golive_minutes, now):
+        """True if now is just before/after a time of day the stream usually goes live"""
+        minute = now.hour * 60 + now.minute
+        for golive in golive_minutes:
+            # Minutes until the usual go-live time, wrapped to [-720, 720)
+            delta = (golive - minute + 720) % 1440 - 720
+            if -GOLIVE_WINDOW_AFTER / 60 <= delta <= GOLIVE_WINDOW_BEFORE / 60:
+                return True
+        return False
+    
+    def _load_history(self, force=False):
+        """Refresh per-stream go-live history from StreamEvent rows (needs an app context)"""
+        if not self.StreamEvent:
+            return
+        if not force and time.time() - self._history_loaded_at < HISTORY_REFRESH_INTERVAL:
+            return
+        
+        since = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+        events = (self.StreamEvent.query
+                  .filter(self.StreamEvent.detected_at >= since)
+                  .order_by(self.StreamEvent.detected_at)
+                  .all())
+        
+        history = {}
+        for event in events:
+            self._remember_event(history, event.stream_id, event.event_type, event.detected_at)
+        
+        with self._lock:
+            self._history = history
+            self._history_loaded_at = time.time()
+    
+    def _remember_event(self, history, stream_id, event_type, detected_at):
+        entry = history.setdefault(stream_id, {'golive_minutes': []})
+        if event_type == 'online':
+            entry['last_online'] = detected_at
+            entry['golive_minutes'].append(detected_at.hour * 60 + detected_at.minute)
+        elif event_type == 'offline':
+            entry['last_offline'] = detected_at
+    
+    def schedule_status(self):
+        """Next check time and current interval for every scheduled stream"""
+        now = time.time()
+        return {
+            stream_id: {
+                'next_check_in': max(0, int(due_time - now)),
+                'interval': self._intervals.get(stream_id)
+            }
+            for stream_id, due_time in list(self._next_check.items())
+        }
+    
+    def _check_streams(self, streams):
+        """
+        Check a set of streams concurrently across platforms.
+        Must be called inside an app context: settings are read and Stream rows
+        are touched only on the calling thread, while the HTTP checks run on the
+        per-platform worker pools. Returns {stream.id: LiveStatus} for the
+        streams that could be checked; failed checks are left out.
+        """
+        by_platform = {}
+        for stream in streams:
+            by_platform.setdefault((stream.platform or '').lower(), []).append(stream)
+        
+        self._load_youtube_settings()
+        
+        jobs = []
+        
+        twitch_streams = by_platform.pop('twitch', [])
+        if twitch_streams:
+            jobs.append(self._submit(
+                'cycle', self._check_twitch_streams, [(s.id, s.name) for s in twitch_streams],
+                self._get_setting('twitch_client_id'), self._get_setting('twitch_client_secret')
+            ))
+        
+        youtube_streams = by_platform.pop('youtube', [])
+        if youtube_streams:
+            jobs.append(self._submit(
+                'cycle', self._check_youtube_batch, [(s.id, s.channel_id, s.channel_url) for s in youtube_streams],
+                self._get_setting('youtube_api_key')
+            ))
+        
+        kick_streams = by_platform.pop('kick', [])
+        if kick_streams:
+            jobs.append(self._submit('cycle', self._check_kick_streams, [(s.id, s.name) for s in kick_streams]))
+        
+        results = {}
+        for job in jobs:
+            try:
+                results.update(job.result())
+            except Exception as e:
+                self._log(f"Stream check error: {e}")
+        
+        for platform, unknown in by_platform.items():
+            self._log(f"Unknown platform: {platform}")
+            results.update({s.id: OFFLINE for s in unknown})
+        
+        for platform, checked in (('twitch', twitch_streams), ('youtube', youtube_streams), ('kick', kick_streams)):
+            if checked:
+                failed = sum(1 for s in checked if s.id not in results)
+                self.metrics.observe_checks(platform, len(checked), failed)
+        
+        # Persist YouTube channel IDs resolved during the checks
+        for stream in youtube_streams:
+            self._store_youtube_channel_id(stream)
+        
+        return results
+    
+    def _check_twitch_streams(self, targets, client_id, client_secret):
+        """Check (stream_id, login) pairs; returns {stream_id: LiveStatus}"""
+        live = self._check_twitch_batch([name for _, name in targets], client_id, client_secret)
+        return _statuses_by_name(targets, live)
+    
+    def _check_kick_streams(self, targets):
+        """Check (stream_id, channel_name) pairs in parallel; returns {stream_id: LiveStatus}"""
+        statuses = self._map(
+            'kick', lambda target: self._kick_status(target[1], max_age=self._cache_max_age([target[0]])), targets
+        )
+        return {
+            stream_id: status
+            for (stream_id, _), status in zip(targets, statuses)
+            if status is not None
+        }
+    
+    def _set_live_status(self, stream, status, source='poll'):
+        """Record a stream's live status (LiveStatus or bool); returns True if it just went live"""
+        is_live = bool(status)
+        started_at = getattr(status, 'started_at', None)
+        platform = (stream.platform or '').lower()
+        
+        # A poll that raced a push notification (or still sees the platform's
+        # lagging API) must not undo the pushed state
+        pushed = self._pushed.get(stream.id)
+        if source == 'poll' and pushed and time.time() - pushed[1] < PUSH_POLL_GRACE:
+            return False
+        
+        if not is_live:
+            self._seen_offline.add(stream.id)
+            self._live_started_at.pop(stream.id, None)
+        elif started_at:
+            self._live_started_at[stream.id] = started_at
+        
+        # Only log status changes
+        if is_live == stream.is_live:
+            return False
+        
+        if is_live and started_at and stream.id in self._seen_offline:
+            self.metrics.observe_detection(platform, max(0, (datetime.utcnow() - started_at).total_seconds()))
+        
+        stream.is_live = is_live
+        self._log(f"Stream '{stream.name}' status changed: {'LIVE' if is_live else 'OFFLINE'}")
+        
+        if self.StreamEvent:
+            event_type = 'online' if is_live else 'offline'
+            detected_at = datetime.utcnow()
+            self.db.session.add(self.StreamEvent(
+                stream_id=stream.id,
+                event_type=event_type,
+                source=source,
+                detected_at=detected_at
+            ))
+            self._remember_event(self._history, stream.id, event_type, detected_at)
+        
+        # Note: We don't auto-stop recordings when stream goes offline
+        # This allows capturing the end of stream and post-stream content
+        return is_live
+    
+    def handle_live_event(self, platform, login, is_live, started_at=None, channel_id=None, source='eventsub'):
+        """
+        Apply a pushed online/offline notification (e.g. Twitch EventSub).
+        Drives the same transitions as a poll: status change, StreamEvent row,
+        auto-start recording. Must be called inside an app context.
+        Returns the streams whose status changed.
+        """
+        login = (login or '').lower()
+        status = LiveStatus(bool(is_live), parse_platform_time(started_at))
+        
+        changed = []
+        streams = self._push_targets(platform, login, channel_id)
+        with self._lock:
+            for stream in streams:
+                if self.sharding is not None and not self.sharding.owns(stream.id):
+                    continue
+                self._pushed[stream.id] = (status.is_live, time.time())
+                self._push_confirmed.add(stream.id)
+                if channel_id and not stream.channel_id:
+                    stream.channel_id = str(channel_id)
+                
+                was_live = stream.is_live
+                self._set_live_status(stream, status, source=source)
+                if stream.is_live != was_live:
+                    changed.append(stream)
+        
+        self.db.session.commit()
+        
+        for stream in changed:
+            if stream.is_live:
+                self._start_recording_if_needed(stream)
+        return changed
+    
+    def handle_subscription_verified(self, platform, login, channel_id=None):
+        """Poll streams only to reconcile once the platform confirmed their push subscription"""
+        streams = self._push_targets(platform, (login or '').lower(), channel_id)
+        with self._lock:
+            for stream in streams:
+                if self.sharding is None or self.sharding.owns(stream.id):
+                    self._push_confirmed.add(stream.id)
+        return streams
+    
+    def handle_subscription_revoked(self, platform, login, channel_id=None):
+        """Fall back to adaptive polling for streams whose push subscription ended"""
+        streams = self._push_targets(platform, (login or '').lower(), channel_id)
+        with self._lock:
+            for stream in streams:
+                self._push_confirmed.discard(stream.id)
+                self._pushed.pop(stream.id, None)
+                self._poll_now.add(stream.id)
+        self._wake.set()
+        return streams
+    
+    def _push_targets(self, platform, login, channel_id=None):
+        """Monitored streams matching a pushed broadcaster (by platform user ID, then login)"""
+        streams = [
+            s for s in self.Stream.query.filter_by(auto_record=True).all()
+            if (s.platform or '').lower() == platform
+        ]
+        if channel_id:
+            matched = [s for s in streams if s.channel_id == str(channel_id)]
+            if matched:
+                return matched
+        return [s for s in streams if (s.name or '').lower() == login]
+    
+    def _start_recording_if_needed(self, stream):
+        """Auto-start recording for a stream that went live"""
+        # Never record a stream whose shard lease this node no longer holds
+        if self.sharding is not None and not self.sharding.owns(stream.id):
+            return
+        
+        try:
+            if stream.is_live and not stream.is_recording and stream.auto_record:
+                started_at = self._live_started_at.get(stream.id)
+                if started_at and stream.id in self._seen_offline:
+                    self.metrics.observe_recording_start(
+                        (stream.platform or '').lower(),
+                        max(0, (datetime.utcnow() - started_at).total_seconds())
+                    )
+                
+                self._log(f"Auto-starting recording for '{stream.name}'")
+                self._auto_start_recording(stream)
+        except Exception as e:
+            self._log(f"Error updating stream '{stream.name}': {e}")
     
     def _check_stream_live(self, stream):
         """
@@ -99,7 +1088,8 @@ class StreamMonitor:
             
             elif platform == 'youtube':
                 api_key = self._get_setting('youtube_api_key')
-                return self._check_youtube(stream.channel_url or stream.channel_id, api_key)
+                self._load_youtube_settings()
+                return self._check_youtube(self._youtube_channel_id(stream, api_key), api_key)
             
             elif platform == 'kick':
                 return self._check_kick(stream.name)
@@ -107,7 +1097,7 @@ class StreamMonitor:
             else:
                 self._log(f"Unknown platform: {platform}")
                 return False
-                
+        
         except Exception as e:
             self._log(f"Error checking {stream.platform} stream '{stream.name}': {e}")
             return False
@@ -117,184 +1107,508 @@ class StreamMonitor:
         Check if a Twitch channel is live using the Helix API.
         Requires Client ID and optionally Client Secret for OAuth token.
         """
+        return bool(self._check_twitch_batch([channel_name], client_id, client_secret).get(channel_name.lower()))
+    
+    def _check_twitch_batch(self, channel_names, client_id, client_secret=None):
+        """
+        Check many Twitch channels at once using the Helix API.
+        Channels are grouped into requests of up to TWITCH_BATCH_SIZE user_login
+        parameters, which run in parallel on the Twitch worker pool. Returns
+        {login: LiveStatus} (lowercased logins) for every channel whose request
+        succeeded, so callers can leave the others untouched.
+        """
         if not client_id:
-            return False
+            return {}
         
+        chunks = _twitch_login_chunks(channel_names)
+        live_sets = self._map('twitch', lambda chunk: self._fetch_twitch_streams(chunk, client_id, client_secret), chunks)
+        return _twitch_chunk_statuses(chunks, live_sets)
+    
+    def _fetch_twitch_streams(self, logins, client_id, client_secret=None):
+        """Fetch one Helix /streams page for up to 100 logins; returns {live login: started_at} or None"""
         try:
-            access_token = None
+            headers = self._twitch_headers(client_id, client_secret)
             
-            # Get OAuth token if we have client_secret
-            if client_secret:
-                try:
-                    token_response = requests.post(
-                        'https://id.twitch.tv/oauth2/token',
-                        params={
-                            'client_id': client_id,
-                            'client_secret': client_secret,
-                            'grant_type': 'client_credentials'
-                        },
-                        timeout=10
-                    )
-                    
-                    if token_response.status_code == 200:
-                        access_token = token_response.json().get('access_token')
-                except Exception as e:
-                    self._log(f"Error getting Twitch OAuth token: {e}")
-            
-            # Build headers
-            headers = {'Client-ID': client_id}
-            if access_token:
-                headers['Authorization'] = f'Bearer {access_token}'
-            
-            # Check stream status
-            response = requests.get(
-                f'https://api.twitch.tv/helix/streams?user_login={channel_name}',
+            # Check stream status for the whole chunk in one call
+            params = _twitch_streams_params(logins)
+            response = self.http.get(
+                'https://api.twitch.tv/helix/streams',
+                params=params,
                 headers=headers,
                 timeout=10
             )
             
-            if response.status_code == 200:
-                data = response.json().get('data', [])
-                return len(data) > 0
-            else:
-                self._log(f"Twitch API returned status {response.status_code} for '{channel_name}'")
-                return False
+            # Token revoked or expired early - refresh once and retry
+            if response.status_code == 401 and client_secret:
+                headers = self._twitch_headers(client_id, client_secret, stale_token=_stale_twitch_token(headers))
+                response = self.http.get(
+                    'https://api.twitch.tv/helix/streams',
+                    params=params,
+                    headers=headers,
+                    timeout=10
+                )
             
+            if response.status_code != 200:
+                self._log(f"Twitch API returned status {response.status_code} for {len(logins)} channel(s)")
+                return None
+            
+            return _twitch_live_logins(response.json())
+        
         except Exception as e:
-            self._log(f"Twitch API error for '{channel_name}': {e}")
-            return False
+            self._log(f"Twitch API error for {len(logins)} channel(s): {e}")
+            return None
     
-    def _check_youtube(self, channel_identifier, api_key):
+    def _twitch_headers(self, client_id, client_secret=None, stale_token=None):
+        """Build Helix request headers, using the cached app access token when available"""
+        headers = {'Client-ID': client_id}
+        if client_secret:
+            access_token = self._get_twitch_token(client_id, client_secret, stale_token)
+            if access_token:
+                headers['Authorization'] = f'Bearer {access_token}'
+        return headers
+    
+    def _get_twitch_token(self, client_id, client_secret, stale_token=None):
         """
-        Check if a YouTube channel is live.
-        channel_identifier can be a channel URL, channel ID, or username.
+        Return a client-credentials app access token for Twitch.
+        The token is cached with its expiry and only requested again shortly
+        before it expires, when the credentials change, or when a request was
+        rejected with stale_token (another thread may already have replaced it).
         """
-        if not api_key or not channel_identifier:
-            return False
-        
-        try:
-            channel_id = None
+        with self._twitch_token_lock:
+            cached = self._twitch_token
+            if (cached and cached['access_token'] != stale_token
+                    and cached['credentials'] == (client_id, client_secret)
+                    and time.time() < cached['expires_at'] - TWITCH_TOKEN_REFRESH_MARGIN):
+                return cached['access_token']
+            
+            self._twitch_token = None
             
-            # Parse channel identifier
-            if 'youtube.com' in channel_identifier or 'youtu.be' in channel_identifier:
-                # Extract from URL
-                if '/channel/' in channel_identifier:
-                    channel_id = channel_identifier.split('/channel/')[-1].split('/')[0].split('?')[0]
+            try:
+                token_response = self.http.post(
+                    'https://id.twitch.tv/oauth2/token',
+                    params={
+                        'client_id': client_id,
+                        'client_secret': client_secret,
+                        'grant_type': 'client_credentials'
+                    },
+                    timeout=10
+                )
                 
-                elif '/@' in channel_identifier:
-                    # Handle @username format
-                    username = channel_identifier.split('/@')[-1].split('/')[0].split('?')[0]
-                    
-                    # Convert username to channel ID
-                    search_response = requests.get(
-                        'https://www.googleapis.com/youtube/v3/search',
-                        params={
-                            'part': 'snippet',
-                            'q': username,
-                            'type': 'channel',
-                            'key': api_key,
-                            'maxResults': 1
-                        },
-                        timeout=10
-                    )
-                    
-                    if search_response.status_code == 200:
-                        items = search_response.json().get('items', [])
-                        if items:
-                            channel_id = items[0]['id']['channelId']
-                        else:
-                            return False
-                    else:
-                        return False
+                if token_response.status_code != 200:
+                    self._log(f"Twitch OAuth token request returned status {token_response.status_code}")
+                    return None
                 
-                elif '/c/' in channel_identifier or '/user/' in channel_identifier:
-                    # Custom URL - need to search
-                    username = channel_identifier.split('/c/' if '/c/' in channel_identifier else '/user/')[-1].split('/')[0].split('?')[0]
-                    
-                    search_response = requests.get(
-                        'https://www.googleapis.com/youtube/v3/search',
-                        params={
-                            'part': 'snippet',
-                            'q': username,
-                            'type': 'channel',
-                            'key': api_key,
-                            'maxResults': 1
-                        },
-                        timeout=10
-                    )
-                    
-                    if search_response.status_code == 200:
-                        items = search_response.json().get('items', [])
-                        if items:
-                            channel_id = items[0]['id']['channelId']
-                        else:
-                            return False
-                    else:
-                        return False
-            else:
-                # Assume it's a channel ID
-                channel_id = channel_identifier
+                data = token_response.json()
+                access_token = data.get('access_token')
+                if access_token:
+                    self._twitch_token = {
+                        'access_token': access_token,
+                        'expires_at': time.time() + int(data.get('expires_in', 0) or 0),
+                        'credentials': (client_id, client_secret)
+                    }
+                return access_token
+            except Exception as e:
+                self._log(f"Error getting Twitch OAuth token: {e}")
+                return None
+    
+    def _youtube_channel_id(self, stream, api_key):
+        """
+        Return the YouTube channel ID for a stream, resolving it only once.
+        A resolved ID is written back to stream.channel_id so later cycles
+        (and restarts, once committed) skip the lookup entirely.
+        """
+        if YOUTUBE_CHANNEL_ID_RE.match(stream.channel_id or ''):
+            return stream.channel_id
+        
+        channel_id = self._resolve_youtube_channel_id(stream.channel_url or stream.channel_id, api_key)
+        if channel_id and channel_id != stream.channel_id:
+            stream.channel_id = channel_id
+            self._log(f"Resolved YouTube channel for '{stream.name}': {channel_id}")
+        return channel_id
+    
+    def _resolve_youtube_channel_id(self, channel_identifier, api_key):
+        """
+        Turn a channel URL, @handle, username or channel ID into a channel ID.
+        Successful lookups are cached in memory for the lifetime of the monitor.
+        """
+        if not channel_identifier:
+            return None
+        
+        channel_identifier = channel_identifier.strip()
+        if YOUTUBE_CHANNEL_ID_RE.match(channel_identifier):
+            return channel_identifier
+        
+        cached = self._youtube_channel_ids.get(channel_identifier)
+        if cached:
+            return cached
+        
+        channel_id = None
+        
+        # Parse channel identifier
+        if 'youtube.com' in channel_identifier or 'youtu.be' in channel_identifier:
+            # Extract from URL
+            if '/channel/' in channel_identifier:
+                channel_id = channel_identifier.split('/channel/')[-1].split('/')[0].split('?')[0]
+            
+            elif '/@' in channel_identifier:
+                # Handle @username format
+                handle = channel_identifier.split('/@')[-1].split('/')[0].split('?')[0]
+                channel_id = self._lookup_youtube_channel({'forHandle': f'@{handle}'}, api_key)
+                if not channel_id:
+                    channel_id = self._search_youtube_channel(handle, api_key)
+            
+            elif '/user/' in channel_identifier:
+                # Legacy username
+                username = channel_identifier.split('/user/')[-1].split('/')[0].split('?')[0]
+                channel_id = self._lookup_youtube_channel({'forUsername': username}, api_key)
+                if not channel_id:
+                    channel_id = self._search_youtube_channel(username, api_key)
             
+            elif '/c/' in channel_identifier:
+                # Custom URL - the API has no direct lookup, need to search
+                custom_name = channel_identifier.split('/c/')[-1].split('/')[0].split('?')[0]
+                channel_id = self._search_youtube_channel(custom_name, api_key)
+        
+        elif channel_identifier.startswith('@'):
+            channel_id = self._lookup_youtube_channel({'forHandle': channel_identifier}, api_key)
             if not channel_id:
-                return False
+                channel_id = self._search_youtube_channel(channel_identifier[1:], api_key)
+        
+        else:
+            # Bare handle: look it up rather than assume it is a channel ID
+            channel_id = self._lookup_youtube_channel({'forHandle': f'@{channel_identifier}'}, api_key)
+        
+        if channel_id and not YOUTUBE_CHANNEL_ID_RE.match(channel_id):
+            self._log(f"'{channel_identifier}' is not a valid YouTube channel ID")
+            channel_id = None
+        
+        if channel_id:
+            self._youtube_channel_ids[channel_identifier] = channel_id
+        return channel_id
+    
+    def _lookup_youtube_channel(self, lookup_params, api_key):
+        """Look up a channel ID with channels.list (1 quota unit)"""
+        if not api_key:
+            return None
+        
+        try:
+            response = self.http.get(
+                'https://www.googleapis.com/youtube/v3/channels',
+                params={'part': 'id', 'key': api_key, **lookup_params},
+                timeout=10
+            )
+            self.youtube_quota.spend(YOUTUBE_QUOTA_COSTS['channels'])
             
-            # Check for live streams on this channel
-            response = requests.get(
+            if response.status_code == 200:
+                items = response.json().get('items', [])
+                if items:
+                    return items[0]['id']
+            else:
+                self._log(f"YouTube channels API returned status {response.status_code}")
+        except Exception as e:
+            self._log(f"YouTube channel lookup error: {e}")
+        return None
+    
+    def _search_youtube_channel(self, query, api_key):
+        """Find a channel ID with search.list (100 quota units) - last resort"""
+        if not api_key:
+            return None
+        
+        try:
+            search_response = self.http.get(
                 'https://www.googleapis.com/youtube/v3/search',
                 params={
                     'part': 'snippet',
-                    'channelId': channel_id,
-                    'eventType': 'live',
-                    'type': 'video',
+                    'q': query,
+                    'type': 'channel',
                     'key': api_key,
                     'maxResults': 1
                 },
                 timeout=10
             )
+            self.youtube_quota.spend(YOUTUBE_QUOTA_COSTS['search'])
             
-            if response.status_code == 200:
-                items = response.json().get('items', [])
-                return len(items) > 0
+            if search_response.status_code == 200:
+                items = search_response.json().get('items', [])
+                if items:
+                    return items[0]['id']['channelId']
             else:
-                self._log(f"YouTube API returned status {response.status_code}")
+                self._log(f"YouTube search API returned status {search_response.status_code}")
+        except Exception as e:
+            self._log(f"YouTube channel search error: {e}")
+        return None
+    
+    def _check_youtube(self, channel_identifier, api_key):
+        """
+        Check if a YouTube channel is live.
+        channel_identifier can be a channel URL, channel ID, or username.
+        """
+        if not channel_identifier:
+            return False
+        
+        try:
+            channel_id = self._resolve_youtube_channel_id(channel_identifier, api_key)
+            
+            if not channel_id:
                 return False
-                
+            
+            live_channels = self._check_youtube_channels([channel_id], api_key)
+            return bool(live_channels and live_channels.get(channel_id))
+        
         except Exception as e:
             self._log(f"YouTube API error: {e}")
             return False
     
+    def _check_youtube_batch(self, targets, api_key):
+        """
+        Check (stream_id, channel_id, channel_url) targets in one go.
+        Channel lookups and live checks run on the YouTube worker pool.
+        Returns {stream_id: LiveStatus} for every stream that could be checked;
+        streams missing from the result should keep their current status.
+        """
+        channel_ids = dict(zip(
+            [t[0] for t in targets],
+            self._map('youtube', lambda target: self._youtube_target_channel_id(target[1], target[2], api_key), targets)
+        ))
+        
+        live_channels = self._check_youtube_channels(
+            sorted({c for c in channel_ids.values() if c}), api_key, self._channel_max_ages(channel_ids)
+        )
+        if live_channels is None:
+            return {}
+        return _youtube_stream_statuses(channel_ids, live_channels)
+    
+    def _youtube_target_channel_id(self, channel_id, channel_url, api_key):
+        """A stream's YouTube channel ID, resolving its URL or handle if needed; None on failure"""
+        if YOUTUBE_CHANNEL_ID_RE.match(channel_id or ''):
+            return channel_id
+        try:
+            return self._resolve_youtube_channel_id(channel_url or channel_id, api_key)
+        except Exception as e:
+            self._log(f"Error resolving YouTube channel '{channel_url or channel_id}': {e}")
+            return None
+    
+    def _store_youtube_channel_id(self, stream):
+        """Write a channel ID resolved by a batch check back to the Stream row"""
+        if YOUTUBE_CHANNEL_ID_RE.match(stream.channel_id or ''):
+            return
+        
+        identifier = (stream.channel_url or stream.channel_id or '').strip()
+        channel_id = self._youtube_channel_ids.get(identifier)
+        if channel_id and channel_id != stream.channel_id:
+            stream.channel_id = channel_id
+            self._log(f"Resolved YouTube channel for '{stream.name}': {channel_id}")
+    
+    def _load_youtube_settings(self):
+        """Read the detection strategy and quota budget (needs an app context)"""
+        strategy = (self._get_setting('youtube_detection_strategy') or 'auto').lower()
+        self.youtube_strategy = strategy if strategy in YOUTUBE_STRATEGIES else 'auto'
+        
+        quota = self._get_setting('youtube_daily_quota')
+        if quota and quota.isdigit():
+            self.youtube_quota.set_daily_quota(int(quota))
+    
+    def _youtube_strategy(self, channel_count, api_key):
+        """
+        Pick the live detection strategy for this cycle.
+        'auto' uses the cheap API path while the quota budget allows it and
+        falls back to the (quota-free) public /live page otherwise.
+        """
+        strategy = self.youtube_strategy
+        
+        if not api_key:
+            return 'page'
+        
+        if strategy == 'auto':
+            video_batches = math.ceil(channel_count * YOUTUBE_RECENT_UPLOADS / YOUTUBE_VIDEOS_BATCH_SIZE)
+            estimated_cost = (channel_count * YOUTUBE_QUOTA_COSTS['playlistItems'] +
+                              video_batches * YOUTUBE_QUOTA_COSTS['videos'])
+            return 'api' if self.youtube_quota.can_spend(estimated_cost) else 'page'
+        
+        return strategy
+    
+    def _check_youtube_channels(self, channel_ids, api_key, max_ages=None):
+        """
+        Check which of the given channel IDs are live.
+        max_ages ({channel_id: seconds}) caps how long cached API responses are reused.
+        Returns {channel_id: LiveStatus} for the channels that could be checked,
+        or None if the check failed outright.
+        """
+        if not channel_ids:
+            return {}
+        
+        strategy = self._youtube_strategy(len(channel_ids), api_key)
+        
+        if strategy == 'api':
+            return self._youtube_live_via_uploads(channel_ids, api_key, max_ages)
+        elif strategy == 'search':
+            return self._youtube_live_via_search(channel_ids, api_key)
+        return self._youtube_live_via_page(channel_ids)
+    
+    def _youtube_live_via_uploads(self, channel_ids, api_key, max_ages=None):
+        """
+        Detect live broadcasts from each channel's uploads playlist.
+        Costs 1 unit per channel for playlistItems.list plus 1 unit per 50
+        videos for videos.list, instead of 100 units per channel for search.
+        """
+        max_ages = max_ages or {}
+        
+        def recent_uploads(channel_id):
+            try:
+                response = self.http.get_parsed(
+                    'https://www.googleapis.com/youtube/v3/playlistItems',
+                    lambda response: _upload_video_ids(response.json()),
+                    params=_youtube_uploads_params(channel_id, api_key),
+                    max_age=max_ages.get(channel_id),
+                    timeout=10
+                )
+                return self._recent_uploads_result(response)
+            except Exception as e:
+                self._log(f"YouTube API error: {e}")
+                return None
+        
+        def live_channels_for(video_ids):
+            try:
+                response = self.http.get_parsed(
+                    'https://www.googleapis.com/youtube/v3/videos',
+                    lambda response: _live_video_channels(response.json()),
+                    params=_youtube_videos_params(video_ids, api_key),
+                    max_age=_batch_max_age(max_ages, (video_channels[v] for v in video_ids)),
+                    timeout=10
+                )
+                return self._live_videos_result(response)
+            except Exception as e:
+                self._log(f"YouTube API error: {e}")
+                return None
+        
+        live_channels, video_channels, batches = _youtube_video_batches(
+            channel_ids, self._map('youtube', recent_uploads, channel_ids)
+        )
+        return _youtube_live_from_videos(live_channels, video_channels, batches,
+                                         self._map('youtube', live_channels_for, batches))
+    
+    def _recent_uploads_result(self, response):
+        """
+        Video IDs from a playlistItems.list response, charging its quota unless
+        it was served from cache; [] for a channel without uploads, None on errors
+        """
+        if response.source != 'fresh':
+            self.youtube_quota.spend(YOUTUBE_QUOTA_COSTS['playlistItems'])
+        
+        if response.status_code == 404:
+            # Channel has no uploads playlist yet
+            return []
+        if response.status_code != 200:
+            self._log(f"YouTube playlistItems API returned status {response.status_code}")
+            return None
+        return response.value
+    
+    def _live_videos_result(self, response):
+        """{channel_id: started_at} from a videos.list response, charging its quota; None on errors"""
+        if response.source != 'fresh':
+            self.youtube_quota.spend(YOUTUBE_QUOTA_COSTS['videos'])
+        
+        if response.status_code != 200:
+            self._log(f"YouTube videos API returned status {response.status_code}")
+            return None
+        return response.value
+    
+    def _youtube_live_via_page(self, channel_ids):
+        """
+        Detect live broadcasts by fetching each channel's public /live page.
+        Uses no API quota; a live channel's /live page is the watch page of
+        the current broadcast.
+        """
+        def page_is_live(channel_id):
+            try:
+                response = self.http.get(
+                    f'https://www.youtube.com/channel/{channel_id}/live',
+                    headers={
+                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+                        'Accept-Language': 'en-US,en;q=0.9'
+                    },
+                    cookies={'CONSENT': 'YES+1'},
+                    timeout=10
+                )
+                
+                if response.status_code == 200:
+                    return _youtube_page_status(response.text)
+                self._log(f"YouTube live page returned status {response.status_code} for {channel_id}")
+            except Exception as e:
+                self._log(f"YouTube live page error for {channel_id}: {e}")
+            return None
+        
+        return {
+            channel_id: status
+            for channel_id, status in zip(channel_ids, self._map('youtube', page_is_live, channel_ids))
+            if status is not None
+        }
+    
+    def _youtube_live_via_search(self, channel_ids, api_key):
+        """Detect live broadcasts with search.list?eventType=live (100 quota units per channel)"""
+        def search_is_live(channel_id):
+            try:
+                response = self.http.get(
+                    'https://www.googleapis.com/youtube/v3/search',
+                    params={
+                        'part': 'snippet',
+                        'channelId': channel_id,
+                        'eventType': 'live',
+                        'type': 'video',
+                        'key': api_key,
+                        'maxResults': 1
+                    },
+                    timeout=10
+                )
+                self.youtube_quota.spend(YOUTUBE_QUOTA_COSTS['search'])
+                
+                if response.status_code == 200:
+                    return LiveStatus(len(response.json().get('items', [])) > 0, None)
+                self._log(f"YouTube API returned status {response.status_code}")
+            except Exception as e:
+                self._log(f"YouTube API error: {e}")
+            return None
+        
+        return {
+            channel_id: status
+            for channel_id, status in zip(channel_ids, self._map('youtube', search_is_live, channel_ids))
+            if status is not None
+        }
+    
     def _check_kick(self, channel_name):
         """
         Check if a Kick channel is live using their public API.
         """
+        return bool(self._kick_status(channel_name))
+    
+    def _kick_status(self, channel_name, max_age=None):
+        """Return a Kick channel's LiveStatus, or None if the check failed"""
         try:
-            response = requests.get(
+            response = self.http.get_parsed(
                 f'https://kick.com/api/v2/channels/{channel_name}',
+                lambda response: _kick_live_status(response.json()),
                 headers={
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
                 },
+                max_age=max_age,
                 timeout=10
             )
             
             if response.status_code == 200:
-                data = response.json()
-                livestream = data.get('livestream')
-                
-                # Check if livestream exists and is live
-                if livestream:
-                    return livestream.get('is_live', False)
-                return False
+                return response.value
             else:
                 self._log(f"Kick API returned status {response.status_code} for '{channel_name}'")
-                return False
-                
+                return None
+        
         except Exception as e:
             self._log(f"Kick API error for '{channel_name}': {e}")
-            return False
+            return None
     
     def _get_setting(self, key):
-        """Get a setting value from the database"""
+        """Get a setting value (from the shared settings cache when there is one)"""
         try:
+            if self.settings_cache is not None:
+                return self.settings_cache.get(key)
             setting = self.Settings.query.filter_by(key=key).first()
             return setting.value if setting else None
         except:
@@ -303,59 +1617,16 @@ class StreamMonitor:
     def _auto_start_recording(self, stream):
         """
         Trigger auto-start of recording when stream goes live.
-        Creates a recording entry and starts OBS recording if connected.
+        The app starts OBS (in the configured output format) and creates the
+        recording entry; without OBS only the entry is created.
         """
         try:
-            # Import here to avoid circular dependency
-            from datetime import datetime
-            
-            # Check if OBS is connected
-            obs_connected = self.obs.get('connected') if self.obs else False
-            
-            if obs_connected:
-                try:
-                    from obswebsocket import requests as obs_requests
-                    obs_client = self.obs.get('client')
-                    if obs_client:
-                        obs_client.call(obs_requests.StartRecord())
-                        self._log(f"OBS recording started for '{stream.name}'")
-                except Exception as e:
-                    self._log(f"Error starting OBS recording: {e}")
+            success, message = self.obs.start_recording(stream.id)
+            if success:
+                self._log(f"Recording started for '{stream.name}'")
             else:
-                self._log(f"OBS not connected, creating recording entry only for '{stream.name}'")
-            
-            # Import Recording model
-            from app import Recording, RECORDINGS_DIR, current_recording_info
-            
-            # Create recording entry
-            filename = f"recording_{stream.id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
-            filepath = os.path.join(RECORDINGS_DIR, filename)
-            
-            recording = Recording(
-                stream_id=stream.id,
-                filename=filename,
-                filepath=filepath,
-                segment_number=1,
-                status='recording',
-                platform=stream.platform
-            )
-            self.db.session.add(recording)
-            
-            # Update stream status
-            stream.is_recording = True
-            
-            # Update global recording info
-            current_recording_info.update({
-                'is_recording': True,
-                'current_segment': 1,
-                'segment_start_time': datetime.now().isoformat(),
-                'stream_id': stream.id,
-                'recording_id': recording.id
-            })
-            
-            self.db.session.commit()
-            self._log(f"Recording entry created for stream '{stream.name}' (ID: {recording.id})")
-            
+                self._log(f"Error starting recording for '{stream.name}': {message}")
+        
         except Exception as e:
             self._log(f"Error auto-starting recording for '{stream.name}': {e}")
             try:
@@ -0,0 +1,147 @@
+import pytest
+
+import clip_cutter
+from clip_cutter import (
+    MAX_BATCH_GAP, MAX_BATCH_OUTPUTS, _fan_out, cut_clip, cut_clips, keyframe_after, keyframe_at_or_before,
+    split_points
+)
+
+KEYFRAMES = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+
+
+@pytest.fixture
+def ffmpeg_runs(monkeypatch):
+    runs = []
+    monkeypatch.setattr(clip_cutter, 'run_ffmpeg', lambda cmd, duration=None: runs.append(cmd))
+    monkeypatch.setattr(clip_cutter, 'has_audio', lambda path: True)
+    monkeypatch.setattr(clip_cutter, 'video_codec', lambda path: ('h264', 'yuv420p'))
+    
+    def no_probe(*args, **kwargs):
+        raise AssertionError('keyframes were passed in, nothing should be probed')
+    monkeypatch.setattr(clip_cutter, 'probe_keyframes', no_probe)
+    return runs
+
+
+def seeks(cmd):
+    """(-ss, -t) of each input of an ffmpeg command"""
+    return [(float(cmd[i + 1]), float(cmd[i + 3])) for i, arg in enumerate(cmd) if arg == '-ss']
+
+
+def filter_graph(cmd):
+    return cmd[cmd.index('-filter_complex') + 1] if '-filter_complex' in cmd else ''
+
+
+# Keyframe lookups and split points
+
+def test_keyframe_lookups_tolerate_rounding():
+    assert keyframe_at_or_before(KEYFRAMES, 5.9) == 4.0
+    assert keyframe_at_or_before(KEYFRAMES, 5.9995) == 6.0
+    assert keyframe_at_or_before(KEYFRAMES[1:], 1.0) is None
+    
+    assert keyframe_after(KEYFRAMES, 4.0) == 6.0
+    assert keyframe_after(KEYFRAMES, 3.9995) == 6.0
+    assert keyframe_after(KEYFRAMES, 10.0) is None
+
+
+def test_split_points_take_the_last_keyframe_that_fits():
+    assert split_points(KEYFRAMES, 11, max_duration=5) == [4.0, 8.0]
+    assert split_points(KEYFRAMES, 10, max_duration=10) == []
+    assert split_points(KEYFRAMES, 12, max_duration=4) == [4.0, 8.0]
+
+
+def test_split_points_give_up_on_gops_longer_than_a_part():
+    assert split_points([0.0, 7.0], 12, max_duration=5) is None
+    assert split_points([], 12, max_duration=5) is None
+
+
+# Filter graphs
+
+def test_fan_out_shares_one_decode_between_outputs():
+    graph, args = _fan_out('0:v:0', '0:a:0', '', 'clip.mp4', ('thumb.jpg', 1.5), 'vert.mp4')
+    assert graph[0] == '[0:v:0]split=3[clip_in][thumb_in][vert_in]'
+    assert '[thumb_in]trim=start=1.500000,scale=320:-1[thumb]' in graph
+    
+    # An input stream can be mapped by both clip and vertical; the thumbnail gets one frame, no audio
+    assert args.count('0:a:0?') == 2
+    thumb = args.index('thumb.jpg')
+    assert args[thumb - 5:thumb] == ['[thumb]', '-frames:v', '1', '-update', '1']
+
+
+def test_fan_out_splits_a_filtered_audio_label():
+    graph, args = _fan_out('vo0', 'ao0', 'w0', 'clip.mp4', None, 'vert.mp4')
+    assert '[ao0]asplit=2[w0clip_a][w0vert_a]' in graph
+    assert '[w0clip_a]' in args and '[w0vert_a]' in args
+    
+    graph, args = _fan_out('vo0', 'ao0', 'w0', 'clip.mp4')
+    assert not any('asplit' in chain for chain in graph)
+    assert '[ao0]' in args
+    
+    assert _fan_out('0:v:0', None, '') == ([], [])
+
+
+# Mode selection
+
+def test_copy_snaps_back_to_the_previous_keyframe(ffmpeg_runs):
+    assert cut_clip('rec.mkv', 'out.mp4', 5, 3, mode='copy', keyframes=KEYFRAMES) == (4.0, 4.0)
+    assert seeks(ffmpeg_runs[0]) == [(4.0, 4.0)]
+    assert ffmpeg_runs[0][ffmpeg_runs[0].index('-c') + 1] == 'copy'
+
+
+def test_without_keyframes_every_mode_reencodes(ffmpeg_runs):
+    for mode in ('copy', 'smart'):
+        assert cut_clip('rec.mkv', 'out.mp4', 5, 3, mode=mode, keyframes=[]) == (5, 3)
+    assert all('libx264' in cmd and seeks(cmd) == [(5, 3)] for cmd in ffmpeg_runs)
+
+
+def test_smart_encodes_only_the_head(ffmpeg_runs, tmp_path):
+    output = str(tmp_path / 'out.mp4')
+    assert cut_clip('rec.mkv', output, 5, 4, mode='smart', keyframes=KEYFRAMES) == (5, 4)
+    
+    head, tail, concat = ffmpeg_runs
+    assert head[head.index('-t') + 1] == '1.000000' and 'libx264' in head
+    assert seeks(tail) == [(6.0, 3.0)] and 'libx264' not in tail
+    assert 'concat' in concat
+
+
+def test_smart_falls_back_to_one_encode(ffmpeg_runs):
+    # The whole clip sits inside one GOP, or the vertical variant needs a full encode anyway
+    cut_clip('rec.mkv', 'out.mp4', 4.5, 1, mode='smart', keyframes=KEYFRAMES)
+    cut_clip('rec.mkv', 'out.mp4', 5, 4, mode='smart', keyframes=KEYFRAMES, vertical_path='vert.mp4')
+    assert len(ffmpeg_runs) == 2
+    assert all('libx264' in cmd and len(seeks(cmd)) == 1 for cmd in ffmpeg_runs)
+
+
+# Batches
+
+def test_copy_batch_seeks_each_window_in_one_process(ffmpeg_runs):
+    windows = [(f"{i}.mp4", i * 2 + 1, 1) for i in range(MAX_BATCH_OUTPUTS + 1)]
+    keyframes = [float(t) for t in range(0, 2 * MAX_BATCH_OUTPUTS + 4, 2)]
+    results = cut_clips('rec.mkv', windows, mode='copy', keyframes=keyframes)
+    
+    assert results[0] == (0.0, 2.0)
+    assert [len(seeks(cmd)) for cmd in ffmpeg_runs] == [MAX_BATCH_OUTPUTS, 1]
+    assert seeks(ffmpeg_runs[0])[1] == (2.0, 2.0)
+
+
+def test_copy_batch_without_keyframes_reencodes(ffmpeg_runs):
+    results = cut_clips('rec.mkv', [('a.mp4', 5, 2), ('b.mp4', 6, 2)], mode='copy', keyframes=[])
+    assert results == [(5, 2), (6, 2)]
+    assert len(ffmpeg_runs) == 1
+    assert 'split=2' in filter_graph(ffmpeg_runs[0])
+
+
+def test_smart_and_single_windows_are_cut_one_by_one(ffmpeg_runs):
+    cut_clips('rec.mkv', [('a.mp4', 4, 2), ('b.mp4', 6, 2)], mode='smart', keyframes=KEYFRAMES)
+    cut_clips('rec.mkv', [('c.mp4', 8, 2)], mode='reencode')
+    assert [seeks(cmd) for cmd in ffmpeg_runs] == [[(4, 2)], [(6, 2)], [(8, 2)]]
+
+
+def test_reencode_batches_only_nearby_windows(ffmpeg_runs):
+    windows = [('a.mp4', 100, 30), ('b.mp4', 120, 30), ('c.mp4', 151 + MAX_BATCH_GAP, 20), ('d.mp4', 3000, 10)]
+    cut_clips('rec.mkv', windows, mode='reencode')
+    
+    # a and b overlap and share a decode; c and d are far away and seek on their own
+    assert [seeks(cmd) for cmd in ffmpeg_runs] == [[(100, 50)], [(151 + MAX_BATCH_GAP, 20)], [(3000, 10)]]
+    assert 'b.mp4' in ffmpeg_runs[0] and 'c.mp4' not in ffmpeg_runs[0]
+    assert 'split=2' in filter_graph(ffmpeg_runs[0])
+    assert '[v1]trim=start=20.000000:duration=30.000000' in filter_graph(ffmpeg_runs[0])
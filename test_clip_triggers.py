@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+from clip_triggers import DEFAULT_TRIGGER_WINDOW, REPLAY_BUFFER_MARGIN, replay_buffer_seconds, trigger_window
+
+
+def trigger(pre_buffer=None, clip_duration=None, post_buffer=None):
+    return SimpleNamespace(pre_buffer=pre_buffer, clip_duration=clip_duration, post_buffer=post_buffer)
+
+
+def test_trigger_window_uses_the_trigger_values():
+    assert trigger_window(trigger(15, 60, 10), {'context_pre_buffer': 30}) == (15, 60, 10)
+
+
+def test_trigger_window_falls_back_to_smart_detection_defaults():
+    assert trigger_window(trigger(), {}) == (10, 0, 5)
+    
+    defaults = {'context_pre_buffer': 30, 'context_post_buffer': 8}
+    assert trigger_window(trigger(clip_duration=45), defaults) == (30, 45, 8)
+
+
+def test_replay_buffer_holds_the_longest_window():
+    assert replay_buffer_seconds([], {}) == DEFAULT_TRIGGER_WINDOW + REPLAY_BUFFER_MARGIN
+    
+    triggers = [trigger(5, 20, 5), trigger(15, 90, 10), trigger(clip_duration=30)]
+    assert replay_buffer_seconds(triggers, {}) == 115 + REPLAY_BUFFER_MARGIN
+    assert replay_buffer_seconds([trigger(clip_duration=30)], {'context_pre_buffer': 100}) == 135 + REPLAY_BUFFER_MARGIN
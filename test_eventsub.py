@@ -0,0 +1,85 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from eventsub import (
+    HEADER_MESSAGE_ID, HEADER_MESSAGE_TYPE, HEADER_SIGNATURE, HEADER_TIMESTAMP, MESSAGE_NOTIFICATION,
+    EventSubError, EventSubReceiver, sign_eventsub
+)
+
+SECRET = 'test-secret-0123'
+BODY = json.dumps({'subscription': {'type': 'stream.online'}, 'event': {'broadcaster_user_login': 'chan'}})
+
+
+def message(message_id='m1', body=BODY, secret=SECRET, age=0):
+    timestamp = (datetime.now(timezone.utc) - timedelta(seconds=age)).strftime('%Y-%m-%dT%H:%M:%S.%f123Z')
+    return {
+        HEADER_MESSAGE_ID: message_id,
+        HEADER_TIMESTAMP: timestamp,
+        HEADER_SIGNATURE: sign_eventsub(secret, message_id, timestamp, body),
+        HEADER_MESSAGE_TYPE: MESSAGE_NOTIFICATION
+    }
+
+
+def test_valid_message_is_accepted():
+    message_type, payload, duplicate = EventSubReceiver().verify(message(), BODY.encode('utf-8'), SECRET)
+    assert message_type == MESSAGE_NOTIFICATION
+    assert payload['event']['broadcaster_user_login'] == 'chan'
+    assert not duplicate
+
+
+def test_wrong_secret_or_tampered_body_is_rejected():
+    receiver = EventSubReceiver()
+    with pytest.raises(EventSubError) as error:
+        receiver.verify(message(secret='someone-else'), BODY, SECRET)
+    assert error.value.status == 403
+    
+    with pytest.raises(EventSubError):
+        receiver.verify(message(), BODY.replace('chan', 'other'), SECRET)
+
+
+def test_missing_headers_and_secret():
+    receiver = EventSubReceiver()
+    headers = message()
+    del headers[HEADER_SIGNATURE]
+    with pytest.raises(EventSubError) as error:
+        receiver.verify(headers, BODY, SECRET)
+    assert error.value.status == 400
+    
+    with pytest.raises(EventSubError) as error:
+        receiver.verify(message(), BODY, '')
+    assert error.value.status == 503
+
+
+def test_stale_message_is_rejected():
+    with pytest.raises(EventSubError):
+        EventSubReceiver(max_age=600).verify(message(age=601), BODY, SECRET)
+
+
+def test_redelivery_is_flagged_duplicate_until_forgotten():
+    receiver = EventSubReceiver()
+    assert not receiver.verify(message('m1'), BODY, SECRET)[2]
+    assert receiver.verify(message('m1'), BODY, SECRET)[2]
+    
+    receiver.forget('m1')
+    assert not receiver.verify(message('m1'), BODY, SECRET)[2]
+
+
+def test_only_recent_message_ids_are_remembered():
+    receiver = EventSubReceiver(remember=2)
+    for message_id in ('a', 'b', 'c'):
+        receiver.verify(message(message_id), BODY, SECRET)
+    
+    assert receiver.verify(message('c'), BODY, SECRET)[2]
+    assert not receiver.verify(message('a'), BODY, SECRET)[2]
+
+
+def test_replay_never_invents_a_broadcaster_id():
+    eventsub_replay = pytest.importorskip('eventsub_replay')
+    _, _, payload = eventsub_replay.build_message('online', 'Chan')
+    assert payload['event']['broadcaster_user_id'] == ''
+    assert payload['event']['broadcaster_user_login'] == 'chan'
+    
+    _, _, payload = eventsub_replay.build_message('online', 'chan', broadcaster_id='12345')
+    assert payload['subscription']['condition']['broadcaster_user_id'] == '12345'
@@ -0,0 +1,69 @@
+import pytest
+
+from ffmpeg_progress import FFmpegProgress
+
+
+def feed(progress, text):
+    for line in text.strip().splitlines():
+        key, _, value = line.partition('=')
+        progress.update(key.strip(), value)
+
+
+def test_update_parses_a_progress_block():
+    progress = FFmpegProgress(duration=20)
+    feed(progress, """
+        frame=300
+        fps=59.94
+        total_size=1048576
+        out_time_us=5000000
+        speed=2.5x
+        progress=continue
+    """)
+    assert (progress.frame, progress.fps, progress.total_size) == (300, 59.94, 1048576)
+    assert progress.out_time == 5.0
+    assert progress.speed == 2.5
+    assert progress.state == 'running'
+    assert progress.percent == 25.0
+    assert progress.eta == 6.0
+
+
+def test_not_available_values_are_ignored():
+    progress = FFmpegProgress(duration=10)
+    feed(progress, """
+        frame=0
+        fps=N/A
+        out_time_us=N/A
+        speed=N/A
+        progress=continue
+    """)
+    assert progress.fps == 0.0
+    assert progress.speed == 0.0
+    assert progress.out_time == 0.0
+    assert progress.eta is None
+
+
+def test_negative_out_time_is_clamped():
+    progress = FFmpegProgress(duration=10)
+    progress.update('out_time_us', '-23220')
+    assert progress.out_time == 0.0
+
+
+def test_end_marks_done_and_percent_caps_at_100():
+    progress = FFmpegProgress(duration=10)
+    feed(progress, """
+        out_time_us=10400000
+        progress=end
+    """)
+    assert progress.state == 'done'
+    assert progress.percent == 100.0
+
+
+def test_unknown_duration_has_no_percent_or_eta():
+    progress = FFmpegProgress()
+    feed(progress, """
+        out_time_us=3000000
+        speed=1x
+    """)
+    assert progress.percent is None
+    assert progress.eta is None
+    assert progress.to_dict()['out_time'] == pytest.approx(3.0)
@@ -0,0 +1,75 @@
+import os
+import subprocess
+
+import pytest
+
+import keyframe_index
+from keyframe_index import KeyframeIndex, index_path_for, remove_keyframe_index
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'recording.mkv'
+    path.write_bytes(b'\0' * 4096)
+    return str(path)
+
+
+def saved_index(video):
+    stat = os.stat(video)
+    index = KeyframeIndex([0.0, 2.0, 4.0, 6.5], [0, 1000, 2000, 3100], stat.st_size, stat.st_mtime)
+    index.save(video)
+    return index
+
+
+def test_round_trip(video):
+    saved_index(video)
+    index = KeyframeIndex.load(video)
+    assert list(index.times) == [0.0, 2.0, 4.0, 6.5]
+    assert list(index.positions) == [0, 1000, 2000, 3100]
+    assert not os.path.exists(index_path_for(video) + '.tmp')
+
+
+def test_lookups(video):
+    index = saved_index(video)
+    assert index.at_or_before(3.9) == (2.0, 1000)
+    assert index.at_or_before(4.0) == (4.0, 2000)
+    assert index.after(4.0) == (6.5, 3100)
+    assert index.after(6.5) is None
+    assert index.interval() == 2.0
+    assert KeyframeIndex([], []).at_or_before(1) is None
+
+
+def test_index_is_stale_once_the_video_changes(video):
+    saved_index(video)
+    with open(video, 'ab') as f:
+        f.write(b'more')
+    assert KeyframeIndex.load(video) is None
+    
+    saved_index(video)
+    stat = os.stat(video)
+    os.utime(video, (stat.st_atime, stat.st_mtime + 10))
+    assert KeyframeIndex.load(video) is None
+
+
+def test_missing_or_corrupt_index(video):
+    assert KeyframeIndex.load(video) is None
+    
+    saved_index(video)
+    with open(index_path_for(video), 'r+b') as f:
+        f.truncate(30)
+    assert KeyframeIndex.load(video) is None
+    
+    remove_keyframe_index(video)
+    assert not os.path.exists(index_path_for(video))
+    remove_keyframe_index(video)
+
+
+def test_build_keeps_keyframe_packets_only(video, monkeypatch):
+    probe = '0.000000,48,K__\n0.033000,900,___\n2.002000,N/A,K_\nN/A,1200,K__\n'
+    monkeypatch.setattr(keyframe_index.subprocess, 'run',
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 0, stdout=probe))
+    
+    index = KeyframeIndex.load_or_build(video)
+    assert list(index.times) == [0.0, 2.002]
+    assert list(index.positions) == [48, -1]
+    assert list(KeyframeIndex.load(video).times) == [0.0, 2.002]
@@ -0,0 +1,142 @@
+import os
+
+import pytest
+
+flask = pytest.importorskip('flask')
+flask_sqlalchemy = pytest.importorskip('flask_sqlalchemy')
+
+import media_info
+from media_info import MediaInfoCache
+
+INFO = {
+    'duration': 12.5, 'bitrate': 6000000, 'format_name': 'matroska,webm', 'video_codec': 'h264',
+    'audio_codec': 'aac', 'width': 1920, 'height': 1080, 'fps': 60.0, 'keyframe_interval': 2.0,
+    'streams': [{'index': 0, 'codec_type': 'video', 'codec_name': 'h264'}]
+}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    db = flask_sqlalchemy.SQLAlchemy(app)
+    
+    class MediaInfo(db.Model):
+        id = db.Column(db.Integer, primary_key=True)
+        path = db.Column(db.String(1000), unique=True, nullable=False)
+        inode = db.Column(db.BigInteger)
+        size = db.Column(db.BigInteger)
+        mtime = db.Column(db.Float)
+        duration = db.Column(db.Float)
+        bitrate = db.Column(db.BigInteger)
+        format_name = db.Column(db.String(100))
+        video_codec = db.Column(db.String(50))
+        audio_codec = db.Column(db.String(50))
+        width = db.Column(db.Integer)
+        height = db.Column(db.Integer)
+        fps = db.Column(db.Float)
+        keyframe_interval = db.Column(db.Float)
+        streams = db.Column(db.Text)
+        probed_at = db.Column(db.DateTime)
+    
+    with app.app_context():
+        db.create_all()
+    
+    probes = []
+    monkeypatch.setattr(media_info, 'probe_media', lambda path: probes.append(path) or dict(INFO))
+    
+    video = tmp_path / 'clip.mp4'
+    video.write_bytes(b'\0' * 1000)
+    return app, db, MediaInfo, probes, str(video)
+
+
+def test_each_file_version_is_probed_once(env):
+    app, db, MediaInfo, probes, video = env
+    cache = MediaInfoCache(app, db, MediaInfo)
+    
+    assert cache.get(video) == INFO
+    assert cache.get(video) == INFO
+    assert probes == [video]
+    
+    # A fresh process (empty memory) is served from the table
+    assert MediaInfoCache(app, db, MediaInfo).get(video) == INFO
+    assert probes == [video]
+
+
+def test_rewritten_file_is_probed_again(env):
+    app, db, MediaInfo, probes, video = env
+    cache = MediaInfoCache(app, db, MediaInfo)
+    cache.get(video)
+    
+    with open(video, 'ab') as f:
+        f.write(b'more')
+    cache.get(video)
+    assert len(probes) == 2
+    
+    # Same size, new mtime (rewritten in place)
+    stat = os.stat(video)
+    os.utime(video, (stat.st_atime, stat.st_mtime + 5))
+    MediaInfoCache(app, db, MediaInfo).get(video)
+    assert len(probes) == 3
+    
+    with app.app_context():
+        assert MediaInfo.query.count() == 1
+
+
+def test_replaced_file_is_probed_again(env, tmp_path):
+    app, db, MediaInfo, probes, video = env
+    cache = MediaInfoCache(app, db, MediaInfo)
+    cache.get(video)
+    
+    replacement = tmp_path / 'replacement.mp4'
+    replacement.write_bytes(b'\0' * 1000)
+    stat = os.stat(video)
+    os.utime(replacement, (stat.st_atime, stat.st_mtime))
+    os.replace(replacement, video)
+    
+    MediaInfoCache(app, db, MediaInfo).get(video)
+    assert len(probes) == 2
+
+
+def test_missing_or_unprobeable_file(env, monkeypatch):
+    app, db, MediaInfo, probes, video = env
+    cache = MediaInfoCache(app, db, MediaInfo)
+    assert cache.get(video + '.missing') is None
+    
+    def fail(path):
+        raise ValueError('not a media file')
+    monkeypatch.setattr(media_info, 'probe_media', fail)
+    assert cache.get(video) is None
+
+
+def test_forget_drops_the_entry(env):
+    app, db, MediaInfo, probes, video = env
+    cache = MediaInfoCache(app, db, MediaInfo)
+    cache.get(video)
+    cache.forget(video)
+    
+    with app.app_context():
+        assert MediaInfo.query.count() == 0
+    cache.get(video)
+    assert len(probes) == 2
+
+
+def test_cache_never_commits_the_callers_work(env):
+    app, db, MediaInfo, probes, video = env
+    stored = []
+    cache = MediaInfoCache(app, db, MediaInfo, on_probe=lambda path, info: stored.append(path))
+    
+    with app.app_context():
+        db.session.add(MediaInfo(path='caller-row'))
+        cache.get(video)
+        cache.forget(video + '.other')
+        db.session.rollback()
+        assert MediaInfo.query.count() == 0
+    assert stored == [video]
+    
+    with app.app_context():
+        db.session.add(MediaInfo(path='caller-row'))
+        MediaInfoCache(app, db, MediaInfo).get(video)
+        db.session.commit()
+    with app.app_context():
+        assert {row.path for row in MediaInfo.query.all()} == {'caller-row', video}
@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta
+
+import pytest
+import sqlalchemy
+
+flask = pytest.importorskip('flask')
+flask_sqlalchemy = pytest.importorskip('flask_sqlalchemy')
+
+from monitor_shards import ShardCoordinator, shard_for
+
+
+@pytest.fixture
+def store():
+    app = flask.Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+    db = flask_sqlalchemy.SQLAlchemy(app)
+    
+    class Lease(db.Model):
+        shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+        node_id = db.Column(db.String(255), index=True)
+        expires_at = db.Column(db.DateTime)
+        heartbeat_at = db.Column(db.DateTime)
+    
+    class Node(db.Model):
+        node_id = db.Column(db.String(255), primary_key=True)
+        hostname = db.Column(db.String(255))
+        pid = db.Column(db.Integer)
+        started_at = db.Column(db.DateTime)
+        last_heartbeat = db.Column(db.DateTime, index=True)
+    
+    with app.app_context():
+        db.create_all()
+        yield db, Lease, Node
+
+
+def coordinator(store, node_id, shard_count=4):
+    db, Lease, Node = store
+    return ShardCoordinator(db, Lease, Node, shard_count, node_id=node_id)
+
+
+def test_shard_for_is_stable_and_in_range():
+    assert [shard_for(stream_id, 8) for stream_id in range(50)] == [shard_for(stream_id, 8) for stream_id in range(50)]
+    assert all(0 <= shard_for(stream_id, 8) < 8 for stream_id in range(50))
+
+
+def test_single_node_takes_every_shard(store):
+    a = coordinator(store, 'a')
+    assert a.heartbeat() == {0, 1, 2, 3}
+    assert all(a.owns(stream_id) for stream_id in range(20))
+
+
+def test_nodes_rebalance_to_a_fair_share(store):
+    a = coordinator(store, 'a')
+    b = coordinator(store, 'b')
+    a.heartbeat()
+    
+    # b joins: nothing is free yet, a hands back its extras on its next beat
+    assert b.heartbeat() == set()
+    assert len(a.heartbeat()) == 2
+    b.heartbeat()
+    
+    assert len(a.shards) == len(b.shards) == 2
+    assert a.shards.isdisjoint(b.shards)
+
+
+def test_claim_is_compare_and_set(store):
+    db, Lease, _ = store
+    b = coordinator(store, 'b')
+    stolen = []
+    
+    # Another node claims shard 0 after b listed it as free but before b's UPDATE
+    def steal(state):
+        if state.is_update and 'SET node_id' in str(state.statement) and not stolen:
+            stolen.append(True)
+            state.session.execute(
+                sqlalchemy.update(Lease).where(Lease.shard == 0)
+                .values(node_id='c', expires_at=datetime.utcnow() + timedelta(minutes=1))
+            )
+    sqlalchemy.event.listen(db.session, 'do_orm_execute', steal)
+    try:
+        b.heartbeat()
+    finally:
+        sqlalchemy.event.remove(db.session, 'do_orm_execute', steal)
+    
+    assert stolen
+    assert db.session.get(Lease, 0).node_id == 'c'
+    assert 0 not in b.shards
+    assert b.shards == {1, 2, 3}
+
+
+def test_expired_leases_are_taken_over(store):
+    db, Lease, Node = store
+    a = coordinator(store, 'a')
+    a.heartbeat()
+    
+    # a dies: its node row and leases lapse
+    past = datetime.utcnow() - timedelta(minutes=5)
+    Lease.query.update({Lease.expires_at: past})
+    Node.query.filter_by(node_id='a').update({Node.last_heartbeat: past})
+    db.session.commit()
+    
+    b = coordinator(store, 'b')
+    assert b.heartbeat() == {0, 1, 2, 3}
+
+
+def test_release_frees_shards_and_stops_ownership(store):
+    a = coordinator(store, 'a')
+    b = coordinator(store, 'b')
+    a.heartbeat()
+    a.release()
+    
+    assert not a.owns(0)
+    assert b.heartbeat() == {0, 1, 2, 3}
@@ -0,0 +1,191 @@
+import pytest
+
+import platform_http
+from platform_http import CircuitBreaker, PlatformHttp, TokenBucket, retry_after
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(platform_http.time, 'monotonic', clock)
+    return clock
+
+
+def test_bucket_serves_burst_then_paces(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    
+    # Empty: the next token is half a second away, the one after a full second
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.reserve() == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    for _ in range(3):
+        bucket.reserve()
+    
+    clock.now += 60
+    assert bucket.wait_time() == 0
+    assert [bucket.reserve() for _ in range(3)] == [0, 0, 0]
+    assert bucket.reserve() > 0
+
+
+def test_reserve_over_max_wait_takes_nothing(clock):
+    bucket = TokenBucket(rate=1, capacity=1)
+    bucket.reserve()
+    
+    assert bucket.reserve(max_wait=0.5) == pytest.approx(1.0)
+    assert bucket.reserve(max_wait=0.5) == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(1.0)
+    assert bucket.reserve() == pytest.approx(2.0)
+
+
+def test_sync_adopts_server_count_and_reset(clock):
+    bucket = TokenBucket(rate=10, capacity=100)
+    bucket.sync(remaining=2)
+    assert bucket.tokens == 2
+    
+    bucket.sync(remaining=0, reset_in=30)
+    assert bucket.wait_time() == pytest.approx(30)
+    clock.now += 30
+    assert bucket.wait_time() == 0
+
+
+def test_block_holds_tokens_until_retry_after(clock):
+    bucket = TokenBucket(rate=10, capacity=100)
+    bucket.block(5)
+    assert bucket.reserve(max_wait=1) == pytest.approx(5)
+    clock.now += 5
+    assert bucket.reserve() == 0
+
+
+def test_retry_after_parses_seconds_reset_and_default():
+    assert retry_after({'Retry-After': '12'}) == 12
+    assert retry_after({'Ratelimit-Reset': str(int(platform_http.time.time()) + 30)}) == pytest.approx(30, abs=1)
+    assert retry_after({'Retry-After': 'garbage'}) == 5
+    assert retry_after({}) == 5
+
+
+def test_breaker_opens_after_threshold_failures(clock):
+    breaker = CircuitBreaker(threshold=3, base_delay=5, max_delay=60)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.allow()
+    
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.retry_in() == pytest.approx(5)
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(threshold=3)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(threshold=1, base_delay=5)
+    breaker.record_failure()
+    
+    clock.now += 5
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+    
+    # A probe that never reports back is replaced after the probe timeout
+    clock.now += platform_http.BREAKER_PROBE_TIMEOUT + 1
+    assert breaker.allow()
+    
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_doubles_delay_up_to_max(clock):
+    breaker = CircuitBreaker(threshold=1, base_delay=5, max_delay=12)
+    breaker.record_failure()
+    assert breaker.retry_in() == pytest.approx(5)
+    
+    for expected in (10, 12, 12):
+        clock.now += breaker.retry_in()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.retry_in() == pytest.approx(expected)
+
+
+def test_only_errors_and_5xx_count_as_failures():
+    breaker = CircuitBreaker(threshold=1)
+    for status_code in (200, 304, 404, 429):
+        PlatformHttp.record_outcome(breaker, status_code=status_code)
+    assert breaker.state == 'closed'
+    
+    PlatformHttp.record_outcome(breaker, status_code=503)
+    assert breaker.state == 'open'
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b'', headers=None):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers or {}
+
+
+def scripted_http(monkeypatch, *responses):
+    http = PlatformHttp()
+    sent = []
+    
+    def get(url, params=None, headers=None, **kwargs):
+        sent.append(dict(headers or {}))
+        return responses[len(sent) - 1]
+    monkeypatch.setattr(http, 'get', get)
+    return http, sent
+
+
+def test_get_parsed_revalidates_and_skips_unchanged_bodies(monkeypatch, clock):
+    etag = {'ETag': '"v1"'}
+    http, sent = scripted_http(monkeypatch, FakeResponse(200, b'live', etag), FakeResponse(304, headers=etag),
+                               FakeResponse(200, b'live', etag))
+    parsed = []
+    parse = lambda response: parsed.append(response.content) or 'digest'
+    
+    results = [http.get_parsed('https://kick.com/api/v2/channels/x', parse) for _ in range(3)]
+    assert [(r.status_code, r.value, r.source) for r in results] == [
+        (200, 'digest', 'parsed'), (200, 'digest', 'not_modified'), (200, 'digest', 'unchanged')
+    ]
+    assert parsed == [b'live']
+    assert sent[1]['If-None-Match'] == '"v1"'
+
+
+def test_get_parsed_caps_max_age(monkeypatch, clock):
+    headers = {'Cache-Control': 'max-age=600'}
+    http, sent = scripted_http(monkeypatch, FakeResponse(200, b'a', headers), FakeResponse(200, b'a', headers))
+    url = 'https://kick.com/api/v2/channels/x'
+    
+    http.get_parsed(url, lambda response: 1, max_age=30)
+    clock.now += 29
+    assert http.get_parsed(url, lambda response: 1, max_age=30).source == 'fresh'
+    clock.now += 2
+    assert http.get_parsed(url, lambda response: 1, max_age=30).source == 'unchanged'
+    assert len(sent) == 2
+
+
+def test_bare_304_is_retried_without_validators(monkeypatch, clock):
+    http, sent = scripted_http(monkeypatch, FakeResponse(304), FakeResponse(200, b'body'))
+    
+    response = http.get_parsed('https://kick.com/api/v2/channels/x', lambda response: response.content,
+                               headers={'If-None-Match': '"stale"'})
+    assert (response.status_code, response.value) == (200, b'body')
+    assert 'If-None-Match' not in sent[1]
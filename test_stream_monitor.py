@@ -0,0 +1,163 @@
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import stream_monitor
+from stream_monitor import OFFLINE, LiveStatus, StreamMonitor
+
+
+@pytest.fixture
+def monitor(monkeypatch):
+    monkeypatch.setattr(stream_monitor.random, 'uniform', lambda a, b: 1.0)
+    monitor = StreamMonitor(flask.Flask(__name__), None, None, None, None)
+    yield monitor
+    monitor._shutdown_executors()
+
+
+def stream(stream_id, platform='kick', is_live=False, created_days_ago=None, **kwargs):
+    created_at = datetime.utcnow() - timedelta(days=created_days_ago) if created_days_ago is not None else None
+    return SimpleNamespace(id=stream_id, name=f"chan{stream_id}", platform=platform, is_live=is_live,
+                           is_recording=False, created_at=created_at, channel_id=None, channel_url=None, **kwargs)
+
+
+# Concurrent checks (bounded per-platform pools)
+
+def test_map_runs_checks_side_by_side(monitor):
+    monitor._start_executors()
+    barrier = threading.Barrier(3, timeout=5)
+    
+    def check(item):
+        # Times out (BrokenBarrierError) unless all three run at once
+        barrier.wait()
+        return item
+    assert monitor._map('kick', check, [1, 2, 3]) == [1, 2, 3]
+
+
+def test_map_runs_inline_without_pools(monitor):
+    threads = set()
+    monitor._map('kick', lambda item: threads.add(threading.current_thread()), [1, 2, 3])
+    assert threads == {threading.current_thread()}
+
+
+def test_check_streams_merges_platforms_and_drops_failures(monitor):
+    monitor._check_twitch_streams = lambda targets, client_id, secret: {targets[0][0]: LiveStatus(True, None)}
+    monitor._check_kick_streams = lambda targets: {stream_id: OFFLINE for stream_id, _ in targets}
+    
+    def youtube_down(targets, api_key):
+        raise RuntimeError('quota exceeded')
+    monitor._check_youtube_batch = youtube_down
+    
+    streams = [stream(1, 'twitch'), stream(2, 'youtube'), stream(3, 'kick'), stream(4, 'Kick'), stream(5, 'vimeo')]
+    results = monitor._check_streams(streams)
+    assert results == {1: LiveStatus(True, None), 3: OFFLINE, 4: OFFLINE, 5: OFFLINE}
+
+
+# Adaptive per-stream schedule
+
+def test_dormant_channels_back_off_to_max_interval(monitor):
+    assert monitor._poll_interval(stream(1)) == monitor.check_interval
+    assert monitor._poll_interval(stream(1, created_days_ago=3)) == pytest.approx(monitor.check_interval * 4, abs=1)
+    assert monitor._poll_interval(stream(1, created_days_ago=30)) == monitor.max_interval
+
+
+def test_live_and_recently_ended_streams_poll_faster(monitor):
+    assert monitor._poll_interval(stream(1, is_live=True)) == max(monitor.min_interval, monitor.check_interval // 2)
+    
+    monitor._history = {1: {'golive_minutes': [], 'last_offline': datetime.utcnow() - timedelta(minutes=5)}}
+    assert monitor._poll_interval(stream(1, created_days_ago=30)) == monitor.min_interval
+
+
+def test_polls_tighten_around_usual_golive_time(monitor):
+    soon = datetime.utcnow() + timedelta(minutes=5)
+    monitor._history = {1: {'golive_minutes': [soon.hour * 60 + soon.minute]}}
+    assert monitor._poll_interval(stream(1, created_days_ago=30)) == monitor.min_interval
+    
+    later = datetime.utcnow() + timedelta(hours=6)
+    monitor._history = {1: {'golive_minutes': [later.hour * 60 + later.minute]}}
+    assert monitor._poll_interval(stream(1, created_days_ago=30)) == monitor.max_interval
+
+
+def test_only_confirmed_push_streams_reconcile(monitor):
+    # A webhook secret alone does not mean anything is subscribed
+    monitor.push_platforms = {'twitch'}
+    assert monitor._poll_interval(stream(1, 'twitch')) == monitor.check_interval
+    
+    monitor._push_confirmed.add(1)
+    assert monitor._poll_interval(stream(1, 'twitch')) == monitor.reconcile_interval
+    
+    monitor._push_confirmed.discard(1)
+    assert monitor._poll_interval(stream(1, 'twitch')) == monitor.check_interval
+
+
+def test_new_streams_are_due_then_rescheduled(monitor):
+    streams = [stream(1, created_days_ago=30), stream(2)]
+    assert [s.id for s in monitor._due_streams(streams)] == [1, 2]
+    for s in streams:
+        monitor._reschedule(s)
+    
+    assert monitor._due_streams(streams) == []
+    assert monitor.schedule_status()[1]['interval'] == monitor.max_interval
+    assert monitor.schedule_status()[2]['interval'] == monitor.check_interval
+    assert 0 < monitor._seconds_until_next_check() <= stream_monitor.SCHEDULER_TICK
+
+
+def test_removed_streams_leave_the_schedule_and_poll_now_forces_a_check(monitor):
+    streams = [stream(1), stream(2)]
+    monitor._due_streams(streams)
+    for s in streams:
+        monitor._reschedule(s)
+    
+    monitor._poll_now.add(2)
+    assert [s.id for s in monitor._due_streams(streams[1:])] == [2]
+    assert 1 not in monitor.schedule_status()
+
+
+def test_cached_responses_expire_before_the_earliest_next_check(monitor, monkeypatch):
+    monkeypatch.setattr(stream_monitor.random, 'uniform', lambda a, b: a)
+    streams = [stream(1), stream(2, created_days_ago=30)]
+    monitor._due_streams(streams)
+    for s in streams:
+        monitor._reschedule(s)
+    
+    earliest = monitor.schedule_status()[1]['interval'] * (1 - stream_monitor.SCHEDULE_JITTER)
+    assert monitor._cache_max_age([1, 2]) < earliest - stream_monitor.SCHEDULER_COALESCE_WINDOW
+    assert monitor._cache_max_age([2]) > monitor._cache_max_age([1])
+
+
+# Response handling shared by the threaded and asyncio engines
+
+def test_twitch_chunks_leave_out_failed_requests():
+    chunks = stream_monitor._twitch_login_chunks(['B', 'a', None, 'b'] + [f"x{i:03}" for i in range(150)])
+    assert [len(chunk) for chunk in chunks] == [100, 52] and chunks[0][:2] == ['a', 'b']
+    
+    live = stream_monitor._twitch_chunk_statuses(chunks, [{'a': '2026-01-01T00:00:00Z'}, None])
+    assert live['a'].is_live and live['b'] == OFFLINE and 'x120' not in live
+    assert stream_monitor._statuses_by_name([(1, 'A'), (2, 'x120'), (3, None)], live) == {1: live['a']}
+
+
+def test_youtube_uploads_check_drops_channels_of_failed_batches(monkeypatch):
+    monkeypatch.setattr(stream_monitor, 'YOUTUBE_VIDEOS_BATCH_SIZE', 2)
+    live_channels, video_channels, batches = stream_monitor._youtube_video_batches(
+        ['UCa', 'UCb', 'UCc', 'UCd'], [['a1', 'a2'], ['b1'], None, []]
+    )
+    assert live_channels == {'UCa': OFFLINE, 'UCb': OFFLINE, 'UCd': OFFLINE}
+    assert batches == [['a1', 'a2'], ['b1']]
+    
+    started = datetime(2026, 1, 1)
+    live = stream_monitor._youtube_live_from_videos(live_channels, video_channels, batches, [{'UCa': started}, None])
+    assert live == {'UCa': LiveStatus(True, started), 'UCd': OFFLINE}
+    assert stream_monitor._youtube_stream_statuses({1: 'UCa', 2: 'UCb', 3: None}, live) == {1: live['UCa'], 3: OFFLINE}
+
+
+def test_youtube_quota_is_only_charged_for_requests_sent(monitor):
+    used = monitor.youtube_quota.used
+    monitor._recent_uploads_result(SimpleNamespace(status_code=200, value=['v1'], source='fresh'))
+    assert monitor.youtube_quota.used == used
+    
+    assert monitor._recent_uploads_result(SimpleNamespace(status_code=404, value=None, source='parsed')) == []
+    assert monitor._live_videos_result(SimpleNamespace(status_code=403, value=None, source='parsed')) is None
+    assert monitor.youtube_quota.used == used + 2
@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from transcode_scheduler import JobCancelled, TranscodeScheduler, current_job
+
+
+def wait_idle(scheduler, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = scheduler.status()
+        if not status['running'] and not status['queued']:
+            return status
+        time.sleep(0.01)
+    raise AssertionError('scheduler did not go idle')
+
+
+def blocked(scheduler):
+    """Occupy the only slot until the returned event is set"""
+    release = threading.Event()
+    started = threading.Event()
+    
+    def hold():
+        started.set()
+        release.wait(5)
+    scheduler.submit('hold', hold, priority='manual')
+    assert started.wait(5)
+    return release
+
+
+def test_jobs_run_by_priority_then_submission_order():
+    scheduler = TranscodeScheduler(max_jobs=1)
+    release = blocked(scheduler)
+    
+    ran = []
+    for name, priority in (('auto-1', 'auto'), ('background', 'background'), ('live', 'live'),
+                           ('manual', 'manual'), ('auto-2', 'auto')):
+        scheduler.submit(name, ran.append, name, priority=priority)
+    assert scheduler.status()['queued_by_priority'] == {'manual': 1, 'live': 1, 'auto': 2, 'background': 1}
+    
+    release.set()
+    wait_idle(scheduler)
+    assert ran == ['manual', 'live', 'auto-1', 'auto-2', 'background']
+
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        TranscodeScheduler(max_jobs=1).submit('x', print, priority='urgent')
+
+
+def test_cancelled_queued_job_never_runs():
+    scheduler = TranscodeScheduler(max_jobs=1)
+    release = blocked(scheduler)
+    ran = []
+    job = scheduler.submit('clip', ran.append, 1)
+    
+    assert scheduler.cancel(job.id)
+    assert job.status == 'cancelled'
+    assert not scheduler.cancel(job.id)
+    
+    release.set()
+    wait_idle(scheduler)
+    assert ran == []
+
+
+def test_cancel_kills_the_running_process():
+    scheduler = TranscodeScheduler(max_jobs=1)
+    killed = threading.Event()
+    running = threading.Event()
+    
+    class Process:
+        def kill(self):
+            killed.set()
+    
+    def encode():
+        with current_job().tracking(Process()):
+            running.set()
+            assert killed.wait(5)
+    job = scheduler.submit('clip', encode)
+    assert running.wait(5)
+    
+    assert scheduler.cancel(job.id)
+    wait_idle(scheduler)
+    assert job.status == 'cancelled'
+
+
+def test_failures_are_recorded():
+    scheduler = TranscodeScheduler(max_jobs=2)
+    
+    def fail():
+        raise RuntimeError('ffmpeg exploded')
+    job = scheduler.submit('clip', fail)
+    ok = scheduler.submit('clip', lambda: None)
+    wait_idle(scheduler)
+    assert (job.status, job.error) == ('failed', 'ffmpeg exploded')
+    assert ok.status == 'done'
+    assert current_job() is None
+
+
+def test_tracking_raises_when_cancelled_before_start():
+    scheduler = TranscodeScheduler(max_jobs=1)
+    release = blocked(scheduler)
+    job = scheduler.submit('clip', lambda: None)
+    job.cancel()
+    
+    class Process:
+        killed = False
+        
+        def kill(self):
+            self.killed = True
+    process = Process()
+    with pytest.raises(JobCancelled):
+        with job.tracking(process):
+            pass
+    assert process.killed
+    release.set()
+    wait_idle(scheduler)
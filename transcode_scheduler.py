@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Lower runs first; within a class jobs run in submission order
+JOB_PRIORITIES = {
+    'manual': 0,
+    'live': 5,
+    'auto': 10,
+    'background': 20,
+}
+
+# Finished jobs kept for /api/ffmpeg/jobs
+JOB_HISTORY = 100
+
+_current = threading.local()
+
+
+def default_max_jobs():
+    """libx264 already spreads one encode over every core, so only run a few side by side"""
+    return max(1, (os.cpu_count() or 2) // 4)
+
+
+def current_job():
+    """The TranscodeJob the calling thread is running, or None outside the scheduler"""
+    return getattr(_current, 'job', None)
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class TranscodeJob:
+    def __init__(self, job_id, name, priority, fn, args, kwargs):
+        self.id = job_id
+        self.name = name
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.status = 'queued'
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # FFmpegProgress of the ffmpeg run in progress (set by clip_cutter.run_ffmpeg)
+        self.progress = None
+        self.cancelled = threading.Event()
+        self._processes = set()
+        self._lock = threading.Lock()
+    
+    def cancel(self):
+        """Stop the job: a queued job never starts, a running one has its ffmpeg killed"""
+        self.cancelled.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+    
+    @contextmanager
+    def tracking(self, process):
+        """Register a child process so cancel() can kill it; raises JobCancelled if it was"""
+        with self._lock:
+            self._processes.add(process)
+        try:
+            if self.cancelled.is_set():
+                process.kill()
+            yield process
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+        if self.cancelled.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+    
+    def to_dict(self):
+        now = time.time()
+        return {
+            'id': self.id,
+            'name': self.name,
+            'priority': self.priority,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'queued_seconds': round((self.started_at or now) - self.created_at, 1),
+            'run_seconds': round((self.finished_at or now) - self.started_at, 1) if self.started_at else None,
+            'progress': self.progress.to_dict() if self.progress else None
+        }
+
+
+class TranscodeScheduler:
+    """
+    Bounded pool for FFmpeg work. Jobs wait in a priority queue (manual
+    clips ahead of bulk auto-clips) and at most max_jobs run at once, so a
+    burst of segment rotations can't start dozens of encoders together.
+    """
+    
+    def __init__(self, max_jobs=None, logger=None):
+        self.max_jobs = max_jobs or default_max_jobs()
+        self._log = logger or logging.getLogger(__name__)
+        self._queue = []
+        self._jobs = {}
+        self._history = deque(maxlen=JOB_HISTORY)
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._workers = 0
+        self._busy = 0
+    
+    def submit(self, name, fn, *args, priority='auto', **kwargs):
+        """Queue fn(*args, **kwargs); returns the TranscodeJob"""
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Unknown job priority: {priority}")
+        with self._cond:
+            job = TranscodeJob(next(self._ids), name, priority, fn, args, kwargs)
+            self._jobs[job.id] = job
+            heapq.heappush(self._queue, (JOB_PRIORITIES[priority], job.id, job))
+            self._spawn_workers()
+            self._cond.notify()
+        return job
+    
+    def cancel(self, job_id):
+        """Cancel a queued or running job; False if unknown or already finished"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ('queued', 'running'):
+                return False
+            if job.status == 'queued':
+                self._queue = [entry for entry in self._queue if entry[2] is not job]
+                heapq.heapify(self._queue)
+                self._finish(job, 'cancelled')
+        job.cancel()
+        return True
+    
+    def set_max_jobs(self, max_jobs):
+        with self._cond:
+            self.max_jobs = max(1, int(max_jobs))
+            self._spawn_workers()
+            # Surplus workers exit once they are idle
+            self._cond.notify_all()
+    
+    def status(self):
+        with self._cond:
+            active = sorted(self._jobs.values(), key=lambda j: j.id)
+            return {
+                'max_jobs': self.max_jobs,
+                'running': self._busy,
+                'queued': len(self._queue),
+                'queued_by_priority': {
+                    name: sum(1 for _, _, job in self._queue if job.priority == name) for name in JOB_PRIORITIES
+                },
+                'jobs': [job.to_dict() for job in active] + [job.to_dict() for job in reversed(self._history)]
+            }
+    
+    def _spawn_workers(self):
+        """Start workers up to max_jobs (called with the condition held)"""
+        while self._workers < min(self.max_jobs, self._busy + len(self._queue)):
+            self._workers += 1
+            threading.Thread(target=self._worker, name=f"transcode-{self._workers}", daemon=True).start()
+    
+    def _finish(self, job, status, error=None):
+        """Move a job to the history (called with the condition held)"""
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._jobs.pop(job.id, None)
+        self._history.append(job)
+    
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and self._workers <= self.max_jobs:
+                    self._cond.wait()
+                if self._workers > self.max_jobs:
+                    self._workers -= 1
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                job.status = 'running'
+                job.started_at = time.time()
+                self._busy += 1
+            
+            _current.job = job
+            status, error = 'done', None
+            try:
+                job.fn(*job.args, **job.kwargs)
+                if job.cancelled.is_set():
+                    status = 'cancelled'
+            except JobCancelled:
+                status = 'cancelled'
+            except Exception as e:
+                status, error = 'failed', str(e)
+                self._log.error(f"Transcode job {job.id} ({job.name}) failed: {e}")
+            finally:
+                _current.job = None
+                with self._cond:
+                    self._busy -= 1
+                    self._finish(job, status, error)